@@ -108,6 +108,8 @@ INSTALLED_APPS = [
     "django.contrib.staticfiles",
     "django.contrib.sitemaps",
     "django.contrib.postgres",  # ✅ REQUIRED for Postgres search fields / GinIndex
+    "django_tasks",
+    "django_tasks.backends.database",
     "core",
 ]
 
@@ -121,6 +123,7 @@ MIDDLEWARE = [
     "django.contrib.messages.middleware.MessageMiddleware",
     "django.middleware.clickjacking.XFrameOptionsMiddleware",
     "wagtail.contrib.redirects.middleware.RedirectMiddleware",
+    "core.middleware.ApiResponseCacheMiddleware",
 ]
 
 ROOT_URLCONF = "ateliere_la_scanteia.urls"
@@ -178,6 +181,43 @@ else:
     }
 
 
+# ------------------------------------------------------------
+# CACHE
+# ------------------------------------------------------------
+# The cache must be shared by all gunicorn workers (+ the task worker), so the default
+# is the database cache table (created by `createcachetable` in entrypoint.sh).
+# When REDIS_URL is present (Railway Redis) Redis is used instead.
+#
+# DJANGO_CACHE_BACKEND: db | file | locmem | redis | memcached | <full backend path>
+# DJANGO_CACHE_LOCATION: table name / directory / server URL for that backend
+CACHE_BACKENDS = {
+    "db": "django.core.cache.backends.db.DatabaseCache",
+    "file": "django.core.cache.backends.filebased.FileBasedCache",
+    "locmem": "django.core.cache.backends.locmem.LocMemCache",
+    "redis": "django.core.cache.backends.redis.RedisCache",
+    "memcached": "django.core.cache.backends.memcached.PyMemcacheCache",
+}
+CACHE_DEFAULT_LOCATIONS = {
+    "db": "django_cache",
+    "file": str(BASE_DIR / ".cache" / "django"),
+    "redis": (os.getenv("REDIS_URL") or "").strip() or "redis://127.0.0.1:6379/1",
+    "memcached": "127.0.0.1:11211",
+}
+
+CACHE_BACKEND = (os.getenv("DJANGO_CACHE_BACKEND") or ("redis" if os.getenv("REDIS_URL") else "db")).strip()
+CACHES = {
+    "default": {
+        "BACKEND": CACHE_BACKENDS.get(CACHE_BACKEND, CACHE_BACKEND),
+        "LOCATION": os.getenv("DJANGO_CACHE_LOCATION", CACHE_DEFAULT_LOCATIONS.get(CACHE_BACKEND, "")),
+        "KEY_PREFIX": os.getenv("DJANGO_CACHE_KEY_PREFIX", "als"),
+        "TIMEOUT": int(os.getenv("DJANGO_CACHE_TIMEOUT", "300")),
+    }
+}
+if CACHE_BACKEND in ("db", "file", "locmem"):
+    # Django's default (300) is too small once every jurnal article has a cached payload
+    CACHES["default"]["OPTIONS"] = {"MAX_ENTRIES": int(os.getenv("DJANGO_CACHE_MAX_ENTRIES", "5000"))}
+
+
 # ------------------------------------------------------------
 # PASSWORD VALIDATION
 # ------------------------------------------------------------
@@ -285,6 +325,19 @@ MEMBRIE_APPLICATION_TO_EMAIL = os.getenv(
 )
 
 
+# ------------------------------------------------------------
+# BACKGROUND TASKS (django-tasks)
+# ------------------------------------------------------------
+# Production: tasks are stored in the DB and run by `python manage.py db_worker`
+# (started by entrypoint.sh). Set DJANGO_TASKS_BACKEND to
+# "django_tasks.backends.immediate.ImmediateBackend" to run them inline instead.
+TASKS = {
+    "default": {
+        "BACKEND": os.getenv("DJANGO_TASKS_BACKEND", "django_tasks.backends.database.DatabaseBackend"),
+    }
+}
+
+
 # ------------------------------------------------------------
 # STATIC / MEDIA
 # ------------------------------------------------------------
@@ -305,11 +358,25 @@ STATIC_URL = "/static/"
 MEDIA_ROOT = Path(os.getenv("DJANGO_MEDIA_ROOT", str(BASE_DIR / "media")))
 MEDIA_URL = "/media/"
 
+# Admin export files (core.ExportJob): kept OUTSIDE MEDIA_ROOT so they are never served publicly;
+# downloads go through a signed admin URL. On Railway point it at the volume too (e.g. /app/private).
+EXPORTS_ROOT = Path(os.getenv("DJANGO_EXPORTS_ROOT", str(BASE_DIR / "private")))
+
 STORAGES = {
     "default": {"BACKEND": "django.core.files.storage.FileSystemStorage"},
     "staticfiles": {"BACKEND": "django.contrib.staticfiles.storage.StaticFilesStorage"},
+    "exports": {
+        "BACKEND": "django.core.files.storage.FileSystemStorage",
+        "OPTIONS": {"location": str(EXPORTS_ROOT)},
+    },
 }
 
+# Signed export download links expire after this many seconds
+EXPORT_DOWNLOAD_MAX_AGE = int(os.getenv("EXPORT_DOWNLOAD_MAX_AGE", str(60 * 60)))
+# Finished export files (and their ExportJob rows) are deleted after this many days
+# (after every new export + `manage.py cleanup_exports`)
+EXPORT_RETENTION_DAYS = int(os.getenv("EXPORT_RETENTION_DAYS", "7"))
+
 DATA_UPLOAD_MAX_NUMBER_FIELDS = 10_000
 
 
@@ -332,6 +399,70 @@ if DEBUG and not (
 
 NEWSLETTER_CONFIRM_TTL_HOURS = int(os.getenv("NEWSLETTER_CONFIRM_TTL_HOURS", "72"))
 
+# Repeated footer submits for a pending address don't resend the confirmation inside this window
+NEWSLETTER_RESEND_WINDOW_SECONDS = int(os.getenv("NEWSLETTER_RESEND_WINDOW_SECONDS", "600"))
+
+# Newsletter campaigns (core.newsletter.send_campaign): keep the rate under the SMTP provider's limits
+NEWSLETTER_CAMPAIGN_BATCH_SIZE = int(os.getenv("NEWSLETTER_CAMPAIGN_BATCH_SIZE", "200"))
+NEWSLETTER_CAMPAIGN_WORKERS = int(os.getenv("NEWSLETTER_CAMPAIGN_WORKERS", "4"))
+NEWSLETTER_CAMPAIGN_RATE_PER_MINUTE = int(os.getenv("NEWSLETTER_CAMPAIGN_RATE_PER_MINUTE", "60"))
+
+# Headless API payloads (core.cache): mainpage, jurnal list/detail; publishing / settings saves invalidate earlier
+API_CACHE_TTL = int(os.getenv("API_CACHE_TTL", str(60 * 60)))
+# Single-flight rebuilds: one worker rebuilds an expired payload (lock held at most LOCK_TIMEOUT s),
+# the others serve the last built value (kept STALE_TTL s) or wait up to LOCK_WAIT s for the new one
+API_CACHE_STALE_TTL = int(os.getenv("API_CACHE_STALE_TTL", str(60 * 60 * 24)))
+API_CACHE_LOCK_TIMEOUT = int(os.getenv("API_CACHE_LOCK_TIMEOUT", "10"))
+API_CACHE_LOCK_WAIT = float(os.getenv("API_CACHE_LOCK_WAIT", "2"))
+# Stale payloads served during a rebuild: browsers may keep them this long, CDNs / the response cache never
+API_STALE_MAX_AGE = int(os.getenv("API_STALE_MAX_AGE", "5"))
+
+# Whole-response stale-while-revalidate cache (core.middleware) for these public GET endpoints.
+# Not /api/newsletter/confirm/ (a GET with side effects), not /api/v2/ (DRF picks JSON or the
+# browsable HTML page from Accept, which the cache key doesn't include).
+API_RESPONSE_CACHE_PATHS = (
+    "/api/mainpage/",
+    "/api/jurnal/",
+    "/api/search/",
+    "/api/membrii/questions/",
+    "/api/snap/",
+)
+API_RESPONSE_FRESH_TTL = int(os.getenv("API_RESPONSE_FRESH_TTL", "60"))
+API_RESPONSE_STALE_TTL = int(os.getenv("API_RESPONSE_STALE_TTL", str(60 * 60)))
+API_RESPONSE_CACHE_WORKERS = int(os.getenv("API_RESPONSE_CACHE_WORKERS", "2"))
+# Cached API bodies above this size also get gzip (+ Brotli) variants, compressed once when stored
+API_COMPRESS_MIN_BYTES = int(os.getenv("API_COMPRESS_MIN_BYTES", "512"))
+# Compression runs inline on a cache MISS: mid levels keep it to a few ms per response
+# (Brotli 11 takes hundreds of ms on a large jurnal list for a few % smaller bodies)
+API_GZIP_LEVEL = int(os.getenv("API_GZIP_LEVEL", "6"))
+API_BROTLI_QUALITY = int(os.getenv("API_BROTLI_QUALITY", "5"))
+
+# CDN in front of /api/ (core.cdn): responses are tagged with Surrogate-Key / Cache-Tag and kept
+# CDN_S_MAXAGE s at the edge; publishing / settings saves purge their keys through CDN_PURGER
+# (core.cdn.LoggingPurger | core.cdn.FilePurger | core.cdn.CloudflarePurger | custom dotted path)
+CDN_PURGER = os.getenv("CDN_PURGER", "core.cdn.LoggingPurger")
+CDN_PURGE_FILE = os.getenv("CDN_PURGE_FILE", str(EXPORTS_ROOT / "cdn-purges.log"))
+CDN_S_MAXAGE = int(os.getenv("CDN_S_MAXAGE", str(60 * 60 * 24)))
+
+# /api/snap/<digest>.json (core.snapshots) is immutable; only the manifest is revalidated (max-age below)
+SNAPSHOT_TTL = int(os.getenv("SNAPSHOT_TTL", str(60 * 60 * 24 * 30)))
+SNAPSHOT_MANIFEST_MAX_AGE = int(os.getenv("SNAPSHOT_MANIFEST_MAX_AGE", "30"))
+CLOUDFLARE_ZONE_ID = os.getenv("CLOUDFLARE_ZONE_ID", "")
+CLOUDFLARE_API_TOKEN = os.getenv("CLOUDFLARE_API_TOKEN", "")
+
+# Membrie questions are parsed once per Site and cached until MembrieFormContent is saved
+MEMBRIE_QUESTIONS_CACHE_TTL = int(os.getenv("MEMBRIE_QUESTIONS_CACHE_TTL", str(60 * 60 * 24)))
+
+# /sitemap.xml turns into a sitemap index (sections paginated by this size) above it
+SITEMAP_PAGE_SIZE = int(os.getenv("SITEMAP_PAGE_SIZE", "5000"))
+# Rendered sitemap XML is cached this long; publishing/unpublishing pages invalidates it earlier
+SITEMAP_CACHE_TTL = int(os.getenv("SITEMAP_CACHE_TTL", str(60 * 60 * 6)))
+# Rendition listed for jurnal hero/gallery images in the image sitemap
+SITEMAP_IMAGE_RENDITION = os.getenv("SITEMAP_IMAGE_RENDITION", "max-1600x1600")
+
+# /api/search/ results are cached per normalized query for this long (publishing invalidates them)
+SEARCH_CACHE_TTL = int(os.getenv("SEARCH_CACHE_TTL", "300"))
+
 WAGTAILADMIN_BASE_URL = PUBLIC_BASE_URL or "http://localhost:8000"
 
 WAGTAILDOCS_EXTENSIONS = [
@@ -44,6 +44,29 @@ MEMBRIE_APPLICATION_TO_EMAIL = os.getenv(
     EMAIL_HOST_USER or ""
 )
 
+# ------------------------------------------------------------
+# BACKGROUND TASKS (DEV)
+# ------------------------------------------------------------
+# No db_worker locally by default: run tasks inline (override with DJANGO_TASKS_BACKEND)
+TASKS = {
+    "default": {
+        "BACKEND": os.getenv("DJANGO_TASKS_BACKEND", "django_tasks.backends.immediate.ImmediateBackend"),
+    }
+}
+
+# ------------------------------------------------------------
+# CACHE (DEV)
+# ------------------------------------------------------------
+# File-based by default (no cache table / server needed); DJANGO_CACHE_BACKEND or REDIS_URL override it
+if not os.getenv("DJANGO_CACHE_BACKEND") and not os.getenv("REDIS_URL"):
+    CACHES["default"].update(
+        {
+            "BACKEND": CACHE_BACKENDS["file"],
+            "LOCATION": os.getenv("DJANGO_CACHE_LOCATION", CACHE_DEFAULT_LOCATIONS["file"]),
+        }
+    )
+    CACHES["default"].setdefault("OPTIONS", {"MAX_ENTRIES": 5000})
+
 # ------------------------------------------------------------
 # CORS (Frontend dev server)
 # ------------------------------------------------------------
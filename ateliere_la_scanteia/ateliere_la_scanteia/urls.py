@@ -14,30 +14,28 @@ from wagtail.api.v2.views import PagesAPIViewSet
 from wagtail.api.v2.router import WagtailAPIRouter
 from wagtail import urls as wagtail_urls
 
-from django.contrib.sitemaps.views import sitemap
-from core.sitemaps import JurnalSitemap, JurnalIndexSitemap
-
 from search import views as search_views
 from core.views import (
     mainpage_content,
     jurnal_list,
     jurnal_detail,
+    jurnal_search,
+    jurnal_autocomplete,
     membrie_application,
     membership_questions,
     robots_txt,
     newsletter_subscribe,
     newsletter_confirm,
+    newsletter_unsubscribe,
+    sitemap_xml,
+    sitemap_section_xml,
+    snapshot_detail,
+    snapshot_manifest,
 )
 
 api_router = WagtailAPIRouter("wagtailapi")
 api_router.register_endpoint("pages", PagesAPIViewSet)
 
-sitemaps = {
-    "jurnal": JurnalSitemap,
-    "jurnal-index": JurnalIndexSitemap,
-}
-
-
 @never_cache
 def spa_index(request):
     candidates = [
@@ -72,6 +70,12 @@ urlpatterns = [
     # ✅ Jurnal endpoints (headless for React)
     path("api/jurnal/", jurnal_list),
     path("api/jurnal/<slug:slug>/", jurnal_detail),
+    path("api/search/", jurnal_search),
+    path("api/search/autocomplete/", jurnal_autocomplete),
+
+    # ✅ Immutable content-hashed copies of the endpoints above + their manifest
+    path("api/snap/manifest.json", snapshot_manifest, name="api-snapshot-manifest"),
+    re_path(r"^api/snap/(?P<digest>[0-9a-f]{20})\.json$", snapshot_detail, name="api-snapshot"),
 
     # ✅ Membrie endpoints
     path("api/membrii/questions/", membership_questions),
@@ -80,17 +84,14 @@ urlpatterns = [
     # ✅ Newsletter endpoints
     path("api/newsletter/subscribe/", newsletter_subscribe),
     path("api/newsletter/confirm/", newsletter_confirm, name="newsletter-confirm"),
+    path("api/newsletter/unsubscribe/", newsletter_unsubscribe, name="newsletter-unsubscribe"),
 
     path("search/", search_views.search, name="search"),
 
     # ✅ SEO
     path("robots.txt", robots_txt),
-    path(
-        "sitemap.xml",
-        sitemap,
-        {"sitemaps": sitemaps},
-        name="django.contrib.sitemaps.views.sitemap",
-    ),
+    path("sitemap.xml", sitemap_xml, name="sitemap"),
+    path("sitemap-<slug:section>.xml", sitemap_section_xml, name="sitemap-section"),
 
     # (Optional) Wagtail-rendered pages (kept out of SPA catch-all)
     path("cms/", include(wagtail_urls)),
@@ -107,7 +108,7 @@ if settings.DEBUG:
 # ✅ SPA fallback — DO NOT hijack /media, /static, /assets (otherwise images become HTML)
 urlpatterns += [
     re_path(
-        r"^(?!api/|admin/|documents/|django-admin/|sitemap\.xml$|robots\.txt$|media/|static/|assets/|favicon\.ico$).*$",
+        r"^(?!api/|admin/|documents/|django-admin/|sitemap(-[\w-]+)?\.xml$|robots\.txt$|media/|static/|assets/|favicon\.ico$).*$",
         spa_index,
     ),
 ]
\ No newline at end of file
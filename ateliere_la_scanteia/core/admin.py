@@ -1,15 +1,15 @@
 # core/admin.py
-import csv
-import json
-
-from django.contrib import admin
-from django.http import HttpResponse
+from django.contrib import admin, messages
 
+from . import exports
 from .models import (
     MembershipApplication,
     MembershipQAItem,
+    NewsletterCampaign,
+    NewsletterDelivery,
     NewsletterSubscriber,
 )
+from .tasks import send_newsletter_campaign
 
 
 class MembershipQAItemInline(admin.TabularInline):
@@ -36,9 +36,9 @@ class MembershipApplicationAdmin(admin.ModelAdmin):
     search_fields = ("parent_name", "email", "phone", "child_name")
     date_hierarchy = "created_at"
     inlines = [MembershipQAItemInline]
-    actions = ["export_csv"]
+    actions = ["export_csv", "export_csv_gzip"]
 
-    def export_csv(self, request, queryset):
+    def export_csv(self, request, queryset, compress=False):
         """
         CSV export with:
         - base fields
@@ -46,97 +46,30 @@ class MembershipApplicationAdmin(admin.ModelAdmin):
         - raw_payload (as JSON string)
         - qa_json (as JSON string)
         - Q&A flattened into columns (Question 1 / Answer 1 ...).
+        Streamed, with a constant number of queries (see exports.membrie_admin_rows).
         """
-        resp = HttpResponse(content_type="text/csv; charset=utf-8")
-        resp["Content-Disposition"] = 'attachment; filename="membrie_applications.csv"'
-
-        # compute max QA count for header
-        max_qa = 0
-        for app in queryset:
-            cnt = app.qa_items.count()
-            if cnt > max_qa:
-                max_qa = cnt
-
-        fieldnames = [
-            "created_at",
-            "parent_name",
-            "phone",
-            "email",
-            "child_name",
-            "child_age",
-            "expectation",
-            "source",
-            "ip_address",
-            "user_agent",
-            "qa_json",
-            "raw_payload",
-        ]
-        for i in range(1, max_qa + 1):
-            fieldnames += [f"question_{i}", f"answer_{i}"]
-
-        writer = csv.DictWriter(resp, fieldnames=fieldnames)
-        writer.writeheader()
-
-        for app in queryset.prefetch_related("qa_items"):
-            row = {
-                "created_at": app.created_at.isoformat() if app.created_at else "",
-                "parent_name": app.parent_name,
-                "phone": app.phone,
-                "email": app.email,
-                "child_name": app.child_name,
-                "child_age": app.child_age,
-                "expectation": app.expectation,
-                "source": app.source,
-                "ip_address": app.ip_address or "",
-                "user_agent": app.user_agent or "",
-                "qa_json": json.dumps(app.qa_json, ensure_ascii=False) if app.qa_json is not None else "",
-                "raw_payload": json.dumps(app.raw_payload, ensure_ascii=False) if app.raw_payload is not None else "",
-            }
-
-            qa = list(app.qa_items.all())
-            for idx, item in enumerate(qa, start=1):
-                row[f"question_{idx}"] = item.question
-                row[f"answer_{idx}"] = item.answer
-
-            writer.writerow(row)
-
-        return resp
+        return exports.stream_csv(exports.membrie_admin_rows(queryset), "membrie_applications.csv", compress=compress)
 
     export_csv.short_description = "Exportă aplicațiile selectate în CSV"
 
+    def export_csv_gzip(self, request, queryset):
+        return self.export_csv(request, queryset, compress=True)
+
+    export_csv_gzip.short_description = "Exportă aplicațiile selectate în CSV (gzip)"
+
 
 @admin.action(description="Exportă abonații selectați (CSV)")
-def export_newsletter_csv(modeladmin, request, queryset):
-    resp = HttpResponse(content_type="text/csv; charset=utf-8")
-    resp["Content-Disposition"] = 'attachment; filename="newsletter_subscribers.csv"'
-
-    writer = csv.writer(resp)
-    writer.writerow(
-        [
-            "email",
-            "is_active",
-            "created_at",
-            "confirmed_at",
-            "source",
-            "ip_address",
-            "user_agent",
-        ]
+def export_newsletter_csv(modeladmin, request, queryset, compress=False):
+    return exports.stream_csv(
+        exports.newsletter_rows(queryset.order_by("-created_at")),
+        "newsletter_subscribers.csv",
+        compress=compress,
     )
 
-    for obj in queryset.order_by("-created_at"):
-        writer.writerow(
-            [
-                obj.email,
-                obj.is_active,
-                obj.created_at.isoformat() if obj.created_at else "",
-                obj.confirmed_at.isoformat() if obj.confirmed_at else "",
-                obj.source,
-                obj.ip_address or "",
-                obj.user_agent or "",
-            ]
-        )
 
-    return resp
+@admin.action(description="Exportă abonații selectați (CSV gzip)")
+def export_newsletter_csv_gzip(modeladmin, request, queryset):
+    return export_newsletter_csv(modeladmin, request, queryset, compress=True)
 
 
 @admin.register(NewsletterSubscriber)
@@ -145,4 +78,41 @@ class NewsletterSubscriberAdmin(admin.ModelAdmin):
     list_filter = ("is_active", "source", "created_at")
     search_fields = ("email",)
     date_hierarchy = "created_at"
-    actions = [export_newsletter_csv]
\ No newline at end of file
+    actions = [export_newsletter_csv, export_newsletter_csv_gzip]
+
+
+@admin.action(description="Trimite campaniile selectate (în fundal)")
+def send_newsletter_campaigns(modeladmin, request, queryset):
+    queued = 0
+    for campaign in queryset.filter(status__in=("draft", "failed")):
+        NewsletterCampaign.objects.filter(pk=campaign.pk).update(status="queued")
+        send_newsletter_campaign.enqueue(campaign.pk)
+        queued += 1
+
+    skipped = queryset.count() - queued
+    if queued:
+        modeladmin.message_user(request, f"{queued} campanii puse în coadă pentru trimitere.", messages.SUCCESS)
+    if skipped:
+        modeladmin.message_user(
+            request,
+            f"{skipped} campanii ignorate (deja în coadă / în curs / trimise).",
+            messages.WARNING,
+        )
+
+
+@admin.register(NewsletterCampaign)
+class NewsletterCampaignAdmin(admin.ModelAdmin):
+    list_display = ("subject", "status", "sent_count", "failed_count", "created_at", "started_at", "finished_at")
+    list_filter = ("status",)
+    search_fields = ("subject",)
+    readonly_fields = ("status", "started_at", "finished_at", "sent_count", "failed_count")
+    actions = [send_newsletter_campaigns]
+
+
+@admin.register(NewsletterDelivery)
+class NewsletterDeliveryAdmin(admin.ModelAdmin):
+    list_display = ("email", "campaign", "status", "sent_at")
+    list_filter = ("status", "campaign")
+    search_fields = ("email",)
+    list_select_related = ("campaign",)
+    readonly_fields = ("campaign", "subscriber", "email", "status", "sent_at", "error")
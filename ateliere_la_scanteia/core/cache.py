@@ -0,0 +1,140 @@
+# core/cache.py
+"""
+Cache-aside helpers for the headless API.
+
+Keys are namespaced and versioned ("<namespace>:<version>:<parts>"): invalidating
+a namespace is a single write to its version key, old entries are simply never
+read again and expire on their own TTL.
+
+Misses are single-flight: one worker rebuilds a key under a short cache lock while
+the others get the last built value (kept under an unversioned "stale" key) or,
+when there is none yet, wait a moment for the rebuild.
+"""
+import hashlib
+import time
+from typing import Callable, Optional, Tuple, TypeVar
+
+from django.conf import settings
+from django.core.cache import cache
+
+T = TypeVar("T")
+
+# Namespaces (bumped from the signal receivers in core.models)
+MAINPAGE = "core:mainpage"
+JURNAL = "core:jurnal"
+MEMBRIE_QUESTIONS = "core:membrie-questions"
+SITEMAP = "core:sitemap"
+# whole /api/ responses (core.middleware.ApiResponseCacheMiddleware), bumped on every content change
+API_RESPONSES = "core:api-response"
+
+VERSION_KEY = "{namespace}:version"
+STALE_KEY = "{namespace}:stale:{suffix}"
+# memcached refuses keys above 250 chars; part lists that would push a key past this are hashed
+MAX_KEY_LENGTH = 200
+LOCK_POLL_INTERVAL = 0.05
+
+
+class Uncached:
+    """
+    Builder result to return without storing it (e.g. derived from stale inputs):
+    get_or_build hands back the wrapped value with stale=True.
+    """
+
+    def __init__(self, value):
+        self.value = value
+
+
+def api_cache_ttl() -> int:
+    return int(getattr(settings, "API_CACHE_TTL", 300))
+
+
+def api_cache_stale_ttl() -> int:
+    return int(getattr(settings, "API_CACHE_STALE_TTL", 60 * 60 * 24))
+
+
+def get_version(namespace: str) -> int:
+    key = VERSION_KEY.format(namespace=namespace)
+    version = cache.get(key)
+    if version is None:
+        # never bumped or evicted: start from a fresh value, never from an old one
+        cache.add(key, time.time_ns(), None)
+        version = cache.get(key, 0)
+    return version
+
+
+def bump_version(*namespaces: str) -> None:
+    # set (not incr): backends emulating incr with get+set would reset the "never expire" timeout
+    for namespace in namespaces:
+        cache.set(VERSION_KEY.format(namespace=namespace), time.time_ns(), None)
+
+
+def _suffix(parts) -> str:
+    suffix = ":".join(str(part) for part in parts)
+    if len(suffix) > MAX_KEY_LENGTH - 60:
+        suffix = hashlib.sha1(suffix.encode()).hexdigest()
+    return suffix
+
+
+def versioned_key(namespace: str, *parts) -> str:
+    return f"{namespace}:{get_version(namespace)}:{_suffix(parts)}"
+
+
+def get_or_build(
+    namespace: str,
+    parts: tuple,
+    builder: Callable[[], Optional[T]],
+    timeout: Optional[int] = None,
+) -> Tuple[Optional[T], bool]:
+    """
+    Returns (value, stale): the cached value for (namespace, *parts), or calls `builder`
+    and stores its result for `timeout` seconds (API_CACHE_TTL by default). A None
+    result (e.g. unknown slug) is not cached, nor is an `Uncached` one; exceptions
+    from `builder` propagate.
+
+    Only the worker holding the rebuild lock calls `builder`; concurrent callers
+    get the stale value (stale=True: callers must not cache it as current content) or
+    wait up to API_CACHE_LOCK_WAIT seconds for the fresh one (and build it themselves
+    after that, so a crashed worker never blocks anyone).
+    The lock relies on an atomic cache.add(): redis, memcached, db and locmem; the
+    file backend (dev) may occasionally let two workers build.
+    """
+    key = versioned_key(namespace, *parts)
+    value = cache.get(key)
+    if value is not None:
+        return value, False
+
+    stale_key = STALE_KEY.format(namespace=namespace, suffix=_suffix(parts))
+    lock_key = f"{key}:lock"
+    lock_timeout = int(getattr(settings, "API_CACHE_LOCK_TIMEOUT", 10))
+    if not cache.add(lock_key, 1, lock_timeout):
+        stale = cache.get(stale_key)
+        if stale is not None:
+            return stale, True
+        deadline = time.monotonic() + float(getattr(settings, "API_CACHE_LOCK_WAIT", 2))
+        while time.monotonic() < deadline:
+            time.sleep(LOCK_POLL_INTERVAL)
+            value = cache.get(key)
+            if value is not None:
+                return value, False
+        return _build(key, stale_key, builder, timeout)
+
+    try:
+        # the previous lock holder may have finished between our get() and add()
+        value = cache.get(key)
+        if value is not None:
+            return value, False
+        return _build(key, stale_key, builder, timeout)
+    finally:
+        cache.delete(lock_key)
+
+
+def _build(key, stale_key, builder, timeout):
+    value = builder()
+    if isinstance(value, Uncached):
+        return value.value, True
+    if value is None:
+        cache.delete(stale_key)
+    else:
+        cache.set(key, value, api_cache_ttl() if timeout is None else timeout)
+        cache.set(stale_key, value, api_cache_stale_ttl())
+    return value, False
@@ -0,0 +1,116 @@
+# core/cdn.py
+"""
+CDN surrogate keys + purging.
+
+Cacheable API responses carry their keys twice: `Surrogate-Key` (space separated,
+Fastly / Varnish) and `Cache-Tag` (comma separated, Cloudflare). Content changes
+purge exactly those keys through the backend in CDN_PURGER.
+"""
+import json
+import logging
+import urllib.request
+from datetime import datetime, timezone
+
+from django.conf import settings
+from django.db import transaction
+from django.utils.module_loading import import_string
+
+
+logger = logging.getLogger(__name__)
+
+MAINPAGE = "mainpage"
+MEMBRIE_FORM = "membrie-form"
+# jurnal list + search results (anything listing several articles)
+JURNAL = "jurnal"
+# /api/snap/manifest.json: points at new digests after any content change
+SNAPSHOT_MANIFEST = "snap-manifest"
+
+
+def page_key(page_id) -> str:
+    return f"page-{page_id}"
+
+
+def tag_response(response, *keys, stale=False):
+    """
+    Adds the surrogate keys and, unless the view set its own, a Cache-Control that
+    lets the CDN keep the response until it is purged (CDN_S_MAXAGE).
+
+    A `stale` body (served while another worker rebuilds it, see core.cache) gets only
+    a short browser max-age: no CDN caching, and the response cache won't store it.
+    """
+    keys = [key for key in keys if key]
+    if keys:
+        response["Surrogate-Key"] = " ".join(keys)
+        response["Cache-Tag"] = ",".join(keys)
+    if stale:
+        response.stale_content = True
+        response["Cache-Control"] = "public, max-age={}".format(int(getattr(settings, "API_STALE_MAX_AGE", 5)))
+    elif not response.has_header("Cache-Control"):
+        response["Cache-Control"] = "public, max-age={}, s-maxage={}".format(
+            int(getattr(settings, "API_RESPONSE_FRESH_TTL", 60)),
+            int(getattr(settings, "CDN_S_MAXAGE", 60 * 60 * 24)),
+        )
+    return response
+
+
+# ------------------------------------------------------------
+# Purger backends (CDN_PURGER = dotted path)
+# ------------------------------------------------------------
+class BasePurger:
+    def purge(self, keys):
+        raise NotImplementedError
+
+
+class LoggingPurger(BasePurger):
+    """Default: no CDN, only logs what would be purged."""
+
+    def purge(self, keys):
+        logger.info("CDN purge: %s", " ".join(keys))
+
+
+class FilePurger(BasePurger):
+    """Appends one JSON line per purge to CDN_PURGE_FILE (local setups / tests)."""
+
+    def purge(self, keys):
+        path = getattr(settings, "CDN_PURGE_FILE", "cdn-purges.log")
+        with open(path, "a", encoding="utf-8") as f:
+            f.write(json.dumps({"at": datetime.now(timezone.utc).isoformat(), "keys": list(keys)}) + "\n")
+
+
+class CloudflarePurger(BasePurger):
+    """Purge by Cache-Tag (CLOUDFLARE_ZONE_ID + CLOUDFLARE_API_TOKEN; tag purge needs an Enterprise zone)."""
+
+    def purge(self, keys):
+        request = urllib.request.Request(
+            f"https://api.cloudflare.com/client/v4/zones/{settings.CLOUDFLARE_ZONE_ID}/purge_cache",
+            data=json.dumps({"tags": list(keys)}).encode(),
+            headers={
+                "Authorization": f"Bearer {settings.CLOUDFLARE_API_TOKEN}",
+                "Content-Type": "application/json",
+            },
+            method="POST",
+        )
+        with urllib.request.urlopen(request, timeout=10) as response:
+            response.read()
+
+
+def get_purger() -> BasePurger:
+    return import_string(getattr(settings, "CDN_PURGER", "core.cdn.LoggingPurger"))()
+
+
+def purge(*keys):
+    """
+    Purges after the current transaction commits (the CDN must refetch the new content,
+    not the old one). A failing CDN never breaks publishing: errors are only logged.
+    """
+    keys = sorted({key for key in keys if key})
+    if not keys:
+        return
+
+    def run():
+        try:
+            get_purger().purge(keys)
+        except Exception:
+            logger.exception("CDN purge failed for %s", " ".join(keys))
+
+    transaction.on_commit(run)
@@ -0,0 +1,581 @@
+# core/exports.py
+import csv
+import gzip
+import io
+import json
+import tempfile
+import zlib
+from datetime import datetime, timedelta
+
+from django.conf import settings
+from django.core import signing
+from django.core.files import File
+from django.db import NotSupportedError, connections
+from django.db.models import Count, Func, IntegerField, Max, Q
+from django.db.models.fields.json import KeyTransform
+from django.http import FileResponse, StreamingHttpResponse
+from django.utils import timezone
+from openpyxl import Workbook
+from openpyxl.cell import WriteOnlyCell
+from openpyxl.cell.cell import ILLEGAL_CHARACTERS_RE
+from openpyxl.styles import Alignment, Font
+from openpyxl.utils import get_column_letter
+
+from .models import ExportJob, ExportWatermark, MembershipApplication, NewsletterSubscriber, qa_pairs
+
+
+# Rows fetched per round-trip (server-side cursor on Postgres, fetchmany on SQLite)
+CHUNK_SIZE = 2000
+
+
+# ----------------------------------
+# Helpers
+# ----------------------------------
+class Echo:
+    """
+    Pseudo-buffer for csv.writer: write() returns the line instead of storing it,
+    so every row goes straight into the StreamingHttpResponse.
+    """
+
+    def write(self, value):
+        return value
+
+
+def _json(value):
+    return json.dumps(value, ensure_ascii=False) if value is not None else ""
+
+
+# Row generators below yield typed values (datetime, bool, str);
+# every output format converts them in its own way.
+def _csv_value(value):
+    if isinstance(value, datetime):
+        return value.isoformat()
+    if value is None:
+        return ""
+    return value
+
+
+GZIP_CONTENT_TYPE = "application/gzip"
+
+# compressed output is handed to the response in pieces of at least this size
+GZIP_FLUSH_BYTES = 64 * 1024
+
+
+def gzip_stream(chunks, level=6):
+    """
+    Incrementally gzips an iterable of bytes/str: only zlib's window and one
+    pending output block are held in memory, never the whole file.
+    """
+    compressor = zlib.compressobj(level, zlib.DEFLATED, 31)  # wbits=31 -> gzip header/trailer
+    pending = []
+    size = 0
+    for chunk in chunks:
+        if isinstance(chunk, str):
+            chunk = chunk.encode("utf-8")
+        out = compressor.compress(chunk)
+        if out:
+            pending.append(out)
+            size += len(out)
+            if size >= GZIP_FLUSH_BYTES:
+                yield b"".join(pending)
+                pending = []
+                size = 0
+    pending.append(compressor.flush())
+    yield b"".join(pending)
+
+
+def stream_csv(rows, filename, compress=False):
+    """
+    rows: iterable of lists (header first). Nothing is buffered: the download
+    starts with the header and memory stays flat regardless of table size.
+    compress=True streams `filename`.gz, gzipped on the fly.
+    """
+    writer = csv.writer(Echo())
+    lines = (writer.writerow([_csv_value(v) for v in row]) for row in rows)
+    if compress:
+        response = StreamingHttpResponse(gzip_stream(lines), content_type=GZIP_CONTENT_TYPE)
+        filename += ".gz"
+    else:
+        response = StreamingHttpResponse(lines, content_type="text/csv; charset=utf-8")
+    response["Content-Disposition"] = f'attachment; filename="{filename}"'
+    return response
+
+
+# ----------------------------------
+# XLSX (openpyxl write-only mode: rows are flushed to disk as they are appended)
+# ----------------------------------
+XLSX_CONTENT_TYPE = "application/vnd.openxmlformats-officedocument.spreadsheetml.sheet"
+XLSX_MAX_CELL_CHARS = 32767  # Excel's hard limit per cell
+
+_XLSX_HEADER_FONT = Font(bold=True)
+_XLSX_WRAP = Alignment(wrap_text=True, vertical="top")
+
+
+def _xlsx_value(ws, value):
+    if isinstance(value, datetime):
+        # Excel has no timezones: write local (Europe/Bucharest) wall time
+        cell = WriteOnlyCell(ws, value=timezone.localtime(value).replace(tzinfo=None))
+        cell.number_format = "yyyy-mm-dd hh:mm"
+        return cell
+    if isinstance(value, str):
+        value = ILLEGAL_CHARACTERS_RE.sub("", value)[:XLSX_MAX_CELL_CHARS]
+        if "\n" in value:
+            cell = WriteOnlyCell(ws, value=value)
+            cell.alignment = _XLSX_WRAP
+            return cell
+    return value
+
+
+def _xlsx_column_width(name):
+    if name.endswith("_at"):
+        return 18
+    if name[:1] in ("Q", "A") and name[1:].isdigit():
+        return 40
+    return 22
+
+
+def write_xlsx(rows, fileobj, sheet_title="Export"):
+    """rows: iterable of lists (header first). Header row is bold and frozen."""
+    wb = Workbook(write_only=True)
+    ws = wb.create_sheet(title=sheet_title)
+    ws.freeze_panes = "A2"
+
+    rows = iter(rows)
+    header = next(rows)
+    for idx, name in enumerate(header, start=1):
+        ws.column_dimensions[get_column_letter(idx)].width = _xlsx_column_width(name)
+
+    header_cells = []
+    for name in header:
+        cell = WriteOnlyCell(ws, value=name)
+        cell.font = _XLSX_HEADER_FONT
+        header_cells.append(cell)
+    ws.append(header_cells)
+
+    for row in rows:
+        ws.append([_xlsx_value(ws, v) for v in row])
+
+    wb.save(fileobj)
+
+
+def _read_chunks(fileobj, size=GZIP_FLUSH_BYTES):
+    try:
+        while chunk := fileobj.read(size):
+            yield chunk
+    finally:
+        fileobj.close()
+
+
+def stream_xlsx(rows, filename, sheet_title="Export", compress=False):
+    """
+    The workbook is built in an anonymous temp file (flat memory), then streamed
+    back in chunks; the file disappears when the response is closed.
+    """
+    tmp = tempfile.TemporaryFile()
+    write_xlsx(rows, tmp, sheet_title=sheet_title)
+    tmp.seek(0)
+    if compress:
+        response = StreamingHttpResponse(gzip_stream(_read_chunks(tmp)), content_type=GZIP_CONTENT_TYPE)
+        response["Content-Disposition"] = f'attachment; filename="{filename}.gz"'
+        return response
+    return FileResponse(tmp, as_attachment=True, filename=filename, content_type=XLSX_CONTENT_TYPE)
+
+
+# ----------------------------------
+# Membrie (MembershipApplication)
+# ----------------------------------
+MEMBRIE_BASE_FIELDS = [
+    "created_at",
+    "parent_name",
+    "phone",
+    "email",
+    "child_name",
+    "child_age",
+    "expectation",
+    "source",
+]
+
+MEMBRIE_FULL_FIELDS = MEMBRIE_BASE_FIELDS + [
+    "ip_address",
+    "user_agent",
+    "art_relationship",
+    "qa_json",
+    "raw_payload",
+]
+
+
+def _membrie_queryset():
+    return MembershipApplication.objects.all().order_by("-created_at")
+
+
+class QACount(Func):
+    """
+    Postgres: number of Q&A items of an application, read from the JSON itself
+    (qa_json, or raw_payload.qa_items when qa_json is empty) — same rule as qa_pairs().
+    """
+
+    output_field = IntegerField()
+
+    def __init__(self, **extra):
+        super().__init__("qa_json", KeyTransform("qa_items", "raw_payload"), **extra)
+
+    def as_sql(self, compiler, connection, **extra_context):
+        raise NotSupportedError("QACount is only available on PostgreSQL; use qa_count elsewhere.")
+
+    def as_postgresql(self, compiler, connection, **extra_context):
+        (qa_sql, qa_params), (raw_sql, raw_params) = [compiler.compile(e) for e in self.get_source_expressions()]
+        sql = (
+            f"CASE WHEN jsonb_typeof({qa_sql}) = 'array' AND jsonb_array_length({qa_sql}) > 0 "
+            f"THEN jsonb_array_length({qa_sql}) "
+            f"WHEN jsonb_typeof({raw_sql}) = 'array' THEN jsonb_array_length({raw_sql}) "
+            f"ELSE 0 END"
+        )
+        return sql, (*qa_params, *qa_params, *qa_params, *raw_params, *raw_params)
+
+
+def membrie_max_qa(queryset=None):
+    """
+    Largest number of Q&A pairs in `queryset` (sizes the Q1/A1... header),
+    computed by the database in a single aggregate:
+    - Postgres: MAX over the JSON array lengths
+    - elsewhere: MAX(qa_count), the column maintained by MembershipApplication.save()
+    """
+    queryset = _membrie_queryset() if queryset is None else queryset
+    if connections[queryset.db].vendor == "postgresql":
+        expression = QACount()
+    else:
+        expression = "qa_count"
+    return queryset.order_by().aggregate(max_qa=Max(expression))["max_qa"] or 0
+
+
+def membrie_ordered_rows(queryset=None):
+    """
+    Ordered, human-readable export:
+    - Base fields
+    - Q&A as Q1/A1, Q2/A2 ... (shows both question AND answer)
+    - No raw_payload / user_agent (clean)
+    """
+    queryset = _membrie_queryset() if queryset is None else queryset
+    max_qa = membrie_max_qa(queryset)
+
+    header = list(MEMBRIE_BASE_FIELDS)
+    for i in range(1, max_qa + 1):
+        header += [f"Q{i}", f"A{i}"]
+    yield header
+
+    rows = queryset.values_list(*MEMBRIE_BASE_FIELDS, "qa_json", "raw_payload").iterator(chunk_size=CHUNK_SIZE)
+    for created_at, *base, qa_json, raw_payload in rows:
+        row = [created_at, *base]
+        for q, a in qa_pairs(qa_json, raw_payload):
+            row += [q, a]
+        row += [""] * (len(header) - len(row))
+        yield row
+
+
+def membrie_full_rows(queryset=None):
+    """
+    FULL/AUDIT export:
+    - Includes audit + JSON blobs for debugging
+    """
+    queryset = _membrie_queryset() if queryset is None else queryset
+    yield list(MEMBRIE_FULL_FIELDS)
+
+    for (
+        created_at,
+        *base,
+        ip_address,
+        user_agent,
+        art_relationship,
+        qa_json,
+        raw_payload,
+    ) in queryset.values_list(*MEMBRIE_FULL_FIELDS).iterator(chunk_size=CHUNK_SIZE):
+        yield [
+            created_at,
+            *base,
+            ip_address or "",
+            user_agent or "",
+            art_relationship or "",
+            _json(qa_json),
+            _json(raw_payload),
+        ]
+
+
+MEMBRIE_ADMIN_FIELDS = [
+    "created_at",
+    "parent_name",
+    "phone",
+    "email",
+    "child_name",
+    "child_age",
+    "expectation",
+    "source",
+    "ip_address",
+    "user_agent",
+    "qa_json",
+    "raw_payload",
+]
+
+
+def membrie_admin_rows(queryset):
+    """
+    Django admin "export selected" action: base + audit fields, JSON blobs,
+    then the MembershipQAItem rows flattened as question_1/answer_1 ...
+
+    Queries: one aggregate (COUNT per application, MAX over those) for the header,
+    then one SELECT per CHUNK_SIZE applications + one prefetch of their Q&A items.
+    """
+    queryset = queryset.order_by("-created_at")
+    max_qa = queryset.annotate(qa_total=Count("qa_items")).aggregate(max_qa=Max("qa_total"))["max_qa"] or 0
+
+    header = list(MEMBRIE_ADMIN_FIELDS)
+    for i in range(1, max_qa + 1):
+        header += [f"question_{i}", f"answer_{i}"]
+    yield header
+
+    for app in queryset.prefetch_related("qa_items").iterator(chunk_size=CHUNK_SIZE):
+        row = [
+            app.created_at,
+            app.parent_name,
+            app.phone,
+            app.email,
+            app.child_name,
+            app.child_age,
+            app.expectation,
+            app.source,
+            app.ip_address or "",
+            app.user_agent or "",
+            _json(app.qa_json),
+            _json(app.raw_payload),
+        ]
+        for item in app.qa_items.all():
+            row += [item.question, item.answer]
+        row += [""] * (len(header) - len(row))
+        yield row
+
+
+# ----------------------------------
+# Newsletter
+# ----------------------------------
+NEWSLETTER_FIELDS = [
+    "email",
+    "is_active",
+    "created_at",
+    "confirmed_at",
+    "source",
+    "ip_address",
+    "user_agent",
+]
+
+
+def newsletter_all_queryset():
+    return NewsletterSubscriber.objects.all().order_by("-created_at")
+
+
+def newsletter_active_queryset():
+    return NewsletterSubscriber.objects.filter(is_active=True).order_by("-confirmed_at", "-created_at")
+
+
+def newsletter_rows(queryset):
+    yield list(NEWSLETTER_FIELDS)
+
+    for email, is_active, created_at, confirmed_at, source, ip_address, user_agent in queryset.values_list(
+        *NEWSLETTER_FIELDS
+    ).iterator(chunk_size=CHUNK_SIZE):
+        yield [
+            email,
+            is_active,
+            created_at,
+            confirmed_at,
+            source,
+            ip_address or "",
+            user_agent or "",
+        ]
+
+
+# ----------------------------------
+# Background export jobs (ExportJob, run by core.tasks.run_export_job → generate_export)
+# ----------------------------------
+# kind -> (queryset factory, row generator, base filename, XLSX sheet title)
+EXPORT_KINDS = {
+    "membrie_ordered": (_membrie_queryset, membrie_ordered_rows, "membrie_applications_ordered", "Aplicații"),
+    "membrie_full": (_membrie_queryset, membrie_full_rows, "membrie_applications_full", "Aplicații"),
+    "newsletter_all": (newsletter_all_queryset, newsletter_rows, "newsletter_subscribers_all", "Abonați"),
+    "newsletter_active": (newsletter_active_queryset, newsletter_rows, "newsletter_subscribers_active", "Abonați activi"),
+}
+
+# "since last export": the (timestamp, id) pair a kind's watermark advances on
+DELTA_FIELDS = {
+    "membrie_ordered": "created_at",
+    "membrie_full": "created_at",
+    "newsletter_all": "created_at",
+    "newsletter_active": "confirmed_at",
+}
+
+# rows_done is written to the DB every PROGRESS_EVERY rows (admin progress bar)
+PROGRESS_EVERY = 1000
+
+EXPORT_DOWNLOAD_SALT = "core.exports.download"
+
+
+def write_csv(rows, fileobj, compress=False):
+    """rows: iterable of lists (header first), written to a binary file object as UTF-8."""
+    raw = gzip.GzipFile(fileobj=fileobj, mode="wb") if compress else fileobj
+    text = io.TextIOWrapper(raw, encoding="utf-8", newline="")
+    writer = csv.writer(text)
+    for row in rows:
+        writer.writerow([_csv_value(v) for v in row])
+    text.flush()
+    text.detach()
+    if compress:
+        raw.close()  # writes the gzip trailer; fileobj itself stays open
+
+
+def _track_progress(rows, job_id, every=PROGRESS_EVERY):
+    done = 0
+    for i, row in enumerate(rows):
+        yield row
+        if i == 0:
+            continue  # header
+        done = i
+        if done % every == 0:
+            ExportJob.objects.filter(pk=job_id).update(rows_done=done)
+    ExportJob.objects.filter(pk=job_id).update(rows_done=done)
+
+
+def get_watermark(user, kind):
+    if user is None:
+        return None
+    return ExportWatermark.objects.filter(user=user, kind=kind).first()
+
+
+def delta_window(queryset, kind, watermark):
+    """
+    Narrows `queryset` to rows after `watermark` and up to the newest row right now,
+    so rows arriving during the export are left for the next one.
+    Returns (queryset, (last_at, last_id) or None when there is nothing new).
+    """
+    field = DELTA_FIELDS[kind]
+    queryset = queryset.filter(**{f"{field}__isnull": False})
+    if watermark:
+        queryset = queryset.filter(
+            Q(**{f"{field}__gt": watermark.last_at}) | Q(**{field: watermark.last_at, "id__gt": watermark.last_id})
+        )
+    top = queryset.order_by(f"-{field}", "-id").values_list(field, "id").first()
+    if top:
+        queryset = queryset.filter(Q(**{f"{field}__lt": top[0]}) | Q(**{field: top[0], "id__lte": top[1]}))
+    return queryset, top
+
+
+def export_filename(job):
+    base = EXPORT_KINDS[job.kind][2]
+    if job.since_last:
+        base += "_delta"
+    stamp = timezone.localtime(job.created_at).strftime("%Y%m%d-%H%M")
+    name = f"{base}_{stamp}.{job.file_format}"
+    return f"{name}.gz" if job.compress else name
+
+
+def generate_export(job):
+    """
+    Writes the export into a temp file, then stores it in the private "exports" storage.
+    XLSX is already a zip archive, so `compress` only applies to CSV.
+    With `since_last` only rows past the user's ExportWatermark are exported,
+    and the watermark moves forward once the file is stored.
+    """
+    queryset_factory, row_generator, _, sheet_title = EXPORT_KINDS[job.kind]
+    queryset = queryset_factory()
+    top = None
+    if job.since_last and job.created_by_id:
+        queryset, top = delta_window(queryset, job.kind, get_watermark(job.created_by_id, job.kind))
+
+    job.status = "running"
+    job.started_at = timezone.now()
+    job.rows_total = queryset.count()
+    job.rows_done = 0
+    job.error = ""
+    ExportJob.objects.filter(pk=job.pk).update(
+        status=job.status, started_at=job.started_at, rows_total=job.rows_total, rows_done=0, error=""
+    )
+
+    try:
+        rows = _track_progress(row_generator(queryset), job.pk)
+        with tempfile.TemporaryFile() as tmp:
+            if job.file_format == "xlsx":
+                job.compress = False
+                write_xlsx(rows, tmp, sheet_title=sheet_title)
+            else:
+                write_csv(rows, tmp, compress=job.compress)
+            tmp.seek(0)
+            job.file.save(export_filename(job), File(tmp), save=False)
+    except Exception as e:
+        ExportJob.objects.filter(pk=job.pk).update(
+            status="failed", error=str(e)[:1000] or e.__class__.__name__, finished_at=timezone.now()
+        )
+        raise
+
+    job.status = "done"
+    job.finished_at = timezone.now()
+    if top:
+        ExportWatermark.objects.update_or_create(
+            user_id=job.created_by_id, kind=job.kind, defaults={"last_at": top[0], "last_id": top[1]}
+        )
+    job.save(update_fields=["status", "finished_at", "file", "compress"])
+    job.refresh_from_db(fields=["rows_done"])
+    return job
+
+
+def export_retention_days():
+    return int(getattr(settings, "EXPORT_RETENTION_DAYS", 7))
+
+
+def expired_export_jobs(now=None):
+    """Finished jobs (done/failed) older than EXPORT_RETENTION_DAYS; queued/running ones are never touched."""
+    cutoff = (now or timezone.now()) - timedelta(days=export_retention_days())
+    return ExportJob.objects.filter(status__in=("done", "failed"), created_at__lt=cutoff)
+
+
+def delete_expired_exports(now=None, dry_run=False):
+    """
+    Removes the files of expired jobs from the private storage, then the ExportJob rows.
+    Returns the number of jobs (that would be) deleted.
+    """
+    jobs = expired_export_jobs(now).only("id", "file")
+    if dry_run:
+        return jobs.count()
+    deleted = 0
+    for job in jobs.iterator():
+        if job.file:
+            # FileSystemStorage.delete ignores files that are already gone
+            job.file.delete(save=False)
+        job.delete()
+        deleted += 1
+    return deleted
+
+
+def export_download_max_age():
+    return int(getattr(settings, "EXPORT_DOWNLOAD_MAX_AGE", 3600))
+
+
+def export_download_token(job):
+    return signing.TimestampSigner(salt=EXPORT_DOWNLOAD_SALT).sign(str(job.pk))
+
+
+def check_export_download_token(token):
+    """Returns the job id, or None if the link was tampered with or expired."""
+    try:
+        value = signing.TimestampSigner(salt=EXPORT_DOWNLOAD_SALT).unsign(token, max_age=export_download_max_age())
+    except signing.BadSignature:  # includes SignatureExpired
+        return None
+    return int(value) if value.isdigit() else None
+
+
+def export_file_response(job):
+    content_type = GZIP_CONTENT_TYPE if job.compress else (
+        XLSX_CONTENT_TYPE if job.file_format == "xlsx" else "text/csv; charset=utf-8"
+    )
+    return FileResponse(
+        job.file.open("rb"),
+        as_attachment=True,
+        filename=job.file.name.rsplit("/", 1)[-1],
+        content_type=content_type,
+    )
@@ -0,0 +1,30 @@
+# core/management/commands/cleanup_exports.py
+from django.core.management.base import BaseCommand
+
+from core.exports import delete_expired_exports, export_retention_days
+
+
+class Command(BaseCommand):
+    help = (
+        "Delete finished admin exports (files in EXPORTS_ROOT + ExportJob rows) older than "
+        "EXPORT_RETENTION_DAYS. Safe to schedule (cron / Railway cron)."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--dry-run",
+            action="store_true",
+            help="Only count the exports that would be deleted.",
+        )
+
+    def handle(self, *args, **options):
+        dry_run = bool(options.get("dry_run"))
+        if dry_run:
+            self.stdout.write(self.style.WARNING("DRY RUN enabled — no changes will be saved."))
+
+        deleted = delete_expired_exports(dry_run=dry_run)
+
+        verb = "Would delete" if dry_run else "Deleted"
+        self.stdout.write(
+            self.style.SUCCESS(f"Done. {verb} {deleted} exports older than {export_retention_days()} days.")
+        )
@@ -0,0 +1,60 @@
+# core/management/commands/cleanup_newsletter_pending.py
+from django.core.management.base import BaseCommand
+
+from core.newsletter import cleanup_expired_pending, expired_pending_subscribers
+
+
+class Command(BaseCommand):
+    help = (
+        "Delete (optionally archive to CSV) newsletter subscribers that never confirmed and whose "
+        "confirmation link expired (NEWSLETTER_CONFIRM_TTL_HOURS). Safe to schedule (cron / Railway cron)."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--batch-size", dest="batch_size", type=int, default=1000)
+        parser.add_argument(
+            "--archive",
+            dest="archive_path",
+            default=None,
+            help="Append deleted rows to this CSV file before deleting them.",
+        )
+        parser.add_argument(
+            "--pause",
+            type=float,
+            default=0.0,
+            help="Seconds to sleep between batches (gives other queries room on a busy DB).",
+        )
+        parser.add_argument(
+            "--dry-run",
+            action="store_true",
+            help="Only count the rows that would be deleted.",
+        )
+
+    def handle(self, *args, **options):
+        dry_run = bool(options.get("dry_run"))
+
+        if dry_run:
+            self.stdout.write(self.style.WARNING("DRY RUN enabled — no changes will be saved."))
+        else:
+            self.stdout.write(
+                self.style.MIGRATE_HEADING(f"Expired pending subscribers: ~{expired_pending_subscribers().count()}")
+            )
+
+        stats = cleanup_expired_pending(
+            batch_size=options["batch_size"],
+            archive_path=options.get("archive_path"),
+            dry_run=dry_run,
+            pause=options["pause"],
+            log=self.stdout.write,
+        )
+
+        verb = "Would delete" if dry_run else "Deleted"
+        self.stdout.write("")
+        self.stdout.write(
+            self.style.SUCCESS(
+                f"Done. {verb}: {stats['processed']} in {stats['seconds']:.2f}s "
+                f"({stats['per_second']:.0f} rows/s)"
+            )
+        )
+        if options.get("archive_path") and not dry_run:
+            self.stdout.write(self.style.NOTICE(f"Archive: {options['archive_path']}"))
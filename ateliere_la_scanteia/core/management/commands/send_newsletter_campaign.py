@@ -0,0 +1,71 @@
+# core/management/commands/send_newsletter_campaign.py
+from django.core.management.base import BaseCommand, CommandError
+
+from core.models import NewsletterCampaign
+from core.newsletter import CLAIMABLE_STATUSES, CampaignNotClaimed, send_campaign
+
+
+class Command(BaseCommand):
+    help = (
+        "Send a NewsletterCampaign to all confirmed subscribers (batched, parallel SMTP, rate-limited). "
+        "Re-run the same command to resume an interrupted campaign; failed deliveries are only "
+        "retried with --retry-failed."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("campaign_id", type=int)
+        parser.add_argument("--batch-size", dest="batch_size", type=int, default=None)
+        parser.add_argument("--workers", type=int, default=None, help="Parallel SMTP connections.")
+        parser.add_argument(
+            "--rate",
+            dest="rate_per_minute",
+            type=int,
+            default=None,
+            help="Max messages per minute (0 = no cap). Defaults to NEWSLETTER_CAMPAIGN_RATE_PER_MINUTE.",
+        )
+        parser.add_argument(
+            "--force",
+            action="store_true",
+            help="Run even if the campaign is marked as sending/sent (e.g. the previous worker was killed).",
+        )
+        parser.add_argument(
+            "--retry-failed",
+            dest="retry_failed",
+            action="store_true",
+            help="Put the failed deliveries back in the queue and send them again.",
+        )
+
+    def handle(self, *args, **options):
+        try:
+            campaign = NewsletterCampaign.objects.get(pk=options["campaign_id"])
+        except NewsletterCampaign.DoesNotExist:
+            raise CommandError(f"Campaign {options['campaign_id']} does not exist.")
+
+        if campaign.status not in CLAIMABLE_STATUSES and not options["force"]:
+            raise CommandError(
+                f"Campaign {campaign.pk} is already '{campaign.status}'. Use --force to resume it anyway."
+            )
+
+        self.stdout.write(self.style.MIGRATE_HEADING(f"Campaign #{campaign.pk}: {campaign.subject}"))
+
+        try:
+            stats = send_campaign(
+                campaign,
+                batch_size=options["batch_size"],
+                workers=options["workers"],
+                rate_per_minute=options["rate_per_minute"],
+                statuses=None if options["force"] else CLAIMABLE_STATUSES,
+                retry_failed=options["retry_failed"],
+                log=self.stdout.write,
+            )
+        except CampaignNotClaimed:
+            # the task worker (or another command) started it after the check above
+            raise CommandError(f"Campaign {campaign.pk} was started by another run. Use --force to resume it anyway.")
+
+        self.stdout.write("")
+        self.stdout.write(
+            self.style.SUCCESS(
+                f"Done. Sent: {stats['sent']}, Failed: {stats['failed']} "
+                f"in {stats['seconds']:.1f}s ({stats['per_second']:.1f} msg/s)"
+            )
+        )
@@ -0,0 +1,64 @@
+# core/management/commands/warm_cache.py
+import time
+
+from django.core.management.base import BaseCommand
+from wagtail.models import Site
+
+from core import cache as api_cache
+from core.models import JurnalArticlePage
+from core.views import (
+    _get_jurnal_index,
+    jurnal_detail_payload,
+    jurnal_list_payload,
+    mainpage_payload,
+    membrie_question_schema,
+    snapshot_manifest_payload,
+)
+
+
+class Command(BaseCommand):
+    help = (
+        "Pre-populate the headless API cache (mainpage, membrie questions, jurnal list + every "
+        "jurnal article, snapshot manifests) so the first visitors after a deploy don't pay for the cold cache."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--only-missing",
+            action="store_true",
+            help="Keep payloads that are already cached (default: rebuild everything, the code may have changed).",
+        )
+
+    def handle(self, *args, **options):
+        started = time.monotonic()
+        if not options.get("only_missing"):
+            api_cache.bump_version(
+                api_cache.MAINPAGE, api_cache.MEMBRIE_QUESTIONS, api_cache.JURNAL, api_cache.API_RESPONSES
+            )
+
+        warmed = 0
+        for site in Site.objects.all():
+            mainpage_payload(site)
+            membrie_question_schema(site)
+            warmed += 2
+            self.stdout.write(f"Site {site.hostname}: mainpage + membrie questions")
+
+        jurnal_list_payload()
+        articles = 0
+        index = _get_jurnal_index()
+        if index:
+            slugs = JurnalArticlePage.objects.child_of(index).live().public().values_list("slug", flat=True)
+            for slug in slugs.iterator():
+                jurnal_detail_payload(slug)
+                articles += 1
+        warmed += 1 + articles
+        self.stdout.write(f"Jurnal: list + {articles} articles")
+
+        # after the payloads above, so building the manifests only stores their snapshots
+        for site in Site.objects.all():
+            snapshot_manifest_payload(site)
+            warmed += 1
+
+        self.stdout.write(
+            self.style.SUCCESS(f"Done. {warmed} payloads cached in {time.monotonic() - started:.2f}s")
+        )
@@ -0,0 +1,182 @@
+# core/middleware.py
+import copy
+import gzip
+import logging
+import time
+from concurrent.futures import ThreadPoolExecutor
+from urllib.parse import urlencode
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import connection
+from django.http import HttpResponse
+from django.utils.cache import cc_delim_re, patch_vary_headers
+
+from . import cache as api_cache
+
+try:
+    import brotli
+except ImportError:  # optional: without it only gzip variants are stored
+    brotli = None
+
+
+logger = logging.getLogger(__name__)
+
+# Headers that belong to one visitor / are re-added by the outer middleware on every response
+SKIPPED_HEADERS = {"set-cookie", "vary", "age", "x-cache", "content-length", "content-encoding"}
+# Vary headers the stored entry still honours (the variant is picked per request / same for all origins);
+# a response varying on anything else (Accept, Cookie, ...) is not stored
+SAFE_VARY = {"accept-encoding", "origin"}
+# Preferred first when the client accepts both
+ENCODINGS = ("br", "gzip")
+
+_executor = None
+
+
+def _refresh_executor():
+    global _executor
+    if _executor is None:
+        _executor = ThreadPoolExecutor(
+            max_workers=int(getattr(settings, "API_RESPONSE_CACHE_WORKERS", 2)),
+            thread_name_prefix="api-cache-refresh",
+        )
+    return _executor
+
+
+class ApiResponseCacheMiddleware:
+    """
+    Stale-while-revalidate cache for the headless GET endpoints (API_RESPONSE_CACHE_PATHS).
+
+    Whole 200 responses are stored per host (= Wagtail Site), path and sorted query string:
+    - younger than API_RESPONSE_FRESH_TTL: served as is (X-Cache: HIT)
+    - up to API_RESPONSE_STALE_TTL more: served at once (X-Cache: STALE) while one
+      background thread renders the view again and replaces the entry
+    Publishing / settings saves bump the namespace (receivers in core.models), so edits
+    never wait for the stale window.
+
+    Bodies above API_COMPRESS_MIN_BYTES are compressed once, when the entry is stored
+    (gzip, + Brotli when the `brotli` package is installed); every response then picks
+    the best variant from Accept-Encoding without compressing anything per request.
+    """
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        if not self._cacheable_request(request):
+            return self.get_response(request)
+
+        key = self._key(request)
+        entry = cache.get(key)
+        if entry is not None:
+            age = time.time() - entry["stored_at"]
+            if age < self.fresh_ttl:
+                return self._from_entry(request, entry, "HIT", age)
+            if cache.add(f"{key}:refresh", 1, int(getattr(settings, "API_CACHE_LOCK_TIMEOUT", 10))):
+                _refresh_executor().submit(self._refresh, key, copy.copy(request))
+            return self._from_entry(request, entry, "STALE", age)
+
+        response = self.get_response(request)
+        entry = self._store(key, response)
+        if entry is None:
+            response["X-Cache"] = "MISS"
+            return response
+        return self._from_entry(request, entry, "MISS", 0)
+
+    @property
+    def fresh_ttl(self):
+        return int(getattr(settings, "API_RESPONSE_FRESH_TTL", 60))
+
+    @property
+    def stale_ttl(self):
+        return int(getattr(settings, "API_RESPONSE_STALE_TTL", 60 * 60))
+
+    def _cacheable_request(self, request):
+        if request.method not in ("GET", "HEAD"):
+            return False
+        return any(request.path.startswith(prefix) for prefix in getattr(settings, "API_RESPONSE_CACHE_PATHS", ()))
+
+    def _key(self, request):
+        query = urlencode([(k, v) for k, values in sorted(request.GET.lists()) for v in values])
+        return api_cache.versioned_key(api_cache.API_RESPONSES, request.get_host(), request.path, query)
+
+    def _store(self, key, response):
+        if (
+            response.status_code != 200
+            or getattr(response, "stale_content", False)
+            or response.streaming
+            or response.cookies
+            or "no-store" in response.get("Cache-Control", "")
+            or "private" in response.get("Cache-Control", "")
+            or not _vary_is_safe(response)
+        ):
+            return None
+        entry = {
+            "stored_at": time.time(),
+            "content": response.content,
+            "headers": [(k, v) for k, v in response.items() if k.lower() not in SKIPPED_HEADERS],
+            "encoded": _compress(response.content),
+        }
+        cache.set(key, entry, self.fresh_ttl + self.stale_ttl)
+        return entry
+
+    def _refresh(self, key, request):
+        try:
+            self._store(key, self.get_response(request))
+        except Exception:
+            logger.exception("Background refresh failed for %s", request.get_full_path())
+        finally:
+            cache.delete(f"{key}:refresh")
+            # worker threads open their own DB connection; don't leak it
+            connection.close()
+
+    def _from_entry(self, request, entry, state, age):
+        encoded = entry.get("encoded") or {}
+        accepted = accepted_encodings(request.headers.get("Accept-Encoding", ""))
+        encoding = next((e for e in ENCODINGS if e in encoded and accepted.get(e, accepted.get("*", 0)) > 0), None)
+
+        response = HttpResponse(encoded[encoding] if encoding else entry["content"])
+        for header, value in entry["headers"]:
+            response[header] = value
+        if encoding:
+            response["Content-Encoding"] = encoding
+        if encoded:
+            patch_vary_headers(response, ("Accept-Encoding",))
+        response["Content-Length"] = str(len(response.content))
+        response["X-Cache"] = state
+        response["Age"] = str(int(age))
+        return response
+
+
+def _vary_is_safe(response):
+    vary = {header.strip().lower() for header in cc_delim_re.split(response.get("Vary", "")) if header.strip()}
+    return vary <= SAFE_VARY
+
+
+def accepted_encodings(header):
+    """Accept-Encoding -> {coding: q}; q=0 means "not this one", "*" covers the unlisted codings."""
+    accepted = {}
+    for item in header.split(","):
+        coding, _, params = item.strip().partition(";")
+        coding = coding.strip().lower()
+        if not coding:
+            continue
+        q = 1.0
+        params = params.strip()
+        if params.startswith("q="):
+            try:
+                q = float(params[2:])
+            except ValueError:
+                q = 0.0
+        accepted[coding] = q
+    return accepted
+
+
+def _compress(content):
+    if len(content) < int(getattr(settings, "API_COMPRESS_MIN_BYTES", 512)):
+        return {}
+    encoded = {"gzip": gzip.compress(content, compresslevel=int(getattr(settings, "API_GZIP_LEVEL", 6)), mtime=0)}
+    if brotli is not None:
+        encoded["br"] = brotli.compress(content, quality=int(getattr(settings, "API_BROTLI_QUALITY", 5)))
+    # keep a variant only when it is actually smaller
+    return {encoding: body for encoding, body in encoded.items() if len(body) < len(content)}
@@ -0,0 +1,54 @@
+# Generated by Django 6.0.2 on 2026-10-19 11:59
+
+import django.db.models.deletion
+import django.utils.timezone
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0025_alter_mainpagecontent_manifest_text_and_more'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='NewsletterCampaign',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('subject', models.CharField(max_length=255)),
+                ('body_text', models.TextField(help_text='Varianta text a emailului (obligatorie).')),
+                ('body_html', models.TextField(blank=True, default='', help_text='Varianta HTML (opțional).')),
+                ('status', models.CharField(choices=[('draft', 'Draft'), ('queued', 'În coadă'), ('sending', 'Se trimite'), ('sent', 'Trimisă'), ('failed', 'Eșuată')], db_index=True, default='draft', max_length=20)),
+                ('created_at', models.DateTimeField(default=django.utils.timezone.now)),
+                ('started_at', models.DateTimeField(blank=True, null=True)),
+                ('finished_at', models.DateTimeField(blank=True, null=True)),
+                ('sent_count', models.PositiveIntegerField(default=0)),
+                ('failed_count', models.PositiveIntegerField(default=0)),
+            ],
+            options={
+                'verbose_name': 'Campanie Newsletter',
+                'verbose_name_plural': 'Campanii Newsletter',
+                'ordering': ['-created_at'],
+            },
+        ),
+        migrations.CreateModel(
+            name='NewsletterDelivery',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('email', models.EmailField(max_length=254)),
+                ('status', models.CharField(choices=[('pending', 'În așteptare'), ('sent', 'Trimis'), ('failed', 'Eșuat')], default='pending', max_length=20)),
+                ('sent_at', models.DateTimeField(blank=True, null=True)),
+                ('error', models.TextField(blank=True, default='')),
+                ('campaign', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='deliveries', to='core.newslettercampaign')),
+                ('subscriber', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, to='core.newslettersubscriber')),
+            ],
+            options={
+                'verbose_name': 'Livrare Newsletter',
+                'verbose_name_plural': 'Livrări Newsletter',
+                'ordering': ['id'],
+                'indexes': [models.Index(fields=['campaign', 'status', 'id'], name='newsletter_delivery_progress')],
+                'constraints': [models.UniqueConstraint(fields=('campaign', 'email'), name='newsletter_delivery_unique_email')],
+            },
+        ),
+    ]
@@ -0,0 +1,17 @@
+# Generated by Django 6.0.2 on 2026-10-19 12:00
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0026_newslettercampaign_newsletterdelivery'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='newslettersubscriber',
+            index=models.Index(condition=models.Q(('is_active', False)), fields=['confirm_sent_at', 'id'], name='newsletter_pending_sent_idx'),
+        ),
+    ]
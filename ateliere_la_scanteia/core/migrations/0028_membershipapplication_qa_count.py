@@ -0,0 +1,44 @@
+# Generated by Django 6.0.2 on 2026-10-19 12:10
+
+from django.db import migrations, models
+
+
+def _qa_count(qa_json, raw_payload):
+    # same rule as core.models.qa_pairs()
+    qa = qa_json
+    if not qa and isinstance(raw_payload, dict):
+        qa = raw_payload.get("qa_items")
+    if not isinstance(qa, list):
+        return 0
+    return sum(1 for item in qa if isinstance(item, dict) and str(item.get("question") or "").strip())
+
+
+def backfill_qa_count(apps, schema_editor):
+    MembershipApplication = apps.get_model("core", "MembershipApplication")
+
+    batch = []
+    for obj in MembershipApplication.objects.only("id", "qa_json", "raw_payload").iterator(chunk_size=1000):
+        obj.qa_count = _qa_count(obj.qa_json, obj.raw_payload)
+        if obj.qa_count:
+            batch.append(obj)
+        if len(batch) >= 1000:
+            MembershipApplication.objects.bulk_update(batch, ["qa_count"])
+            batch = []
+    if batch:
+        MembershipApplication.objects.bulk_update(batch, ["qa_count"])
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0027_newslettersubscriber_pending_index'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='membershipapplication',
+            name='qa_count',
+            field=models.PositiveIntegerField(default=0, editable=False),
+        ),
+        migrations.RunPython(backfill_qa_count, migrations.RunPython.noop),
+    ]
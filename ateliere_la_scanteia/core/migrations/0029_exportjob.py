@@ -0,0 +1,41 @@
+# Generated by Django 6.0.2 on 2026-10-19 12:12
+
+import core.models
+import django.db.models.deletion
+import django.utils.timezone
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0028_membershipapplication_qa_count'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ExportJob',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('kind', models.CharField(choices=[('membrie_ordered', 'Membrie (Ordonat Q/A)'), ('membrie_full', 'Membrie (Full/Audit)'), ('newsletter_all', 'Newsletter (All)'), ('newsletter_active', 'Newsletter (Active)')], max_length=32)),
+                ('file_format', models.CharField(choices=[('csv', 'CSV'), ('xlsx', 'XLSX')], default='csv', max_length=8)),
+                ('compress', models.BooleanField(default=False, help_text='gzip (.gz)')),
+                ('status', models.CharField(choices=[('queued', 'În coadă'), ('running', 'În lucru'), ('done', 'Gata'), ('failed', 'Eșuat')], default='queued', max_length=20)),
+                ('rows_total', models.PositiveIntegerField(default=0)),
+                ('rows_done', models.PositiveIntegerField(default=0)),
+                ('file', models.FileField(blank=True, storage=core.models.exports_storage, upload_to='exports/%Y/%m/')),
+                ('error', models.TextField(blank=True, default='')),
+                ('created_at', models.DateTimeField(db_index=True, default=django.utils.timezone.now)),
+                ('started_at', models.DateTimeField(blank=True, null=True)),
+                ('finished_at', models.DateTimeField(blank=True, null=True)),
+                ('created_by', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='+', to=settings.AUTH_USER_MODEL)),
+            ],
+            options={
+                'verbose_name': 'Export',
+                'verbose_name_plural': 'Exporturi',
+                'ordering': ['-created_at'],
+            },
+        ),
+    ]
@@ -0,0 +1,48 @@
+# Generated by Django 6.0.2 on 2026-10-19 12:15
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0029_exportjob'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ExportWatermark',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('kind', models.CharField(choices=[('membrie_ordered', 'Membrie (Ordonat Q/A)'), ('membrie_full', 'Membrie (Full/Audit)'), ('newsletter_all', 'Newsletter (All)'), ('newsletter_active', 'Newsletter (Active)')], max_length=32)),
+                ('last_at', models.DateTimeField()),
+                ('last_id', models.BigIntegerField()),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+            ],
+            options={
+                'verbose_name': 'Reper export',
+                'verbose_name_plural': 'Repere export',
+            },
+        ),
+        migrations.AddField(
+            model_name='exportjob',
+            name='since_last',
+            field=models.BooleanField(default=False, help_text='Doar rândurile noi de la ultimul export (ExportWatermark)'),
+        ),
+        migrations.AddIndex(
+            model_name='newslettersubscriber',
+            index=models.Index(condition=models.Q(('is_active', True)), fields=['confirmed_at', 'id'], name='newsletter_confirmed_idx'),
+        ),
+        migrations.AddField(
+            model_name='exportwatermark',
+            name='user',
+            field=models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='+', to=settings.AUTH_USER_MODEL),
+        ),
+        migrations.AddConstraint(
+            model_name='exportwatermark',
+            constraint=models.UniqueConstraint(fields=('user', 'kind'), name='export_watermark_unique_user_kind'),
+        ),
+    ]
@@ -0,0 +1,50 @@
+# Generated by Django 6.0.2 on 2026-10-19 12:30
+
+import core.models
+import django.contrib.postgres.search
+from anyascii import anyascii
+from django.contrib.postgres.search import SearchVector
+from django.db import migrations
+from django.db.models import Value
+from django.utils.html import strip_tags
+
+
+# same weights/config as search.fulltext
+WEIGHTS = (("title", "A"), ("category", "B"), ("excerpt", "B"), ("body", "C"))
+
+
+def backfill(apps, schema_editor):
+    # tsvector exists only on Postgres; elsewhere the column just stays NULL
+    if schema_editor.connection.vendor != "postgresql":
+        return
+
+    JurnalArticlePage = apps.get_model("core", "JurnalArticlePage")
+    for page in JurnalArticlePage.objects.filter(live=True).iterator(chunk_size=200):
+        vector = None
+        for name, weight in WEIGHTS:
+            text = getattr(page, name) or ""
+            if name == "body":
+                text = strip_tags(text)
+            part = SearchVector(Value(anyascii(text).lower()), config="romanian", weight=weight)
+            vector = part if vector is None else vector + part
+        JurnalArticlePage.objects.filter(pk=page.pk).update(search_document=vector)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0030_exportwatermark'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='jurnalarticlepage',
+            name='search_document',
+            field=django.contrib.postgres.search.SearchVectorField(blank=True, editable=False, null=True),
+        ),
+        migrations.AddIndex(
+            model_name='jurnalarticlepage',
+            index=core.models.SearchDocumentIndex(fields=['search_document'], name='core_jurnal_search_doc_gin'),
+        ),
+        migrations.RunPython(backfill, migrations.RunPython.noop),
+    ]
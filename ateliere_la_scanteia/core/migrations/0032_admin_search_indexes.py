@@ -0,0 +1,56 @@
+# Generated by Django 6.0.2 on 2026-10-19 12:42
+
+from django.db import migrations, models
+
+
+# Admin search is `icontains`, i.e. UPPER(col::text) LIKE UPPER('%q%') on Postgres:
+# a trigram GIN index on that exact expression serves it without a table scan.
+TRIGRAM_INDEXES = [
+    ("membrie_parent_name_trgm", "core_membershipapplication", "parent_name"),
+    ("membrie_email_trgm", "core_membershipapplication", "email"),
+    ("membrie_phone_trgm", "core_membershipapplication", "phone"),
+    ("membrie_child_name_trgm", "core_membershipapplication", "child_name"),
+    ("newsletter_email_trgm", "core_newslettersubscriber", "email"),
+]
+
+
+def create_trigram_indexes(apps, schema_editor):
+    if schema_editor.connection.vendor != "postgresql":
+        return
+    schema_editor.execute("CREATE EXTENSION IF NOT EXISTS pg_trgm")
+    for name, table, column in TRIGRAM_INDEXES:
+        schema_editor.execute(
+            f"CREATE INDEX CONCURRENTLY IF NOT EXISTS {name} ON {table} USING gin (UPPER({column}::text) gin_trgm_ops)"
+        )
+
+
+def drop_trigram_indexes(apps, schema_editor):
+    if schema_editor.connection.vendor != "postgresql":
+        return
+    for name, _, _ in TRIGRAM_INDEXES:
+        schema_editor.execute(f"DROP INDEX CONCURRENTLY IF EXISTS {name}")
+
+
+class Migration(migrations.Migration):
+    # CREATE INDEX CONCURRENTLY can't run inside a transaction (no write lock on big tables)
+    atomic = False
+
+    dependencies = [
+        ('core', '0031_jurnalarticlepage_search_document'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='membershipapplication',
+            index=models.Index(fields=['expectation', '-created_at'], name='membrie_expectation_created'),
+        ),
+        migrations.AddIndex(
+            model_name='membershipapplication',
+            index=models.Index(fields=['source', '-created_at'], name='membrie_source_created'),
+        ),
+        migrations.AddIndex(
+            model_name='newslettersubscriber',
+            index=models.Index(fields=['is_active', '-created_at'], name='newsletter_active_created'),
+        ),
+        migrations.RunPython(create_trigram_indexes, drop_trigram_indexes),
+    ]
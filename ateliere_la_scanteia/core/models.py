@@ -1,7 +1,11 @@
 # core/models.py
-from django.db import models
+from django.conf import settings
+from django.contrib.postgres.indexes import GinIndex
+from django.contrib.postgres.search import SearchVectorField
+from django.core.files.storage import storages
+from django.db import models, transaction
 from django.utils import timezone
-from django.db.models.signals import post_migrate
+from django.db.models.signals import post_delete, post_migrate, post_save
 from django.dispatch import receiver
 
 from modelcluster.fields import ParentalKey
@@ -14,6 +18,11 @@ from wagtail.admin.panels import (
 )
 from wagtail.fields import RichTextField, StreamField
 from wagtail.models import Page, Orderable, Site
+from wagtail.search import index
+from wagtail.signals import page_published, page_unpublished, post_page_move
+
+from . import cache as api_cache
+from . import cdn
 
 
 # ======================================================================
@@ -917,6 +926,15 @@ def ensure_default_membrie_form_content(sender, **kwargs):
         return
 
 
+# ------------------------------------------------------------
+# ✅ Cache: întrebările Membrie parsate (per Site), invalidate la save
+# ------------------------------------------------------------
+@receiver([post_save, post_delete], sender=MembrieFormContent)
+def invalidate_membrie_questions_cache(sender, instance, **kwargs):
+    api_cache.bump_version(api_cache.MEMBRIE_QUESTIONS, api_cache.API_RESPONSES)
+    cdn.purge(cdn.MEMBRIE_FORM, cdn.SNAPSHOT_MANIFEST)
+
+
 class MembershipQuestion(models.Model):
     key = models.SlugField(max_length=60, unique=True)
     question_text = models.CharField(max_length=255)
@@ -934,6 +952,31 @@ class MembershipQuestion(models.Model):
         return f"{self.order}. {self.question_text}"
 
 
+def qa_pairs(qa_json, raw_payload):
+    """
+    Returns list[(question, answer)] from:
+      - qa_json (preferred) OR
+      - raw_payload.qa_items
+    Keeps the order as stored.
+    """
+    qa = qa_json
+    if not qa and isinstance(raw_payload, dict):
+        qa = raw_payload.get("qa_items")
+
+    if not isinstance(qa, list):
+        return []
+
+    out = []
+    for item in qa:
+        if not isinstance(item, dict):
+            continue
+        q = str(item.get("question") or "").strip()
+        a = str(item.get("answer") or "").strip()
+        if q:
+            out.append((q, a))
+    return out
+
+
 class MembershipApplication(models.Model):
     EXPECTATION_CHOICES = (
         ("hobby", "Hobby"),
@@ -961,14 +1004,29 @@ class MembershipApplication(models.Model):
 
     raw_payload = models.JSONField(blank=True, null=True)
 
+    # denormalized len(qa_pairs(...)): sizes the Q/A export columns without reading the JSON
+    qa_count = models.PositiveIntegerField(default=0, editable=False)
+
     class Meta:
         ordering = ["-created_at"]
         verbose_name = "Aplicație Membrie"
         verbose_name_plural = "Aplicații Membrie"
+        indexes = [
+            # admin list_filter + default ordering (trigram search indexes: migration 0032, Postgres only)
+            models.Index(fields=["expectation", "-created_at"], name="membrie_expectation_created"),
+            models.Index(fields=["source", "-created_at"], name="membrie_source_created"),
+        ]
 
     def __str__(self):
         return f"{self.created_at:%Y-%m-%d} — {self.parent_name} / {self.child_name}"
 
+    def save(self, *args, **kwargs):
+        self.qa_count = len(qa_pairs(self.qa_json, self.raw_payload))
+        update_fields = kwargs.get("update_fields")
+        if update_fields is not None and {"qa_json", "raw_payload"} & set(update_fields):
+            kwargs["update_fields"] = {*update_fields, "qa_count"}
+        super().save(*args, **kwargs)
+
 
 class MembershipQAItem(models.Model):
     application = models.ForeignKey(
@@ -1002,7 +1060,7 @@ class NewsletterSubscriber(models.Model):
     is_active = models.BooleanField(default=False)
     confirmed_at = models.DateTimeField(null=True, blank=True)
 
-    # token for confirmation link
+    # legacy random token (new links are signed, see views.newsletter_confirm)
     confirm_token = models.CharField(max_length=128, blank=True, default="")
     confirm_sent_at = models.DateTimeField(null=True, blank=True)
 
@@ -1010,11 +1068,183 @@ class NewsletterSubscriber(models.Model):
         ordering = ["-created_at"]
         verbose_name = "Abonat Newsletter"
         verbose_name_plural = "Abonați Newsletter"
+        indexes = [
+            # cleanup_newsletter_pending: only unconfirmed rows, ranged by confirm_sent_at
+            models.Index(
+                fields=["confirm_sent_at", "id"],
+                condition=models.Q(is_active=False),
+                name="newsletter_pending_sent_idx",
+            ),
+            # admin list_filter + default ordering
+            models.Index(fields=["is_active", "-created_at"], name="newsletter_active_created"),
+            # "since last export" of active subscribers: ranged by confirmed_at
+            models.Index(
+                fields=["confirmed_at", "id"],
+                condition=models.Q(is_active=True),
+                name="newsletter_confirmed_idx",
+            ),
+        ]
 
     def __str__(self):
         return self.email
 
 
+# ============================================================
+# ✅ NEWSLETTER CAMPAIGNS — bulk send to confirmed subscribers
+# ============================================================
+class NewsletterCampaign(models.Model):
+    STATUS_CHOICES = (
+        ("draft", "Draft"),
+        ("queued", "În coadă"),
+        ("sending", "Se trimite"),
+        ("sent", "Trimisă"),
+        ("failed", "Eșuată"),
+    )
+
+    subject = models.CharField(max_length=255)
+    body_text = models.TextField(help_text="Varianta text a emailului (obligatorie).")
+    body_html = models.TextField(blank=True, default="", help_text="Varianta HTML (opțional).")
+
+    status = models.CharField(max_length=20, choices=STATUS_CHOICES, default="draft", db_index=True)
+    created_at = models.DateTimeField(default=timezone.now)
+    started_at = models.DateTimeField(null=True, blank=True)
+    finished_at = models.DateTimeField(null=True, blank=True)
+
+    # progress (updated after every batch)
+    sent_count = models.PositiveIntegerField(default=0)
+    failed_count = models.PositiveIntegerField(default=0)
+
+    class Meta:
+        ordering = ["-created_at"]
+        verbose_name = "Campanie Newsletter"
+        verbose_name_plural = "Campanii Newsletter"
+
+    def __str__(self):
+        return self.subject
+
+
+class NewsletterDelivery(models.Model):
+    """
+    One row per (campaign, recipient). Rows stay "pending" until the send is
+    confirmed, so a crashed run resumes from the remaining pending rows.
+    """
+
+    STATUS_CHOICES = (
+        ("pending", "În așteptare"),
+        ("sent", "Trimis"),
+        ("failed", "Eșuat"),
+    )
+
+    campaign = models.ForeignKey(NewsletterCampaign, related_name="deliveries", on_delete=models.CASCADE)
+    subscriber = models.ForeignKey(NewsletterSubscriber, null=True, blank=True, on_delete=models.SET_NULL)
+    email = models.EmailField()
+
+    status = models.CharField(max_length=20, choices=STATUS_CHOICES, default="pending")
+    sent_at = models.DateTimeField(null=True, blank=True)
+    error = models.TextField(blank=True, default="")
+
+    class Meta:
+        ordering = ["id"]
+        verbose_name = "Livrare Newsletter"
+        verbose_name_plural = "Livrări Newsletter"
+        constraints = [
+            models.UniqueConstraint(fields=["campaign", "email"], name="newsletter_delivery_unique_email"),
+        ]
+        indexes = [
+            models.Index(fields=["campaign", "status", "id"], name="newsletter_delivery_progress"),
+        ]
+
+    def __str__(self):
+        return f"{self.campaign_id} → {self.email} ({self.status})"
+
+
+def exports_storage():
+    # private storage (STORAGES["exports"]): outside MEDIA_ROOT, never served by URL
+    return storages["exports"]
+
+
+class ExportJob(models.Model):
+    """
+    An admin export (CSV/XLSX) generated by the task worker into private storage;
+    downloaded through a signed, time-limited link (see core.exports).
+    """
+
+    KIND_CHOICES = (
+        ("membrie_ordered", "Membrie (Ordonat Q/A)"),
+        ("membrie_full", "Membrie (Full/Audit)"),
+        ("newsletter_all", "Newsletter (All)"),
+        ("newsletter_active", "Newsletter (Active)"),
+    )
+    FORMAT_CHOICES = (
+        ("csv", "CSV"),
+        ("xlsx", "XLSX"),
+    )
+    STATUS_CHOICES = (
+        ("queued", "În coadă"),
+        ("running", "În lucru"),
+        ("done", "Gata"),
+        ("failed", "Eșuat"),
+    )
+
+    created_by = models.ForeignKey(
+        settings.AUTH_USER_MODEL, null=True, blank=True, on_delete=models.SET_NULL, related_name="+"
+    )
+    kind = models.CharField(max_length=32, choices=KIND_CHOICES)
+    file_format = models.CharField(max_length=8, choices=FORMAT_CHOICES, default="csv")
+    compress = models.BooleanField(default=False, help_text="gzip (.gz)")
+    since_last = models.BooleanField(default=False, help_text="Doar rândurile noi de la ultimul export (ExportWatermark)")
+
+    status = models.CharField(max_length=20, choices=STATUS_CHOICES, default="queued")
+    rows_total = models.PositiveIntegerField(default=0)
+    rows_done = models.PositiveIntegerField(default=0)
+    file = models.FileField(storage=exports_storage, upload_to="exports/%Y/%m/", blank=True)
+    error = models.TextField(blank=True, default="")
+
+    created_at = models.DateTimeField(default=timezone.now, db_index=True)
+    started_at = models.DateTimeField(null=True, blank=True)
+    finished_at = models.DateTimeField(null=True, blank=True)
+
+    class Meta:
+        ordering = ["-created_at"]
+        verbose_name = "Export"
+        verbose_name_plural = "Exporturi"
+
+    def __str__(self):
+        return f"{self.get_kind_display()} {self.file_format.upper()} ({self.status})"
+
+    @property
+    def progress(self):
+        if self.status == "done":
+            return 100
+        if not self.rows_total:
+            return 0
+        return min(99, int(self.rows_done * 100 / self.rows_total))
+
+
+class ExportWatermark(models.Model):
+    """
+    Where a user's last "since last export" job of a given kind stopped:
+    (last_at, last_id) of the newest exported row, on created_at
+    (confirmed_at for active subscribers). Advanced only when a job finishes.
+    """
+
+    user = models.ForeignKey(settings.AUTH_USER_MODEL, on_delete=models.CASCADE, related_name="+")
+    kind = models.CharField(max_length=32, choices=ExportJob.KIND_CHOICES)
+    last_at = models.DateTimeField()
+    last_id = models.BigIntegerField()
+    updated_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        verbose_name = "Reper export"
+        verbose_name_plural = "Repere export"
+        constraints = [
+            models.UniqueConstraint(fields=["user", "kind"], name="export_watermark_unique_user_kind"),
+        ]
+
+    def __str__(self):
+        return f"{self.user_id} / {self.kind}: {self.last_at:%Y-%m-%d %H:%M} #{self.last_id}"
+
+
 class JurnalIndexPage(Page):
     label = models.CharField(max_length=255, blank=True, default="( ARHIVA SCÂNTEIA )")
     subtitle = models.CharField(max_length=255, blank=True, default="— note despre artă")
@@ -1032,6 +1262,18 @@ class JurnalIndexPage(Page):
     subpage_types = ["core.JurnalArticlePage"]
 
 
+class SearchDocumentIndex(GinIndex):
+    """
+    GIN on Postgres. Other databases (local SQLite) don't know `USING gin` and rebuild
+    tables with every Meta index, so they get a plain index on the (always NULL) column.
+    """
+
+    def create_sql(self, model, schema_editor, using="", **kwargs):
+        if schema_editor.connection.vendor != "postgresql":
+            return models.Index.create_sql(self, model, schema_editor, using=using, **kwargs)
+        return super().create_sql(model, schema_editor, using=using, **kwargs)
+
+
 class JurnalArticlePage(Page):
     category = models.CharField(max_length=60, blank=True, default="FILOSOFIE")
     excerpt = models.TextField(blank=True, default="")
@@ -1075,8 +1317,22 @@ class JurnalArticlePage(Page):
         FieldPanel("body"),
     ]
 
+    # Postgres full-text document (search.fulltext): refreshed on publish, GIN-indexed (Meta).
+    # Only the search query reads it: page querysets defer it.
+    search_document = SearchVectorField(null=True, blank=True, editable=False)
+
+    # fallback (non-Postgres) search through the Wagtail backend
+    search_fields = Page.search_fields + [
+        index.SearchField("category"),
+        index.SearchField("excerpt"),
+        index.SearchField("body"),
+    ]
+
     parent_page_types = ["core.JurnalIndexPage"]
 
+    class Meta:
+        indexes = [SearchDocumentIndex(fields=["search_document"], name="core_jurnal_search_doc_gin")]
+
 
 class JurnalArticleGalleryImage(Orderable):
     page = ParentalKey(
@@ -1098,4 +1354,43 @@ class JurnalArticleGalleryImage(Orderable):
     panels = [
         FieldPanel("image"),
         FieldPanel("caption"),
-    ]
\ No newline at end of file
+    ]
+
+# ============================================================
+# ✅ API + SITEMAP cache (core.cache): payloads are stored under a namespace
+# version; publishing, unpublishing, moving or deleting pages bumps it.
+# The CDN (core.cdn) purges the page's own key + "jurnal" for jurnal pages
+# (+ the snapshot manifest on every change).
+# ============================================================
+def _page_cdn_keys(page):
+    keys = [cdn.page_key(page.pk), cdn.SNAPSHOT_MANIFEST]
+    if issubclass(page.specific_class or Page, (JurnalArticlePage, JurnalIndexPage)):
+        keys.append(cdn.JURNAL)
+    return keys
+
+
+@receiver([page_published, page_unpublished, post_page_move])
+def invalidate_page_caches(sender, instance, **kwargs):
+    api_cache.bump_version(api_cache.JURNAL, api_cache.SITEMAP, api_cache.API_RESPONSES)
+    cdn.purge(*_page_cdn_keys(instance))
+
+
+@receiver(page_published, sender=JurnalArticlePage)
+def queue_sitemap_renditions(sender, instance, **kwargs):
+    # core.tasks imports this module
+    from .tasks import generate_sitemap_renditions
+
+    transaction.on_commit(lambda: generate_sitemap_renditions.enqueue(instance.pk))
+
+
+@receiver(post_delete, sender=JurnalArticlePage)
+@receiver(post_delete, sender=JurnalIndexPage)
+def invalidate_page_caches_on_delete(sender, instance, **kwargs):
+    api_cache.bump_version(api_cache.JURNAL, api_cache.SITEMAP, api_cache.API_RESPONSES)
+    cdn.purge(cdn.page_key(instance.pk), cdn.JURNAL, cdn.SNAPSHOT_MANIFEST)
+
+
+@receiver([post_save, post_delete], sender=MainPageContent)
+def invalidate_mainpage_cache(sender, instance, **kwargs):
+    api_cache.bump_version(api_cache.MAINPAGE, api_cache.API_RESPONSES)
+    cdn.purge(cdn.MAINPAGE, cdn.SNAPSHOT_MANIFEST)
@@ -0,0 +1,355 @@
+# core/newsletter.py
+import csv
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import timedelta
+
+from django.conf import settings
+from django.core.mail import EmailMultiAlternatives, get_connection
+from django.core.signing import Signer
+from django.db import transaction
+from django.db.models import F, Q
+from django.urls import reverse
+from django.utils import timezone
+from django.utils.html import escape
+
+from .models import NewsletterCampaign, NewsletterDelivery, NewsletterSubscriber
+
+
+# ------------------------------------------------------------
+# ✅ Campaign sender: batches + pooled SMTP connections + rate cap
+# ------------------------------------------------------------
+class RateLimiter:
+    """
+    Spaces sends evenly so that at most `per_minute` messages leave per minute,
+    shared by all worker threads. per_minute <= 0 disables the cap.
+    """
+
+    def __init__(self, per_minute: int):
+        self.interval = 60.0 / per_minute if per_minute > 0 else 0.0
+        self._lock = threading.Lock()
+        self._next_at = time.monotonic()
+
+    def wait(self):
+        if not self.interval:
+            return
+        with self._lock:
+            now = time.monotonic()
+            slot = max(self._next_at, now)
+            self._next_at = slot + self.interval
+        if slot > now:
+            time.sleep(slot - now)
+
+
+def prepare_deliveries(campaign: NewsletterCampaign, chunk_size: int = 2000) -> int:
+    """
+    Snapshot the confirmed subscribers into pending NewsletterDelivery rows.
+    Idempotent (unique campaign+email), so re-running after a crash adds nothing twice.
+    """
+    created = 0
+    batch = []
+    active = (
+        NewsletterSubscriber.objects.filter(is_active=True)
+        .order_by("id")
+        .values_list("id", "email")
+        .iterator(chunk_size=chunk_size)
+    )
+    for subscriber_id, email in active:
+        batch.append(NewsletterDelivery(campaign=campaign, subscriber_id=subscriber_id, email=email))
+        if len(batch) >= chunk_size:
+            created += len(NewsletterDelivery.objects.bulk_create(batch, ignore_conflicts=True))
+            batch = []
+    if batch:
+        created += len(NewsletterDelivery.objects.bulk_create(batch, ignore_conflicts=True))
+    return created
+
+
+# ------------------------------------------------------------
+# ✅ Unsubscribe links (List-Unsubscribe + footer), see views.newsletter_unsubscribe
+# ------------------------------------------------------------
+NEWSLETTER_UNSUBSCRIBE_SALT = "core.newsletter.unsubscribe"
+
+
+def make_unsubscribe_token(subscriber_id) -> str:
+    # no expiry: a link from an old campaign must keep working
+    return Signer(salt=NEWSLETTER_UNSUBSCRIBE_SALT).sign(str(subscriber_id))
+
+
+def unsubscribe_url(subscriber_id) -> str:
+    # built in the task worker (no request): public site URL, else the Wagtail admin base URL
+    base = (getattr(settings, "PUBLIC_BASE_URL", "") or getattr(settings, "WAGTAILADMIN_BASE_URL", "")).rstrip("/")
+    return f"{base}{reverse('newsletter-unsubscribe')}?token={make_unsubscribe_token(subscriber_id)}"
+
+
+def _build_message(campaign, email, connection, subscriber_id=None):
+    body, html = campaign.body_text, campaign.body_html
+    headers = {}
+    if subscriber_id is not None:
+        url = unsubscribe_url(subscriber_id)
+        # RFC 8058 one-click: the mail client POSTs "List-Unsubscribe=One-Click" to the URL
+        headers = {"List-Unsubscribe": f"<{url}>", "List-Unsubscribe-Post": "List-Unsubscribe=One-Click"}
+        body = f"{body}\n\n--\nDezabonare: {url}\n"
+        if html:
+            html = f'{html}<p style="font-size:12px;color:#666;"><a href="{escape(url)}">Dezabonare</a></p>'
+
+    msg = EmailMultiAlternatives(
+        subject=campaign.subject,
+        body=body,
+        from_email=getattr(settings, "DEFAULT_FROM_EMAIL", None),
+        to=[email],
+        connection=connection,
+        headers=headers,
+    )
+    if html:
+        msg.attach_alternative(html, "text/html")
+    return msg
+
+
+def _send_chunk(campaign, deliveries, connection, limiter):
+    """
+    Runs in a worker thread. Only talks SMTP (no DB access);
+    returns [(delivery_id, error_or_empty)].
+    """
+    results = []
+    for delivery in deliveries:
+        limiter.wait()
+        try:
+            # open() is a no-op while the connection is alive; an already-open
+            # connection is not closed by send(), so it is reused for the whole run
+            connection.open()
+            _build_message(campaign, delivery["email"], connection, delivery["subscriber_id"]).send(
+                fail_silently=False
+            )
+            results.append((delivery["id"], ""))
+        except Exception as e:
+            results.append((delivery["id"], str(e)[:1000] or e.__class__.__name__))
+            # reconnect for the next message (the server may have dropped us)
+            try:
+                connection.close()
+            except Exception:
+                pass
+    return results
+
+
+def _record_results(campaign, results):
+    now = timezone.now()
+    sent_ids = [pk for pk, error in results if not error]
+    failed = [NewsletterDelivery(pk=pk, status="failed", error=error) for pk, error in results if error]
+
+    if sent_ids:
+        NewsletterDelivery.objects.filter(pk__in=sent_ids).update(status="sent", sent_at=now, error="")
+    if failed:
+        NewsletterDelivery.objects.bulk_update(failed, ["status", "error"])
+
+    NewsletterCampaign.objects.filter(pk=campaign.pk).update(
+        sent_count=F("sent_count") + len(sent_ids),
+        failed_count=F("failed_count") + len(failed),
+    )
+    return len(sent_ids), len(failed)
+
+
+# Statuses a new run may start from; "sending" / "sent" only with the command's --force
+CLAIMABLE_STATUSES = ("draft", "queued", "failed")
+
+
+class CampaignNotClaimed(Exception):
+    """The campaign left the expected statuses (another run claimed it first)."""
+
+
+def claim_campaign(campaign, statuses=CLAIMABLE_STATUSES):
+    """
+    Moves the campaign to "sending" in one conditional UPDATE, so the task worker and the
+    management command can't both start it. statuses=None claims it whatever its status.
+    Returns False when no row matched.
+    """
+    campaigns = NewsletterCampaign.objects.filter(pk=campaign.pk)
+    if statuses is not None:
+        campaigns = campaigns.filter(status__in=statuses)
+    return bool(
+        campaigns.update(status="sending", started_at=campaign.started_at or timezone.now(), finished_at=None)
+    )
+
+
+def requeue_failed_deliveries(campaign):
+    """Failed deliveries back to "pending" (the next run retries them); returns how many."""
+    requeued = campaign.deliveries.filter(status="failed").update(status="pending", error="")
+    if requeued:
+        NewsletterCampaign.objects.filter(pk=campaign.pk).update(failed_count=F("failed_count") - requeued)
+    return requeued
+
+
+def send_campaign(
+    campaign,
+    *,
+    batch_size=None,
+    workers=None,
+    rate_per_minute=None,
+    statuses=CLAIMABLE_STATUSES,
+    retry_failed=False,
+    log=None,
+):
+    """
+    Sends `campaign` to every pending delivery and returns run stats:
+    {"sent", "failed", "seconds", "per_second"}.
+
+    - the campaign is claimed first (claim_campaign(campaign, statuses));
+      CampaignNotClaimed when another run already has it
+    - pending rows are claimed in batches of `batch_size` (by id)
+    - every batch is split between `workers` threads, each one reusing
+      its own open SMTP connection for the whole run
+    - statuses are written after every batch; an interrupted run is resumed
+      by calling send_campaign again (at-least-once for the in-flight batch)
+    - failed deliveries are final unless `retry_failed` puts them back in the queue
+    """
+    batch_size = batch_size or int(getattr(settings, "NEWSLETTER_CAMPAIGN_BATCH_SIZE", 200))
+    workers = max(1, workers or int(getattr(settings, "NEWSLETTER_CAMPAIGN_WORKERS", 4)))
+    if rate_per_minute is None:
+        rate_per_minute = int(getattr(settings, "NEWSLETTER_CAMPAIGN_RATE_PER_MINUTE", 60))
+    log = log or (lambda message: None)
+
+    if not claim_campaign(campaign, statuses):
+        raise CampaignNotClaimed(f"Campaign {campaign.pk} was already claimed by another run.")
+    if retry_failed:
+        requeued = requeue_failed_deliveries(campaign)
+        if requeued:
+            log(f"Reîncercăm {requeued} livrări eșuate.")
+    prepared = prepare_deliveries(campaign)
+    if prepared:
+        log(f"Pregătite {prepared} livrări noi.")
+
+    limiter = RateLimiter(rate_per_minute)
+    connections = [get_connection(fail_silently=False) for _ in range(workers)]
+    totals = {"sent": 0, "failed": 0}
+    started = time.monotonic()
+    last_id = 0
+
+    try:
+        with ThreadPoolExecutor(max_workers=workers) as pool:
+            while True:
+                batch = list(
+                    campaign.deliveries.filter(status="pending", id__gt=last_id)
+                    .order_by("id")
+                    .values("id", "email", "subscriber_id")[:batch_size]
+                )
+                if not batch:
+                    break
+                last_id = batch[-1]["id"]
+
+                chunks = [batch[i::workers] for i in range(workers)]
+                futures = [
+                    pool.submit(_send_chunk, campaign, chunk, connections[i], limiter)
+                    for i, chunk in enumerate(chunks)
+                    if chunk
+                ]
+                results = [item for future in futures for item in future.result()]
+
+                sent, failed = _record_results(campaign, results)
+                totals["sent"] += sent
+                totals["failed"] += failed
+
+                elapsed = time.monotonic() - started
+                log(
+                    f"Batch până la #{last_id}: +{sent} trimise, +{failed} eșuate "
+                    f"({(totals['sent'] + totals['failed']) / elapsed if elapsed else 0:.1f} msg/s)"
+                )
+    except BaseException:
+        NewsletterCampaign.objects.filter(pk=campaign.pk).update(status="failed")
+        raise
+    finally:
+        for connection in connections:
+            try:
+                connection.close()
+            except Exception:
+                pass
+
+    # nothing delivered at all (e.g. SMTP rejecting every message) is a failed campaign;
+    # a partial run stays "sent", with failed_count showing the rest
+    delivered = campaign.deliveries.filter(status="sent").exists()
+    failed = campaign.deliveries.filter(status="failed").exists()
+    NewsletterCampaign.objects.filter(pk=campaign.pk).update(
+        status="failed" if failed and not delivered else "sent", finished_at=timezone.now()
+    )
+
+    seconds = time.monotonic() - started
+    done = totals["sent"] + totals["failed"]
+    return dict(totals, seconds=seconds, per_second=done / seconds if seconds else 0.0)
+
+
+# ------------------------------------------------------------
+# ✅ Cleanup: pending subscribers whose confirmation link expired
+# ------------------------------------------------------------
+ARCHIVE_FIELDS = ["id", "email", "created_at", "confirm_sent_at", "source", "ip_address", "user_agent"]
+
+
+def expired_pending_subscribers(now=None):
+    """
+    Never confirmed + confirmation link older than NEWSLETTER_CONFIRM_TTL_HOURS
+    (rows without confirm_sent_at fall back to created_at).
+    """
+    now = now or timezone.now()
+    cutoff = now - timedelta(hours=int(getattr(settings, "NEWSLETTER_CONFIRM_TTL_HOURS", 72)))
+    return NewsletterSubscriber.objects.filter(is_active=False, confirmed_at__isnull=True).filter(
+        Q(confirm_sent_at__lt=cutoff) | Q(confirm_sent_at__isnull=True, created_at__lt=cutoff)
+    )
+
+
+def cleanup_expired_pending(*, batch_size=1000, archive_path=None, dry_run=False, pause=0.0, log=None):
+    """
+    Deletes expired pending subscribers in id-ordered batches, one short
+    transaction per batch (no long locks on a big table). With `archive_path`
+    every batch is appended to a CSV file once its delete has committed.
+
+    Returns {"processed", "seconds", "per_second"}.
+    """
+    log = log or (lambda message: None)
+    now = timezone.now()
+    started = time.monotonic()
+    processed = 0
+    last_id = 0
+
+    archive_file = writer = None
+    if archive_path and not dry_run:
+        archive_file = open(archive_path, "a", newline="", encoding="utf-8")
+        writer = csv.DictWriter(archive_file, fieldnames=ARCHIVE_FIELDS)
+        if archive_file.tell() == 0:
+            writer.writeheader()
+
+    try:
+        while True:
+            ids = list(
+                expired_pending_subscribers(now)
+                .filter(id__gt=last_id)
+                .order_by("id")
+                .values_list("id", flat=True)[:batch_size]
+            )
+            if not ids:
+                break
+            last_id = ids[-1]
+
+            if dry_run:
+                processed += len(ids)
+            else:
+                with transaction.atomic():
+                    # re-check the predicate (a row confirmed meanwhile must survive) and lock
+                    # the rows, so exactly the archived ones are deleted
+                    rows = list(
+                        expired_pending_subscribers(now).filter(id__in=ids).select_for_update().values(*ARCHIVE_FIELDS)
+                    )
+                    _, deleted = NewsletterSubscriber.objects.filter(id__in=[row["id"] for row in rows]).delete()
+                # archived only once the delete is committed (a failed batch leaves no stray rows)
+                if writer:
+                    writer.writerows(rows)
+                processed += deleted.get(NewsletterSubscriber._meta.label, 0)
+
+            elapsed = time.monotonic() - started
+            log(f"Până la #{last_id}: {processed} rânduri ({processed / elapsed if elapsed else 0:.0f} rânduri/s)")
+
+            if pause:
+                time.sleep(pause)
+    finally:
+        if archive_file:
+            archive_file.close()
+
+    seconds = time.monotonic() - started
+    return {"processed": processed, "seconds": seconds, "per_second": processed / seconds if seconds else 0.0}
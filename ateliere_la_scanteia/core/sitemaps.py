@@ -1,28 +1,147 @@
+import logging
+
+from django.conf import settings
 from django.contrib.sitemaps import Sitemap
+from django.db.models import Max, Q
+from django.urls import reverse
+from django.utils.functional import cached_property
+from wagtail.images import get_image_model
+from wagtail.images.models import Filter
+from wagtail.models import Site
+
+from core.models import JurnalArticleGalleryImage, JurnalArticlePage, JurnalIndexPage
+
+
+logger = logging.getLogger(__name__)
+
+# Template for every urlset we render: the stock one + <image:image> entries (Google image sitemap)
+SITEMAP_TEMPLATE = "core/sitemap.xml"
+
+
+def sitemap_image_rendition() -> str:
+    return getattr(settings, "SITEMAP_IMAGE_RENDITION", "max-1600x1600")
+
+
+def sitemap_page_size():
+    # above this many URLs /sitemap.xml becomes an index of paginated section sitemaps
+    return int(getattr(settings, "SITEMAP_PAGE_SIZE", 5000))
+
+
+class PageSitemap(Sitemap):
+    """
+    Reads a lightweight projection (url_path, last_published_at) instead of full
+    page objects and builds each URL the way Page.get_url() does
+    (site root path + wagtail_serve), with the root paths resolved once.
+    """
+
+    model = None
+    ordering = ("-first_published_at", "id")
+
+    @property
+    def limit(self):
+        return sitemap_page_size()
 
-from core.models import JurnalArticlePage, JurnalIndexPage
+    @cached_property
+    def _root_paths(self):
+        # most specific first (same order Wagtail uses)
+        return [root.root_path for root in Site.get_site_root_paths()]
 
+    @cached_property
+    def _serve_prefix(self):
+        return reverse("wagtail_serve", args=("",))
 
-class JurnalSitemap(Sitemap):
+    def _queryset(self):
+        # Only public/live pages should be indexed, and only pages that belong to a Site
+        queryset = self.model.objects.live().public()
+        if not self._root_paths:
+            return queryset.none()
+        in_site = Q()
+        for root_path in self._root_paths:
+            in_site |= Q(url_path__startswith=root_path)
+        return queryset.filter(in_site)
+
+    def items(self):
+        return self._queryset().order_by(*self.ordering).values("url_path", "last_published_at")
+
+    def location(self, item):
+        url_path = item["url_path"]
+        for root_path in self._root_paths:
+            if url_path.startswith(root_path):
+                path = self._serve_prefix + url_path[len(root_path):]
+                if not getattr(settings, "WAGTAIL_APPEND_SLASH", True) and path != "/":
+                    path = path.rstrip("/")
+                return path
+
+    def lastmod(self, item):
+        return item["last_published_at"]
+
+    def get_latest_lastmod(self):
+        return self._queryset().aggregate(latest=Max("last_published_at"))["latest"]
+
+
+class JurnalSitemap(PageSitemap):
+    model = JurnalArticlePage
     changefreq = "weekly"
     priority = 0.7
 
+
+class JurnalImageSitemap(JurnalSitemap):
+    """
+    JurnalSitemap + the hero and gallery images of every article, as rendition URLs
+    (SITEMAP_IMAGE_RENDITION). Images of a whole sitemap page are loaded together:
+    gallery rows, images and their prefetched renditions = 3 queries, whatever the page size.
+    Renditions are only read, never generated here (core.tasks.generate_sitemap_renditions
+    does that after publishing); an image without one is listed with its original file.
+    """
+
     def items(self):
-        # Only public/live articles should be indexed
-        return JurnalArticlePage.objects.live().public().order_by("-first_published_at")
+        return self._queryset().order_by(*self.ordering).values("id", "url_path", "last_published_at", "hero_image_id")
+
+    def get_urls(self, page=1, site=None, protocol=None):
+        urls = super().get_urls(page=page, site=site, protocol=protocol)
+        base_url = f"{self.get_protocol(protocol)}://{self.get_domain(site)}"
+        self._attach_images([url["item"] for url in urls], base_url)
+        return urls
 
-    def location(self, obj):
-        # Wagtail pages already know their URL
-        return obj.get_url()
+    def _attach_images(self, items, base_url):
+        image_ids = {item["id"]: [item["hero_image_id"]] if item["hero_image_id"] else [] for item in items}
+        gallery = (
+            JurnalArticleGalleryImage.objects.filter(page_id__in=image_ids, image__isnull=False)
+            .order_by("page_id", "sort_order")
+            .values_list("page_id", "image_id")
+        )
+        for page_id, image_id in gallery:
+            if image_id not in image_ids[page_id]:
+                image_ids[page_id].append(image_id)
 
+        spec = sitemap_image_rendition()
+        rendition_filter = Filter(spec)
+        wanted = {image_id for ids in image_ids.values() for image_id in ids}
+        images = get_image_model().objects.filter(id__in=wanted).prefetch_renditions(spec) if wanted else []
+        urls = {}
+        for image in images:
+            try:
+                url = image.find_existing_rendition(rendition_filter).url
+            except image.get_rendition_model().DoesNotExist:
+                url = image.file.url
+            except Exception:
+                # broken storage: leave the image out, keep the page
+                logger.warning("Sitemap: no URL for image %s", image.pk, exc_info=True)
+                continue
+            urls[image.pk] = url if url.startswith(("http://", "https://")) else base_url + url
 
-class JurnalIndexSitemap(Sitemap):
+        for item in items:
+            item["images"] = [urls[image_id] for image_id in image_ids[item["id"]] if image_id in urls]
+
+
+class JurnalIndexSitemap(PageSitemap):
+    # Include the /jurnal/ index page too (if you want it indexed)
+    model = JurnalIndexPage
     changefreq = "weekly"
     priority = 0.6
 
-    def items(self):
-        # Include the /jurnal/ index page too (if you want it indexed)
-        return JurnalIndexPage.objects.live().public()
 
-    def location(self, obj):
-        return obj.get_url()
+SITEMAPS = {
+    "jurnal": JurnalImageSitemap,
+    "jurnal-index": JurnalIndexSitemap,
+}
@@ -0,0 +1,51 @@
+# core/snapshots.py
+"""
+Content-addressed copies of the headless payloads: /api/snap/<digest>.json.
+
+A digest URL always returns the same bytes, so it is served as `immutable` and
+cached forever by browsers and CDNs; only the small manifest (logical resource ->
+current digest URL, see core.views.snapshot_manifest) has to be revalidated.
+"""
+import hashlib
+import json
+
+from django.conf import settings
+from django.core.cache import cache
+from django.core.serializers.json import DjangoJSONEncoder
+
+
+SNAPSHOT_KEY = "core:snap:{digest}"
+DIGEST_LENGTH = 20
+
+
+def snapshot_ttl() -> int:
+    return int(getattr(settings, "SNAPSHOT_TTL", 60 * 60 * 24 * 30))
+
+
+def serialize(payload) -> bytes:
+    # same encoder as JsonResponse, compact: identical payloads -> identical bytes -> same digest
+    return json.dumps(payload, cls=DjangoJSONEncoder, separators=(",", ":")).encode()
+
+
+def digest_of(content: bytes) -> str:
+    return hashlib.sha256(content).hexdigest()[:DIGEST_LENGTH]
+
+
+def store(payload) -> str:
+    content = serialize(payload)
+    digest = digest_of(content)
+    cache.set(SNAPSHOT_KEY.format(digest=digest), content, snapshot_ttl())
+    return digest
+
+
+def restore(payload, digest: str):
+    """Stores `payload` again only when it still hashes to `digest`; returns its bytes or None."""
+    content = serialize(payload)
+    if digest_of(content) != digest:
+        return None
+    cache.set(SNAPSHOT_KEY.format(digest=digest), content, snapshot_ttl())
+    return content
+
+
+def load(digest: str):
+    return cache.get(SNAPSHOT_KEY.format(digest=digest))
@@ -0,0 +1,115 @@
+# core/tasks.py
+import logging
+
+from django.conf import settings
+from django.core.mail import send_mail
+from django_tasks import task
+
+from . import cache as api_cache
+from .exports import delete_expired_exports, generate_export
+from .models import ExportJob, JurnalArticlePage, NewsletterCampaign
+from .newsletter import CampaignNotClaimed, send_campaign
+from .sitemaps import sitemap_image_rendition
+
+
+logger = logging.getLogger(__name__)
+
+
+# ------------------------------------------------------------
+# ✅ Newsletter: confirmation email (runs in the task worker, not the request)
+# ------------------------------------------------------------
+@task()
+def send_newsletter_confirmation(email: str, confirm_url: str) -> None:
+    subject = "Confirmă abonarea la Newsletter — Ateliere la Scânteia"
+
+    text_message = (
+        "Bună!\n\n"
+        "Mai este un singur pas pentru a confirma abonarea la newsletter.\n"
+        "Apasă pe linkul de mai jos:\n\n"
+        f"{confirm_url}\n\n"
+        "Dacă nu ai cerut această abonare, poți ignora mesajul.\n"
+    )
+
+    html_message = f"""
+      <div style="font-family: ui-sans-serif, -apple-system, Segoe UI, Roboto, Arial; line-height: 1.6;">
+        <h2 style="margin:0 0 12px 0;">Confirmă abonarea</h2>
+        <p style="margin:0 0 14px 0;">
+          Mai este un singur pas pentru a confirma abonarea la newsletter.
+        </p>
+        <p style="margin:0 0 18px 0;">
+          <a href="{confirm_url}" style="display:inline-block; padding:10px 16px; border-radius:999px; background:#111; color:#fff; text-decoration:none;">
+            Confirmă abonarea
+          </a>
+        </p>
+        <p style="margin:0; font-size:12px; color:#666;">
+          Dacă nu ai cerut această abonare, poți ignora mesajul.
+        </p>
+      </div>
+    """
+
+    # erorile SMTP marchează task-ul ca FAILED (vizibil în worker / admin)
+    send_mail(
+        subject=subject,
+        message=text_message,
+        from_email=getattr(settings, "DEFAULT_FROM_EMAIL", None),
+        recipient_list=[email],
+        fail_silently=False,
+        html_message=html_message,
+    )
+
+
+# ------------------------------------------------------------
+# ✅ Newsletter campaigns (queued from the admin action)
+# ------------------------------------------------------------
+@task()
+def send_newsletter_campaign(campaign_id: int) -> dict:
+    campaign = NewsletterCampaign.objects.get(pk=campaign_id)
+    try:
+        return send_campaign(campaign, statuses=("queued",))
+    except CampaignNotClaimed:
+        # already started by send_newsletter_campaign (or a duplicate enqueue)
+        return {"sent": 0, "failed": 0, "seconds": 0.0, "per_second": 0.0}
+
+
+# ------------------------------------------------------------
+# ✅ Admin exports (queued from the Wagtail settings menu)
+# ------------------------------------------------------------
+@task()
+def run_export_job(job_id: int) -> int:
+    job = ExportJob.objects.get(pk=job_id)
+    rows_done = generate_export(job).rows_done
+    # retention (EXPORT_RETENTION_DAYS) piggybacks on new exports; cron: manage.py cleanup_exports
+    try:
+        delete_expired_exports()
+    except Exception:
+        logger.exception("Deleting expired exports failed")
+    return rows_done
+
+
+# ------------------------------------------------------------
+# ✅ Sitemap image renditions (queued after a jurnal article is published)
+# ------------------------------------------------------------
+@task()
+def generate_sitemap_renditions(page_id: int) -> int:
+    page = (
+        JurnalArticlePage.objects.filter(pk=page_id).defer("search_document").select_related("hero_image").first()
+    )
+    if page is None:
+        return 0
+    images = [page.hero_image] + [item.image for item in page.gallery_images.select_related("image")]
+    spec = sitemap_image_rendition()
+    generated = 0
+    for image in images:
+        if image is None:
+            continue
+        try:
+            image.get_rendition(spec)
+        except Exception:
+            # missing/corrupt source file: the sitemap keeps listing the original
+            logger.warning("Sitemap: no rendition for image %s", image.pk, exc_info=True)
+            continue
+        generated += 1
+    if generated:
+        # the cached sitemaps still list the original files
+        api_cache.bump_version(api_cache.SITEMAP)
+    return generated
@@ -0,0 +1,28 @@
+# core/testing.py
+"""Shared test fixtures (core/tests.py, search/tests.py)."""
+from django.core.cache import cache
+from wagtail.models import Site
+
+from core.models import JurnalArticlePage, JurnalIndexPage
+
+
+class JurnalTestMixin:
+    """
+    setUp(): empty cache + a published JurnalIndexPage ("/jurnal/") under the default site
+    (self.site, self.index). Articles are added with self._publish(slug, **fields).
+    """
+
+    def setUp(self):
+        super().setUp()
+        cache.clear()
+        self.site = Site.objects.get(is_default_site=True)
+        with self.captureOnCommitCallbacks(execute=True):
+            self.index = self.site.root_page.add_child(instance=JurnalIndexPage(title="Jurnal", slug="jurnal"))
+            self.index.save_revision().publish()
+
+    def _publish(self, slug, **fields):
+        # the search index (and the sitemap renditions) are updated on commit
+        with self.captureOnCommitCallbacks(execute=True):
+            article = self.index.add_child(instance=JurnalArticlePage(slug=slug, **fields))
+            article.save_revision().publish()
+        return article
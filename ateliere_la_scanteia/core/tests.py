@@ -1,3 +1,1295 @@
-from django.test import TestCase
+import csv
+import gzip
+import importlib
+import io
+import json
+import os
+import tempfile
+import threading
+import time
+import tracemalloc
+import zlib
+from datetime import datetime, timedelta
+from types import SimpleNamespace
+from unittest import mock, skipUnless
 
-# Create your tests here.
+import openpyxl
+
+from django.contrib import admin
+from django.contrib.auth import get_user_model
+from django.core import mail
+from django.core.cache import cache
+from django.core.files.storage import FileSystemStorage
+from django.core.management import CommandError, call_command
+from django.db import DatabaseError, connection
+from django.test import TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.utils import timezone
+
+from wagtail.images import get_image_model
+from wagtail.images.tests.utils import get_test_image_file
+from wagtail.models import Site
+
+from core import cache as api_cache
+from core import cdn
+from core import exports
+from core import middleware as api_middleware
+from core import snapshots
+from core.newsletter import cleanup_expired_pending, make_unsubscribe_token
+from core.sitemaps import JurnalImageSitemap
+from core.tasks import send_newsletter_campaign
+from core.testing import JurnalTestMixin
+from core.wagtail_hooks import MembershipApplicationViewSet
+from core.models import (
+    ExportJob,
+    ExportWatermark,
+    JurnalArticleGalleryImage,
+    JurnalArticlePage,
+    MainPageContent,
+    MembershipApplication,
+    MembershipQAItem,
+    MembrieFormContent,
+    NewsletterCampaign,
+    NewsletterSubscriber,
+)
+from core.views import _make_newsletter_confirm_token
+
+
+def _question(key, text, required=True, order=0, is_active=True):
+    return (
+        "question",
+        {
+            "key": key,
+            "question_text": text,
+            "suggested_answer": "",
+            "required": required,
+            "is_active": is_active,
+            "order": order,
+        },
+    )
+
+
+class MembrieQuestionsCacheTests(TestCase):
+    """
+    The parsed question schema is cached per Site and invalidated on save.
+    """
+
+    def setUp(self):
+        cache.clear()
+        self.site = Site.objects.get(is_default_site=True)
+        self.form = MembrieFormContent.for_site(self.site)
+        self.form.questions = [
+            _question("second", "A doua întrebare", required=False, order=2),
+            _question("first", "Prima întrebare", order=1),
+            _question("hidden", "Inactivă", order=0, is_active=False),
+        ]
+        self.form.save()
+
+    def test_questions_sorted_and_filtered(self):
+        response = self.client.get("/api/membrii/questions/")
+        keys = [q["key"] for q in response.json()["items"]]
+        self.assertEqual(keys, ["first", "second"])
+
+    # without the response cache, so the second request reaches the view
+    @override_settings(API_RESPONSE_CACHE_PATHS=())
+    def test_cached_schema_skips_streamfield(self):
+        self.client.get("/api/membrii/questions/")
+
+        with mock.patch("core.views._build_membrie_question_schema", side_effect=AssertionError):
+            response = self.client.get("/api/membrii/questions/")
+
+        self.assertNotIn("X-Cache", response)
+        self.assertEqual(len(response.json()["items"]), 2)
+
+    def test_save_invalidates_cache(self):
+        self.client.get("/api/membrii/questions/")
+
+        self.form.questions = [_question("only", "Singura întrebare")]
+        self.form.save()
+
+        response = self.client.get("/api/membrii/questions/")
+        self.assertEqual([q["key"] for q in response.json()["items"]], ["only"])
+
+    @override_settings(
+        MEMBRIE_APPLICATION_TO_EMAIL="office@example.com",
+        EMAIL_BACKEND="django.core.mail.backends.locmem.EmailBackend",
+    )
+    def test_application_validates_dynamic_answers(self):
+        payload = {
+            "parent_name": "Ana Pop",
+            "phone": "0700000000",
+            "email": "ana@example.com",
+            "child_name": "Ion",
+            "child_age": "7 ani",
+            "expectation": "hobby",
+            "dynamic_answers": {"second": "Da"},
+        }
+
+        response = self.client.post(
+            "/api/membrii/applications/", json.dumps(payload), content_type="application/json"
+        )
+        self.assertEqual(response.status_code, 400)
+        self.assertIn("Prima întrebare", response.json()["error"])
+
+        payload["dynamic_answers"]["first"] = "Desenează zilnic"
+        response = self.client.post(
+            "/api/membrii/applications/", json.dumps(payload), content_type="application/json"
+        )
+        self.assertEqual(response.status_code, 201)
+
+        questions = [item["question"] for item in MembershipApplication.objects.get().qa_json]
+        self.assertEqual(questions[5:7], ["Prima întrebare", "A doua întrebare"])
+
+
+@override_settings(EMAIL_BACKEND="django.core.mail.backends.locmem.EmailBackend")
+class NewsletterConfirmTests(TestCase):
+    def _subscribe(self, email="abonat@example.com"):
+        # the confirmation task is enqueued on commit
+        with self.captureOnCommitCallbacks(execute=True):
+            return self.client.post(
+                "/api/newsletter/subscribe/", json.dumps({"email": email}), content_type="application/json"
+            )
+
+    def _confirm_url(self):
+        body = mail.outbox[-1].body
+        return next(line for line in body.splitlines() if "/api/newsletter/confirm/" in line)
+
+    def test_signed_token_confirms_by_primary_key(self):
+        self._subscribe()
+        sub = NewsletterSubscriber.objects.get()
+        self.assertEqual(sub.confirm_token, "")
+
+        response = self.client.get(self._confirm_url())
+
+        self.assertEqual(response.status_code, 200)
+        sub.refresh_from_db()
+        self.assertTrue(sub.is_active)
+        self.assertIsNotNone(sub.confirmed_at)
+
+    def test_tampered_token_is_rejected(self):
+        self._subscribe()
+        sub = NewsletterSubscriber.objects.get()
+        other = NewsletterSubscriber.objects.create(email="altul@example.com", confirm_sent_at=sub.confirm_sent_at)
+        token = _make_newsletter_confirm_token(sub.pk, sub.confirm_sent_at).replace(f"{sub.pk}.", f"{other.pk}.", 1)
+
+        response = self.client.get("/api/newsletter/confirm/", {"token": token})
+
+        self.assertEqual(response.status_code, 400)
+        self.assertFalse(NewsletterSubscriber.objects.filter(is_active=True).exists())
+
+    @override_settings(NEWSLETTER_CONFIRM_TTL_HOURS=1)
+    def test_expired_token_is_rejected(self):
+        sub = NewsletterSubscriber.objects.create(email="abonat@example.com", confirm_sent_at=timezone.now())
+        with mock.patch("time.time", return_value=time.time() - 2 * 3600):
+            token = _make_newsletter_confirm_token(sub.pk, sub.confirm_sent_at)
+
+        response = self.client.get("/api/newsletter/confirm/", {"token": token})
+
+        self.assertContains(response, "Link expirat", status_code=400)
+
+    def test_link_does_not_reactivate_after_unsubscribe(self):
+        self._subscribe()
+        confirm_url = self._confirm_url()
+        self.client.get(confirm_url)
+        sub = NewsletterSubscriber.objects.get()
+        self.client.post(f"/api/newsletter/unsubscribe/?token={make_unsubscribe_token(sub.pk)}")
+
+        response = self.client.get(confirm_url)
+
+        self.assertEqual(response.status_code, 400)
+        self.assertFalse(NewsletterSubscriber.objects.get().is_active)
+
+    def test_newer_request_supersedes_older_link(self):
+        self._subscribe()
+        old_url = self._confirm_url()
+        NewsletterSubscriber.objects.update(confirm_sent_at=timezone.now() - timedelta(hours=1))
+        self._subscribe()
+
+        self.assertEqual(self.client.get(old_url).status_code, 400)
+        self.assertEqual(self.client.get(self._confirm_url()).status_code, 200)
+        self.assertTrue(NewsletterSubscriber.objects.get().is_active)
+
+    def test_legacy_stored_token_still_confirms(self):
+        sub = NewsletterSubscriber.objects.create(
+            email="vechi@example.com", confirm_token="legacy-token", confirm_sent_at=timezone.now()
+        )
+
+        response = self.client.get("/api/newsletter/confirm/", {"token": "legacy-token"})
+
+        self.assertEqual(response.status_code, 200)
+        sub.refresh_from_db()
+        self.assertTrue(sub.is_active)
+        self.assertEqual(sub.confirm_token, "")
+
+
+@override_settings(EMAIL_BACKEND="django.core.mail.backends.locmem.EmailBackend")
+class NewsletterSubscribeTests(TestCase):
+    def _subscribe(self, email="abonat@example.com", **extra):
+        # the confirmation task is enqueued on commit
+        with self.captureOnCommitCallbacks(execute=True):
+            return self.client.post(
+                "/api/newsletter/subscribe/", json.dumps({"email": email}), content_type="application/json", **extra
+            )
+
+    def test_confirmation_is_sent_through_task(self):
+        with mock.patch("core.views.send_newsletter_confirmation") as confirmation_task:
+            response = self._subscribe()
+        enqueue = confirmation_task.enqueue
+
+        self.assertEqual(response.status_code, 201)
+        self.assertEqual(response.json()["status"], "pending_confirm")
+        enqueue.assert_called_once()
+        self.assertEqual(enqueue.call_args.args[0], "abonat@example.com")
+
+    def test_resend_is_suppressed_inside_window(self):
+        self._subscribe()
+        response = self._subscribe()
+
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.json()["status"], "pending_confirm")
+        self.assertEqual(len(mail.outbox), 1)
+        self.assertEqual(NewsletterSubscriber.objects.count(), 1)
+
+    @override_settings(NEWSLETTER_RESEND_WINDOW_SECONDS=0)
+    def test_resend_after_window_refreshes_row(self):
+        self._subscribe()
+        first_sent_at = NewsletterSubscriber.objects.get().confirm_sent_at
+
+        response = self._subscribe()
+
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(len(mail.outbox), 2)
+        sub = NewsletterSubscriber.objects.get()
+        self.assertGreater(sub.confirm_sent_at, first_sent_at)
+        self.assertFalse(sub.is_active)
+
+    @override_settings(NEWSLETTER_RESEND_WINDOW_SECONDS=0)
+    def test_resubscribe_without_meta_keeps_stored_ip_and_user_agent(self):
+        self._subscribe(HTTP_USER_AGENT="Firefox", REMOTE_ADDR="10.0.0.1")
+        self._subscribe(HTTP_USER_AGENT="", REMOTE_ADDR="")
+
+        sub = NewsletterSubscriber.objects.get()
+        self.assertEqual((sub.ip_address, sub.user_agent), ("10.0.0.1", "Firefox"))
+        self.assertEqual(len(mail.outbox), 2)
+
+    def test_confirmed_address_is_not_resent(self):
+        NewsletterSubscriber.objects.create(email="abonat@example.com", is_active=True, confirmed_at=timezone.now())
+
+        response = self._subscribe()
+
+        self.assertEqual(response.json()["status"], "already_confirmed")
+        self.assertEqual(len(mail.outbox), 0)
+
+
+@override_settings(EMAIL_BACKEND="django.core.mail.backends.locmem.EmailBackend")
+class NewsletterCampaignTests(TestCase):
+    def setUp(self):
+        now = timezone.now()
+        NewsletterSubscriber.objects.bulk_create(
+            [NewsletterSubscriber(email=f"abonat{i}@example.com", is_active=True, confirmed_at=now) for i in range(25)]
+            + [NewsletterSubscriber(email="pending@example.com")]
+        )
+        self.campaign = NewsletterCampaign.objects.create(subject="Sesiuni noi", body_text="Salut!")
+
+    def _send(self, *extra):
+        call_command(
+            "send_newsletter_campaign", self.campaign.pk, "--batch-size=10", "--workers=3", "--rate=0", *extra,
+            stdout=io.StringIO(),
+        )
+
+    def test_sends_to_confirmed_subscribers_only(self):
+        self._send()
+
+        recipients = sorted(m.to[0] for m in mail.outbox)
+        self.assertEqual(len(recipients), 25)
+        self.assertNotIn("pending@example.com", recipients)
+
+        self.campaign.refresh_from_db()
+        self.assertEqual(self.campaign.status, "sent")
+        self.assertEqual(self.campaign.sent_count, 25)
+        self.assertFalse(self.campaign.deliveries.filter(status="pending").exists())
+
+    def test_resume_skips_already_sent_recipients(self):
+        self._send()
+        mail.outbox.clear()
+
+        NewsletterSubscriber.objects.create(email="nou@example.com", is_active=True, confirmed_at=timezone.now())
+        self._send("--force")
+
+        self.assertEqual([m.to[0] for m in mail.outbox], ["nou@example.com"])
+        self.assertEqual(self.campaign.deliveries.count(), 26)
+
+    def test_messages_carry_one_click_unsubscribe(self):
+        self._send()
+        message = next(m for m in mail.outbox if m.to == ["abonat3@example.com"])
+        url = message.extra_headers["List-Unsubscribe"].strip("<>")
+        self.assertEqual(message.extra_headers["List-Unsubscribe-Post"], "List-Unsubscribe=One-Click")
+        self.assertIn(url, message.body)
+
+        path = url.split("://", 1)[-1].split("/", 1)[1]
+        self.assertContains(self.client.get("/" + path), "Dezabonează-mă")
+        self.assertTrue(NewsletterSubscriber.objects.get(email="abonat3@example.com").is_active)
+
+        response = self.client.post("/" + path, {"List-Unsubscribe": "One-Click"})
+        self.assertEqual(response.status_code, 200)
+        self.assertFalse(NewsletterSubscriber.objects.get(email="abonat3@example.com").is_active)
+        self.assertEqual(NewsletterSubscriber.objects.filter(is_active=True).count(), 24)
+
+    def test_tampered_unsubscribe_token_is_rejected(self):
+        sub = NewsletterSubscriber.objects.get(email="abonat0@example.com")
+        other = NewsletterSubscriber.objects.get(email="abonat1@example.com")
+        token = make_unsubscribe_token(sub.pk).replace(f"{sub.pk}:", f"{other.pk}:", 1)
+
+        response = self.client.post(f"/api/newsletter/unsubscribe/?token={token}")
+
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(NewsletterSubscriber.objects.filter(is_active=True).count(), 25)
+
+    def test_campaign_with_only_failed_deliveries_is_failed(self):
+        with mock.patch("django.core.mail.backends.locmem.EmailBackend.send_messages", side_effect=OSError("refused")):
+            self._send()
+
+        self.campaign.refresh_from_db()
+        self.assertEqual(self.campaign.status, "failed")
+        self.assertEqual((self.campaign.sent_count, self.campaign.failed_count), (0, 25))
+
+        # failed deliveries are final until a run asks for them again
+        self._send()
+        self.assertEqual(len(mail.outbox), 0)
+        self._send("--retry-failed")
+        self.campaign.refresh_from_db()
+        self.assertEqual(len(mail.outbox), 25)
+        self.assertEqual((self.campaign.status, self.campaign.sent_count, self.campaign.failed_count), ("sent", 25, 0))
+
+    @override_settings(NEWSLETTER_CAMPAIGN_RATE_PER_MINUTE=0)
+    def test_queued_campaign_is_sent_by_one_run_only(self):
+        NewsletterCampaign.objects.filter(pk=self.campaign.pk).update(status="queued")
+        # the worker claims it between the command's status check and its own claim
+        with mock.patch("core.newsletter.claim_campaign", return_value=False):
+            with self.assertRaises(CommandError):
+                self._send()
+
+        self.assertEqual(send_newsletter_campaign.call(self.campaign.pk)["sent"], 25)
+        # a duplicate enqueue finds it already claimed
+        self.assertEqual(send_newsletter_campaign.call(self.campaign.pk)["sent"], 0)
+        self.assertEqual(len(mail.outbox), 25)
+
+
+@override_settings(NEWSLETTER_CONFIRM_TTL_HOURS=72)
+class NewsletterCleanupTests(TestCase):
+    def test_deletes_only_expired_pending_rows_in_batches(self):
+        old = timezone.now() - timedelta(hours=100)
+        NewsletterSubscriber.objects.bulk_create(
+            [NewsletterSubscriber(email=f"expirat{i}@example.com", confirm_sent_at=old) for i in range(7)]
+            + [
+                NewsletterSubscriber(email="recent@example.com", confirm_sent_at=timezone.now()),
+                NewsletterSubscriber(email="confirmat@example.com", is_active=True, confirmed_at=old, created_at=old),
+                NewsletterSubscriber(email="fara-link@example.com", created_at=old),
+            ]
+        )
+
+        with tempfile.TemporaryDirectory() as tmp:
+            archive = os.path.join(tmp, "archive.csv")
+            out = io.StringIO()
+            call_command("cleanup_newsletter_pending", "--batch-size=3", f"--archive={archive}", stdout=out)
+
+            with open(archive, encoding="utf-8") as f:
+                archived = list(csv.DictReader(f))
+
+        self.assertEqual(len(archived), 8)
+        self.assertEqual(
+            sorted(NewsletterSubscriber.objects.values_list("email", flat=True)),
+            ["confirmat@example.com", "recent@example.com"],
+        )
+        self.assertIn("Deleted: 8", out.getvalue())
+
+    def test_dry_run_keeps_rows(self):
+        NewsletterSubscriber.objects.create(
+            email="expirat@example.com", confirm_sent_at=timezone.now() - timedelta(days=10)
+        )
+
+        call_command("cleanup_newsletter_pending", "--dry-run", stdout=io.StringIO())
+
+        self.assertEqual(NewsletterSubscriber.objects.count(), 1)
+
+    def test_failed_delete_is_not_archived(self):
+        NewsletterSubscriber.objects.create(
+            email="expirat@example.com", confirm_sent_at=timezone.now() - timedelta(days=10)
+        )
+
+        with tempfile.TemporaryDirectory() as tmp:
+            archive = os.path.join(tmp, "archive.csv")
+            with mock.patch("django.db.models.query.QuerySet.delete", side_effect=DatabaseError("lock timeout")):
+                with self.assertRaises(DatabaseError):
+                    cleanup_expired_pending(archive_path=archive)
+
+            with open(archive, encoding="utf-8") as f:
+                self.assertEqual(list(csv.DictReader(f)), [])
+        self.assertEqual(NewsletterSubscriber.objects.count(), 1)
+
+
+class MembrieQACountTests(TestCase):
+    def _create(self, **kwargs):
+        fields = dict(
+            parent_name="Ana",
+            phone="0700000000",
+            email="ana@example.com",
+            child_name="Ion",
+            child_age="7",
+            expectation="hobby",
+        )
+        fields.update(kwargs)
+        return MembershipApplication.objects.create(**fields)
+
+    def test_save_maintains_qa_count(self):
+        app = self._create(qa_json=[{"question": "Q", "answer": "A"}, {"question": "", "answer": "x"}])
+        self.assertEqual(app.qa_count, 1)
+
+        app.qa_json = None
+        app.raw_payload = {"qa_items": [{"question": f"Q{i}", "answer": ""} for i in range(4)]}
+        app.save(update_fields=["qa_json", "raw_payload"])
+        app.refresh_from_db()
+        self.assertEqual(app.qa_count, 4)
+
+    def test_max_qa_is_a_single_aggregate_query(self):
+        self._create(qa_json=[{"question": "Q1", "answer": "A"}])
+        self._create(qa_json=[{"question": f"Q{i}", "answer": "A"} for i in range(5)])
+
+        with self.assertNumQueries(1):
+            self.assertEqual(exports.membrie_max_qa(), 5)
+
+
+class MembrieAdminExportTests(TestCase):
+    ROWS = 3000
+
+    @classmethod
+    def setUpTestData(cls):
+        apps = MembershipApplication.objects.bulk_create(
+            [
+                MembershipApplication(
+                    parent_name=f"Părinte {i}",
+                    phone="0700000000",
+                    email=f"p{i}@example.com",
+                    child_name="Copil",
+                    child_age="7",
+                    expectation="relaxation",
+                )
+                for i in range(cls.ROWS)
+            ]
+        )
+        items = []
+        for i, app in enumerate(apps):
+            for order in range(3 if i == 0 else 2):
+                items.append(MembershipQAItem(application=app, question=f"Q{order}", answer=f"A{order}", order=order))
+        MembershipQAItem.objects.bulk_create(items)
+        cls.staff = get_user_model().objects.create_superuser("admin", "admin@example.com", "parola")
+
+    def test_rows_use_constant_number_of_queries(self):
+        # aggregate for the header + one SELECT + one prefetch per CHUNK_SIZE applications
+        chunks = -(-self.ROWS // exports.CHUNK_SIZE)
+        with self.assertNumQueries(2 + chunks):
+            rows = list(exports.membrie_admin_rows(MembershipApplication.objects.all()))
+
+        self.assertEqual(len(rows), self.ROWS + 1)
+        self.assertEqual(rows[0][-2:], ["question_3", "answer_3"])
+        self.assertTrue(all(len(row) == len(rows[0]) for row in rows))
+        qa_columns = sorted(tuple(row[12:]) for row in rows[1:])
+        self.assertEqual(qa_columns[0], ("Q0", "A0", "Q1", "A1", "", ""))
+        self.assertEqual(qa_columns[-1], ("Q0", "A0", "Q1", "A1", "Q2", "A2"))
+
+    def test_admin_action_streams_csv(self):
+        self.client.force_login(self.staff)
+        response = self.client.post(
+            "/django-admin/core/membershipapplication/",
+            {"action": "export_csv", "select_across": "1", "_selected_action": ["1"], "index": "0"},
+        )
+        self.assertEqual(response.status_code, 200)
+        self.assertTrue(response.streaming)
+        lines = b"".join(response.streaming_content).decode("utf-8").splitlines()
+        self.assertEqual(len(lines), self.ROWS + 1)
+
+    def test_gzip_admin_actions(self):
+        self.client.force_login(self.staff)
+        NewsletterSubscriber.objects.create(email="abonat@example.com")
+        for url, action, rows in (
+            ("/django-admin/core/membershipapplication/", "export_csv_gzip", self.ROWS + 1),
+            ("/django-admin/core/newslettersubscriber/", "export_newsletter_csv_gzip", 2),
+        ):
+            response = self.client.post(
+                url, {"action": action, "select_across": "1", "_selected_action": ["1"], "index": "0"}
+            )
+            self.assertEqual(response["Content-Type"], "application/gzip")
+            self.assertIn('.csv.gz"', response["Content-Disposition"])
+            lines = gzip.decompress(b"".join(response.streaming_content)).decode("utf-8").splitlines()
+            self.assertEqual(len(lines), rows)
+
+
+class AdminSearchIndexTests(TestCase):
+    """Migration 0032 / Meta.indexes have to keep up with the admin search and filters."""
+
+    migration = importlib.import_module("core.migrations.0032_admin_search_indexes")
+
+    def test_search_fields_have_trigram_indexes(self):
+        trigram = {(table, column) for _, table, column in self.migration.TRIGRAM_INDEXES}
+        for model, search_fields in (
+            (MembershipApplication, admin.site._registry[MembershipApplication].search_fields),
+            (MembershipApplication, MembershipApplicationViewSet.search_fields),
+            (NewsletterSubscriber, admin.site._registry[NewsletterSubscriber].search_fields),
+        ):
+            for name in search_fields:
+                with self.subTest(model=model.__name__, field=name):
+                    self.assertIn((model._meta.db_table, model._meta.get_field(name).column), trigram)
+
+    def test_list_filters_lead_an_index(self):
+        for model, filters in (
+            (MembershipApplication, admin.site._registry[MembershipApplication].list_filter),
+            (MembershipApplication, MembershipApplicationViewSet.list_filter),
+            (NewsletterSubscriber, ("is_active", "created_at")),
+        ):
+            leading = {f.name for f in model._meta.fields if f.db_index or f.unique}
+            leading |= {index.fields[0].lstrip("-") for index in model._meta.indexes if not index.condition}
+            for name in filters:
+                with self.subTest(model=model.__name__, field=name):
+                    self.assertIn(name, leading)
+
+    def test_trigram_indexes_match_icontains_sql(self):
+        schema_editor = mock.Mock()
+        schema_editor.connection.vendor = "sqlite"
+        self.migration.create_trigram_indexes(None, schema_editor)
+        self.migration.drop_trigram_indexes(None, schema_editor)
+        schema_editor.execute.assert_not_called()
+
+        schema_editor.connection.vendor = "postgresql"
+        self.migration.create_trigram_indexes(None, schema_editor)
+        statements = [c.args[0] for c in schema_editor.execute.call_args_list]
+        self.assertEqual(len(statements), len(self.migration.TRIGRAM_INDEXES) + 1)
+
+        from django.db.backends.postgresql.operations import DatabaseOperations
+
+        ops = DatabaseOperations(None)
+        models_by_table = {m._meta.db_table: m for m in (MembershipApplication, NewsletterSubscriber)}
+        for (name, table, column), sql in zip(self.migration.TRIGRAM_INDEXES, statements[1:]):
+            field = models_by_table[table]._meta.get_field(column)
+            # the expression icontains compiles to on Postgres, e.g. UPPER(email::text)
+            expression = ops.lookup_cast("icontains", field.get_internal_type()) % column
+            with self.subTest(index=name):
+                self.assertIn(f"({expression} gin_trgm_ops)", sql)
+
+
+class StreamingExportTests(TestCase):
+    ROWS = 100_000
+    MEMORY_CEILING = 16 * 1024 * 1024
+
+    @classmethod
+    def setUpTestData(cls):
+        qa = [{"question": f"Întrebarea {i}", "answer": "Răspuns " * 8} for i in range(3)]
+        MembershipApplication.objects.bulk_create(
+            (
+                MembershipApplication(
+                    parent_name=f"Părinte {i}",
+                    phone="0700000000",
+                    email=f"parinte{i}@example.com",
+                    child_name=f"Copil {i}",
+                    child_age="7",
+                    expectation="hobby",
+                    qa_json=qa,
+                    raw_payload={"qa_items": qa},
+                    qa_count=len(qa),  # bulk_create skips save()
+                    user_agent="Mozilla/5.0 (X11; Linux x86_64)",
+                )
+                for i in range(cls.ROWS)
+            ),
+            batch_size=5000,
+        )
+        cls.staff = get_user_model().objects.create_superuser("admin", "admin@example.com", "parola")
+
+    def setUp(self):
+        self.client.force_login(self.staff)
+
+    def _consume(self, url, gzipped=False):
+        """Returns (uncompressed size, line count, peak traced memory); gzipped bodies are inflated on the fly."""
+        tracemalloc.start()
+        try:
+            response = self.client.get(url)
+            self.assertTrue(response.streaming)
+            inflater = zlib.decompressobj(wbits=31) if gzipped else None
+            size = lines = 0
+            for chunk in response.streaming_content:
+                if inflater:
+                    chunk = inflater.decompress(chunk)
+                size += len(chunk)
+                lines += chunk.count(b"\n")
+            if inflater:
+                self.assertTrue(inflater.eof)
+            _, peak = tracemalloc.get_traced_memory()
+        finally:
+            tracemalloc.stop()
+        return size, lines, peak
+
+    def test_full_export_streams_under_memory_ceiling(self):
+        size, lines, peak = self._consume("/admin/membrie/export-csv-full/")
+
+        self.assertEqual(lines, self.ROWS + 1)
+        # buffering the whole file would blow the ceiling on its own
+        self.assertGreater(size, 3 * self.MEMORY_CEILING)
+        self.assertLess(peak, self.MEMORY_CEILING)
+
+    def test_full_export_gzip_streams_under_memory_ceiling(self):
+        response = self.client.get("/admin/membrie/export-csv-full/?gzip=1")
+        self.assertEqual(response["Content-Type"], exports.GZIP_CONTENT_TYPE)
+        self.assertIn('filename="membrie_applications_full.csv.gz"', response["Content-Disposition"])
+        response.close()
+
+        size, lines, peak = self._consume("/admin/membrie/export-csv-full/?gzip=1", gzipped=True)
+
+        self.assertEqual(lines, self.ROWS + 1)
+        self.assertGreater(size, 3 * self.MEMORY_CEILING)
+        self.assertLess(peak, self.MEMORY_CEILING)
+
+    def test_ordered_export_header_and_rows(self):
+        response = self.client.get("/admin/membrie/export-csv/")
+        first_lines = []
+        for chunk in response.streaming_content:
+            first_lines.append(chunk.decode("utf-8"))
+            if len(first_lines) == 2:
+                break
+        response.close()
+
+        header = next(csv.reader(io.StringIO(first_lines[0])))
+        row = next(csv.reader(io.StringIO(first_lines[1])))
+        self.assertEqual(header[-2:], ["Q3", "A3"])
+        self.assertEqual(row[8:10], ["Întrebarea 0", ("Răspuns " * 8).strip()])
+
+
+class XlsxExportTests(TestCase):
+    def setUp(self):
+        self.client.force_login(get_user_model().objects.create_superuser("admin", "admin@example.com", "parola"))
+
+    def test_membrie_xlsx_has_typed_dates_and_frozen_header(self):
+        MembershipApplication.objects.create(
+            parent_name="Ștefan Țurcanu",
+            phone="0700000000",
+            email="stefan@example.com",
+            child_name="Ilinca",
+            child_age="6",
+            expectation="performance",
+            qa_json=[{"question": "Relația cu arta", "answer": "Desenează\nși pictează\x0b zilnic"}],
+        )
+
+        response = self.client.get("/admin/membrie/export-xlsx/")
+        self.assertEqual(response["Content-Type"], exports.XLSX_CONTENT_TYPE)
+
+        wb = openpyxl.load_workbook(io.BytesIO(b"".join(response.streaming_content)))
+        ws = wb.active
+        self.assertEqual(ws.freeze_panes, "A2")
+        header = [c.value for c in ws[1]]
+        row = [c.value for c in ws[2]]
+        self.assertEqual(header[-2:], ["Q1", "A1"])
+        self.assertIsInstance(row[0], datetime)
+        self.assertEqual(row[1], "Ștefan Țurcanu")
+        self.assertEqual(row[-1], "Desenează\nși pictează zilnic")
+
+    def test_xlsx_gzip(self):
+        NewsletterSubscriber.objects.create(email="abonat@example.com", is_active=True, confirmed_at=timezone.now())
+
+        response = self.client.get("/admin/newsletter/export-xlsx-active/?gzip=1")
+        self.assertEqual(response["Content-Type"], exports.GZIP_CONTENT_TYPE)
+
+        ws = openpyxl.load_workbook(io.BytesIO(gzip.decompress(b"".join(response.streaming_content)))).active
+        self.assertEqual([c.value for c in ws[2]][0], "abonat@example.com")
+
+
+class ExportJobTests(TestCase):
+    def setUp(self):
+        self.staff = get_user_model().objects.create_superuser("admin", "admin@example.com", "parola")
+        self.client.force_login(self.staff)
+
+        tmpdir = tempfile.TemporaryDirectory()
+        self.addCleanup(tmpdir.cleanup)
+        storage_patch = mock.patch.object(
+            ExportJob._meta.get_field("file"), "storage", FileSystemStorage(location=tmpdir.name)
+        )
+        storage_patch.start()
+        self.addCleanup(storage_patch.stop)
+
+        now = timezone.now()
+        NewsletterSubscriber.objects.bulk_create(
+            [
+                NewsletterSubscriber(email=f"activ{i}@example.com", is_active=True, confirmed_at=now)
+                for i in range(5)
+            ]
+            + [NewsletterSubscriber(email="pending@example.com", is_active=False)]
+        )
+
+    def test_menu_request_queues_job_and_download_link_works(self):
+        confirm = self.client.get("/admin/exports/new/?kind=newsletter_active&format=csv")
+        self.assertEqual(confirm.status_code, 200)
+
+        # run_export_job is enqueued on commit
+        with self.captureOnCommitCallbacks(execute=True):
+            response = self.client.post(
+                "/admin/exports/new/", {"kind": "newsletter_active", "format": "csv", "gzip": "1"}
+            )
+        self.assertRedirects(response, "/admin/exports/")
+
+        job = ExportJob.objects.get()
+        self.assertEqual(job.status, "done")
+        self.assertEqual((job.rows_done, job.rows_total), (5, 5))
+        self.assertTrue(job.file.name.endswith(".csv.gz"))
+
+        listing = self.client.get("/admin/exports/")
+        self.assertFalse(listing.context["in_progress"])
+        download_url = listing.context["jobs"][0].download_url
+
+        download = self.client.get(download_url)
+        self.assertEqual(download["Content-Type"], "application/gzip")
+        lines = gzip.decompress(b"".join(download.streaming_content)).decode("utf-8").splitlines()
+        self.assertEqual(lines[0].split(","), exports.NEWSLETTER_FIELDS)
+        self.assertEqual(len(lines), 6)
+
+        tampered = download_url[:-1] + ("A" if download_url[-1] != "A" else "B")
+        self.assertEqual(self.client.get(tampered).status_code, 404)
+
+        with override_settings(EXPORT_DOWNLOAD_MAX_AGE=60):
+            with mock.patch("django.core.signing.time.time", return_value=time.time() + 120):
+                self.assertEqual(self.client.get(download_url).status_code, 404)
+
+    def test_xlsx_job(self):
+        job = ExportJob.objects.create(created_by=self.staff, kind="newsletter_all", file_format="xlsx", compress=True)
+        exports.generate_export(job)
+
+        job.refresh_from_db()
+        self.assertEqual(job.status, "done")
+        self.assertFalse(job.compress)
+        with job.file.open("rb") as f:
+            ws = openpyxl.load_workbook(io.BytesIO(f.read())).active
+        self.assertEqual(ws.max_row, 7)
+
+    def _finished_job(self, days_old):
+        job = ExportJob.objects.create(created_by=self.staff, kind="newsletter_all")
+        exports.generate_export(job)
+        ExportJob.objects.filter(pk=job.pk).update(created_at=timezone.now() - timedelta(days=days_old))
+        job.refresh_from_db()
+        return job
+
+    @override_settings(EXPORT_RETENTION_DAYS=7)
+    def test_cleanup_deletes_expired_files_and_jobs(self):
+        old, recent = self._finished_job(10), self._finished_job(1)
+        storage = old.file.storage
+        self.assertTrue(storage.exists(old.file.name))
+
+        call_command("cleanup_exports", "--dry-run", stdout=io.StringIO())
+        self.assertEqual(ExportJob.objects.count(), 2)
+
+        call_command("cleanup_exports", stdout=io.StringIO())
+        self.assertEqual(list(ExportJob.objects.values_list("pk", flat=True)), [recent.pk])
+        self.assertFalse(storage.exists(old.file.name))
+        self.assertTrue(storage.exists(recent.file.name))
+
+    @override_settings(EXPORT_RETENTION_DAYS=7)
+    def test_new_export_removes_expired_ones(self):
+        old = self._finished_job(10)
+        with self.captureOnCommitCallbacks(execute=True):
+            self.client.post("/admin/exports/new/", {"kind": "newsletter_active", "format": "csv"})
+
+        self.assertFalse(ExportJob.objects.filter(pk=old.pk).exists())
+        self.assertFalse(old.file.storage.exists(old.file.name))
+        self.assertEqual(ExportJob.objects.get().status, "done")
+
+    def _delta_job(self, kind="newsletter_active"):
+        job = ExportJob.objects.create(created_by=self.staff, kind=kind, since_last=True)
+        exports.generate_export(job)
+        job.refresh_from_db()
+        with job.file.open("rb") as f:
+            return list(csv.reader(io.StringIO(f.read().decode("utf-8"))))
+
+    def test_since_last_exports_only_new_rows(self):
+        first = self._delta_job()
+        self.assertEqual(len(first), 6)
+
+        watermark = ExportWatermark.objects.get(user=self.staff, kind="newsletter_active")
+        newest = NewsletterSubscriber.objects.filter(is_active=True).order_by("-confirmed_at", "-id").first()
+        self.assertEqual(watermark.last_id, newest.pk)
+
+        self.assertEqual(len(self._delta_job()), 1)  # header only
+
+        NewsletterSubscriber.objects.filter(email="pending@example.com").update(
+            is_active=True, confirmed_at=timezone.now() + timedelta(seconds=1)
+        )
+        rows = self._delta_job()
+        self.assertEqual([row[0] for row in rows[1:]], ["pending@example.com"])
+
+        # watermarks are per user and per kind
+        self.assertEqual(len(self._delta_job(kind="newsletter_all")), 7)
+
+    def test_delta_window_without_new_rows(self):
+        self._delta_job()
+        watermark = ExportWatermark.objects.get(user=self.staff, kind="newsletter_active")
+        with self.assertNumQueries(2):
+            queryset, top = exports.delta_window(exports.newsletter_active_queryset(), "newsletter_active", watermark)
+            self.assertIsNone(top)
+            self.assertEqual(list(queryset), [])
+
+
+class SitemapTests(JurnalTestMixin, TestCase):
+    def setUp(self):
+        super().setUp()
+        self.articles = [self._publish(f"articol-{i}", title=f"Articol {i}") for i in range(3)]
+
+    def test_urls_match_get_url_and_have_lastmod(self):
+        response = self.client.get("/sitemap.xml")
+        self.assertEqual(response.status_code, 200)
+        content = response.content.decode()
+
+        for page in [self.index, *self.articles]:
+            page.refresh_from_db()
+            self.assertIn(f"<loc>http://testserver{page.get_url()}</loc>", content)
+            self.assertIn(f"<lastmod>{page.last_published_at:%Y-%m-%d}</lastmod>", content)
+
+    def test_cached_until_publish(self):
+        self.client.get("/sitemap.xml")
+        with self.assertNumQueries(0):
+            self.client.get("/sitemap.xml")
+
+        article = self.index.add_child(instance=JurnalArticlePage(title="Nou", slug="articol-nou", live=False))
+        self.assertNotIn("articol-nou", self.client.get("/sitemap.xml").content.decode())
+
+        article.save_revision().publish()
+        self.assertIn("articol-nou", self.client.get("/sitemap.xml").content.decode())
+
+    @override_settings(SITEMAP_PAGE_SIZE=2)
+    def test_index_above_page_size(self):
+        content = self.client.get("/sitemap.xml").content.decode()
+        self.assertIn("<sitemapindex", content)
+        self.assertIn("http://testserver/sitemap-jurnal.xml?p=2", content)
+
+        page_2 = self.client.get("/sitemap-jurnal.xml?p=2").content.decode()
+        self.assertEqual(page_2.count("<url>"), 1)
+        self.assertEqual(self.client.get("/sitemap-jurnal.xml?p=9").status_code, 404)
+        self.assertEqual(self.client.get("/sitemap-nope.xml").status_code, 404)
+
+
+class ImageSitemapTests(JurnalTestMixin, TestCase):
+    def setUp(self):
+        super().setUp()
+        media = tempfile.TemporaryDirectory()
+        self.addCleanup(media.cleanup)
+        media_override = override_settings(MEDIA_ROOT=media.name)
+        media_override.enable()
+        self.addCleanup(media_override.disable)
+
+    def _add_article(self, i, generate_renditions=True):
+        Image = get_image_model()
+        hero = Image.objects.create(title=f"hero {i}", file=get_test_image_file())
+        article = self.index.add_child(
+            instance=JurnalArticlePage(title=f"Articol {i}", slug=f"articol-{i}", hero_image=hero)
+        )
+        for n in range(2):
+            JurnalArticleGalleryImage.objects.create(
+                page=article, image=Image.objects.create(title=f"g{i}.{n}", file=get_test_image_file()), sort_order=n
+            )
+        # the rendition task is queued on commit
+        with self.captureOnCommitCallbacks(execute=generate_renditions):
+            article.save_revision().publish()
+        return article
+
+    def _urls(self):
+        with CaptureQueriesContext(connection) as queries:
+            urls = JurnalImageSitemap().get_urls(site=SimpleNamespace(domain="testserver"), protocol="http")
+        return urls, len(queries)
+
+    def test_lists_renditions_in_constant_queries(self):
+        self._add_article(0)
+        self._add_article(1)
+        self._urls()  # warms Site.get_site_root_paths()
+        urls, small = self._urls()
+        self.assertEqual(len(urls), 2)
+        self.assertTrue(all(len(url["item"]["images"]) == 3 for url in urls))
+        self.assertTrue(urls[0]["item"]["images"][0].startswith("http://testserver/media/images/"))
+
+        for i in range(2, 6):
+            self._add_article(i)
+        self._urls()
+        _, large = self._urls()
+        self.assertEqual(large, small)
+
+    def test_sitemap_xml_has_image_entries(self):
+        article = self._add_article(0)
+        content = self.client.get("/sitemap.xml").content.decode()
+        self.assertIn('xmlns:image="http://www.google.com/schemas/sitemap-image/1.1"', content)
+        self.assertEqual(content.count("<image:loc>"), 3)
+
+        hero = get_image_model().objects.get(pk=article.hero_image_id)
+        self.assertIn(hero.get_rendition("max-1600x1600").url, content)
+
+    def test_missing_renditions_list_originals_without_generating(self):
+        article = self._add_article(0, generate_renditions=False)
+        urls, _ = self._urls()
+
+        hero = get_image_model().objects.get(pk=article.hero_image_id)
+        self.assertEqual(urls[0]["item"]["images"][0], "http://testserver" + hero.file.url)
+        self.assertFalse(get_image_model().get_rendition_model().objects.exists())
+
+
+class JurnalSearchApiTests(JurnalTestMixin, TestCase):
+    def setUp(self):
+        super().setUp()
+        for i in range(3):
+            self._publish(f"articol-{i}", title=f"Acuarelă {i}", excerpt="Despre acuarela în atelier")
+        self._publish("altceva", title="Lut", excerpt="Ceramică")
+
+    def test_cards_match_jurnal_list_and_keyset_pages(self):
+        list_item = self.client.get("/api/jurnal/").json()["items"][0]
+
+        seen, pages = [], 0
+        url = "/api/search/?q=acuarela&limit=2"
+        while url:
+            data = self.client.get(url).json()
+            self.assertEqual(set(data["items"][0]), set(list_item))
+            seen += [item["slug"] for item in data["items"]]
+            url = f"/api/search/?q=acuarela&limit=2&cursor={data['next']}" if data["next"] else None
+            pages += 1
+
+        self.assertEqual(pages, 2)
+        self.assertEqual(sorted(seen), ["articol-0", "articol-1", "articol-2"])
+
+    def test_normalized_query_is_cached_until_publish(self):
+        first = self.client.get("/api/search/?q=Acuarela").json()
+        self.assertEqual(len(first["items"]), 3)
+        with self.assertNumQueries(0):
+            second = self.client.get("/api/search/?q=%20acuarela%20%20").json()
+        self.assertEqual(first["items"], second["items"])
+
+        self._publish("nou", title="Acuarela nouă")
+        slugs = [item["slug"] for item in self.client.get("/api/search/?q=acuarela").json()["items"]]
+        self.assertIn("nou", slugs)
+
+    def test_bad_input(self):
+        self.assertEqual(self.client.get("/api/search/?q=").json(), {"query": "", "items": [], "next": None})
+        self.assertEqual(self.client.get("/api/search/?q=x&cursor=%%%").status_code, 400)
+        self.assertEqual(self.client.get("/api/search/?q=x&limit=abc").status_code, 400)
+
+
+class HeadlessCacheTests(JurnalTestMixin, TestCase):
+    def setUp(self):
+        super().setUp()
+        self._publish("primul", title="Primul")
+
+    def test_jurnal_payloads_cached_until_publish(self):
+        self.client.get("/api/jurnal/")
+        self.client.get("/api/jurnal/primul/")
+        with self.assertNumQueries(0):
+            self.assertEqual(len(self.client.get("/api/jurnal/").json()["items"]), 1)
+            self.assertEqual(self.client.get("/api/jurnal/primul/").json()["detail"]["title"], "Primul")
+
+        self._publish("al-doilea", title="Al doilea")
+        self.assertEqual(len(self.client.get("/api/jurnal/").json()["items"]), 2)
+        self.assertEqual(self.client.get("/api/jurnal/al-doilea/").status_code, 200)
+
+    def test_unknown_slug_is_not_cached(self):
+        self.assertEqual(self.client.get("/api/jurnal/nou/").status_code, 404)
+        self.index.add_child(instance=JurnalArticlePage(slug="nou", title="Nou", live=False))
+        # the draft doesn't bump the version, the earlier miss just wasn't stored
+        JurnalArticlePage.objects.filter(slug="nou").update(live=True)
+        self.assertEqual(self.client.get("/api/jurnal/nou/").status_code, 200)
+
+    def test_mainpage_cached_until_settings_save(self):
+        content = MainPageContent.for_site(self.site)
+        self.assertEqual(self.client.get("/api/mainpage/").json()["hero"]["title"], content.hero_title)
+
+        with mock.patch("core.views._build_mainpage_payload", side_effect=AssertionError):
+            self.client.get("/api/mainpage/")
+
+        content.hero_title = "Titlu nou"
+        content.save()
+        self.assertEqual(self.client.get("/api/mainpage/").json()["hero"]["title"], "Titlu nou")
+
+    def test_warm_cache_command(self):
+        out = io.StringIO()
+        call_command("warm_cache", stdout=out)
+        self.assertIn("Jurnal: list + 1 articles", out.getvalue())
+
+        with self.assertNumQueries(0):
+            self.client.get("/api/jurnal/")
+            self.client.get("/api/jurnal/primul/")
+
+    def test_version_never_goes_back_after_eviction(self):
+        version = api_cache.get_version(api_cache.JURNAL)
+        cache.delete(api_cache.VERSION_KEY.format(namespace=api_cache.JURNAL))
+        self.assertNotEqual(api_cache.get_version(api_cache.JURNAL), version)
+
+
+# the dev file cache's add() is not atomic across threads; the lock needs a backend where it is
+@override_settings(CACHES={"default": {"BACKEND": "django.core.cache.backends.locmem.LocMemCache"}})
+class SingleFlightTests(TestCase):
+    def setUp(self):
+        cache.clear()
+
+    def _lock(self, *parts):
+        cache.add(f"{api_cache.versioned_key(api_cache.JURNAL, *parts)}:lock", 1, 10)
+
+    def test_concurrent_misses_build_once(self):
+        calls = []
+
+        def builder():
+            calls.append(1)
+            time.sleep(0.2)
+            return {"items": []}
+
+        results = []
+        threads = [
+            threading.Thread(target=lambda: results.append(api_cache.get_or_build(api_cache.JURNAL, ("list",), builder)))
+            for _ in range(5)
+        ]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+        self.assertEqual(len(calls), 1)
+        self.assertEqual([value for value, _ in results], [{"items": []}] * 5)
+
+    def test_stale_value_while_another_worker_rebuilds(self):
+        api_cache.get_or_build(api_cache.JURNAL, ("list",), lambda: {"items": ["vechi"]})
+        api_cache.bump_version(api_cache.JURNAL)
+        self._lock("list")
+
+        value = api_cache.get_or_build(api_cache.JURNAL, ("list",), mock.Mock(side_effect=AssertionError))
+        self.assertEqual(value, ({"items": ["vechi"]}, True))
+
+    @override_settings(API_CACHE_LOCK_WAIT=0.1)
+    def test_builds_after_waiting_for_a_stuck_lock(self):
+        self._lock("detail", "nou")
+        value = api_cache.get_or_build(api_cache.JURNAL, ("detail", "nou"), lambda: {"detail": "nou"})
+        self.assertEqual(value, ({"detail": "nou"}, False))
+
+
+class ApiResponseCacheTests(JurnalTestMixin, TestCase):
+    def setUp(self):
+        super().setUp()
+        self._publish("primul", title="Primul")
+
+    def test_hit_after_miss_and_purged_on_publish(self):
+        self.assertEqual(self.client.get("/api/jurnal/")["X-Cache"], "MISS")
+        with self.assertNumQueries(0):
+            response = self.client.get("/api/jurnal/")
+        self.assertEqual(response["X-Cache"], "HIT")
+        self.assertEqual(response["Content-Type"], "application/json")
+
+        self._publish("al-doilea", title="Al doilea")
+        response = self.client.get("/api/jurnal/")
+        self.assertEqual(response["X-Cache"], "MISS")
+        self.assertEqual(len(response.json()["items"]), 2)
+
+    def test_varies_by_query_string_and_host(self):
+        self.client.get("/api/search/?q=primul&limit=5")
+        self.assertEqual(self.client.get("/api/search/?limit=5&q=primul")["X-Cache"], "HIT")
+        self.assertEqual(self.client.get("/api/search/?q=altul")["X-Cache"], "MISS")
+        self.assertEqual(self.client.get("/api/search/?q=primul&limit=5", HTTP_HOST="localhost")["X-Cache"], "MISS")
+
+    def test_errors_and_other_paths_are_not_cached(self):
+        self.client.get("/api/jurnal/nu-exista/")
+        self.assertNotIn("X-Cache", self.client.get("/api/newsletter/confirm/?token=x"))
+        self.assertEqual(self.client.get("/api/jurnal/nu-exista/")["X-Cache"], "MISS")
+
+    @override_settings(API_RESPONSE_CACHE_PATHS=("/api/v2/",))
+    def test_responses_varying_on_accept_are_not_cached(self):
+        # DRF renders JSON or the browsable HTML page from the same URL
+        html = self.client.get("/api/v2/pages/", HTTP_ACCEPT="text/html")
+        self.assertIn("Accept", html["Vary"])
+        self.assertEqual(html["X-Cache"], "MISS")
+
+        response = self.client.get("/api/v2/pages/", HTTP_ACCEPT="application/json")
+        self.assertEqual(response["X-Cache"], "MISS")
+        self.assertEqual(response["Content-Type"], "application/json")
+
+    def test_stale_payload_is_not_cached_as_current(self):
+        self.client.get("/api/jurnal/")
+        self._publish("al-doilea", title="Al doilea")
+        # another worker is rebuilding the post-publish list
+        lock = f"{api_cache.versioned_key(api_cache.JURNAL, 'list')}:lock"
+        cache.add(lock, 1, 10)
+
+        response = self.client.get("/api/jurnal/")
+        self.assertEqual(len(response.json()["items"]), 1)
+        self.assertNotIn("s-maxage", response["Cache-Control"])
+        self.assertEqual(response["X-Cache"], "MISS")
+
+        cache.delete(lock)
+        response = self.client.get("/api/jurnal/")
+        self.assertEqual((response["X-Cache"], len(response.json()["items"])), ("MISS", 2))
+
+    @override_settings(API_RESPONSE_FRESH_TTL=0)
+    def test_stale_served_while_refreshing_in_background(self):
+        self.client.get("/api/jurnal/")
+        executor = mock.Mock()
+        with mock.patch.object(api_middleware, "_refresh_executor", return_value=executor):
+            with self.assertNumQueries(0):
+                first = self.client.get("/api/jurnal/")
+                second = self.client.get("/api/jurnal/")
+
+        self.assertEqual((first["X-Cache"], second["X-Cache"]), ("STALE", "STALE"))
+        # one refresh per key at a time
+        self.assertEqual(executor.submit.call_count, 1)
+
+        refresh, key, request = executor.submit.call_args.args
+        before = cache.get(key)["stored_at"]
+        with mock.patch.object(api_middleware, "connection"):
+            refresh(key, request)
+        self.assertGreater(cache.get(key)["stored_at"], before)
+        self.assertTrue(cache.add(f"{key}:refresh", 1))
+
+
+class CdnTaggingTests(JurnalTestMixin, TestCase):
+    def setUp(self):
+        super().setUp()
+        self.article = self._publish("primul", title="Primul")
+
+        tmp = tempfile.TemporaryDirectory()
+        self.addCleanup(tmp.cleanup)
+        self.purge_file = os.path.join(tmp.name, "purges.log")
+        purger = override_settings(CDN_PURGER="core.cdn.FilePurger", CDN_PURGE_FILE=self.purge_file)
+        purger.enable()
+        self.addCleanup(purger.disable)
+
+    def _purged(self):
+        if not os.path.exists(self.purge_file):
+            return []
+        with open(self.purge_file, encoding="utf-8") as f:
+            return [json.loads(line)["keys"] for line in f]
+
+    def test_responses_carry_surrogate_keys(self):
+        detail = self.client.get("/api/jurnal/primul/")
+        self.assertEqual(detail["Surrogate-Key"], f"page-{self.article.pk}")
+        self.assertIn("s-maxage=", detail["Cache-Control"])
+        self.assertEqual(self.client.get("/api/jurnal/")["Cache-Tag"], "jurnal")
+        self.assertEqual(self.client.get("/api/mainpage/")["Surrogate-Key"], "mainpage")
+        self.assertEqual(self.client.get("/api/membrii/questions/")["Surrogate-Key"], "membrie-form")
+
+        # replayed from the response cache with the same keys
+        cached = self.client.get("/api/jurnal/primul/")
+        self.assertEqual((cached["X-Cache"], cached["Surrogate-Key"]), ("HIT", f"page-{self.article.pk}"))
+
+    def test_publish_and_settings_save_purge_after_commit(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            self.article.save_revision().publish()
+        with self.captureOnCommitCallbacks(execute=True):
+            MainPageContent.for_site(self.site).save()
+        with self.captureOnCommitCallbacks(execute=True):
+            MembrieFormContent.for_site(self.site).save()
+
+        self.assertEqual(
+            self._purged(),
+            [
+                ["jurnal", f"page-{self.article.pk}", "snap-manifest"],
+                ["mainpage", "snap-manifest"],
+                ["membrie-form", "snap-manifest"],
+            ],
+        )
+
+    def test_failing_purger_does_not_break_publish(self):
+        with mock.patch.object(cdn.FilePurger, "purge", side_effect=OSError("CDN down")):
+            with self.assertLogs("core.cdn", "ERROR"), self.captureOnCommitCallbacks(execute=True):
+                self.article.save_revision().publish()
+
+
+class PrecompressedApiResponseTests(JurnalTestMixin, TestCase):
+    def setUp(self):
+        super().setUp()
+        for i in range(5):
+            self._publish(f"articol-{i}", title=f"Articol {i}", excerpt="Despre atelier " * 10)
+        self.identity = self.client.get("/api/jurnal/").content
+
+    def test_gzip_variant_compressed_once(self):
+        with mock.patch("core.middleware.gzip.compress", side_effect=AssertionError):
+            response = self.client.get("/api/jurnal/", HTTP_ACCEPT_ENCODING="gzip, deflate")
+
+        self.assertEqual(response["Content-Encoding"], "gzip")
+        self.assertIn("Accept-Encoding", response["Vary"])
+        self.assertEqual(int(response["Content-Length"]), len(response.content))
+        self.assertEqual(gzip.decompress(response.content), self.identity)
+        self.assertLess(len(response.content), len(self.identity))
+
+    @skipUnless(api_middleware.brotli, "brotli is not installed")
+    def test_brotli_preferred(self):
+        response = self.client.get("/api/jurnal/", HTTP_ACCEPT_ENCODING="gzip, br")
+        self.assertEqual(response["Content-Encoding"], "br")
+        self.assertEqual(api_middleware.brotli.decompress(response.content), self.identity)
+
+    def test_identity_when_not_accepted(self):
+        for header in ("", "identity", "gzip;q=0, br;q=0", "*;q=0"):
+            response = self.client.get("/api/jurnal/", HTTP_ACCEPT_ENCODING=header)
+            self.assertFalse(response.has_header("Content-Encoding"), header)
+            self.assertEqual(response.content, self.identity)
+
+    def test_accepted_encodings(self):
+        self.assertEqual(
+            api_middleware.accepted_encodings("gzip;q=0.5, BR, *;q=0, deflate;q=x"),
+            {"gzip": 0.5, "br": 1.0, "*": 0.0, "deflate": 0.0},
+        )
+
+
+class SnapshotTests(JurnalTestMixin, TestCase):
+    def setUp(self):
+        super().setUp()
+        self._publish("primul", title="Primul")
+
+    def _manifest(self):
+        return self.client.get("/api/snap/manifest.json").json()["resources"]
+
+    def test_snapshots_match_live_endpoints(self):
+        response = self.client.get("/api/snap/manifest.json")
+        self.assertIn("max-age=30", response["Cache-Control"])
+        self.assertEqual(response["Surrogate-Key"], "snap-manifest")
+
+        resources = response.json()["resources"]
+        self.assertEqual(set(resources), {"mainpage", "jurnal", "membrii/questions", "jurnal/primul"})
+        live = {
+            "mainpage": "/api/mainpage/",
+            "jurnal": "/api/jurnal/",
+            "membrii/questions": "/api/membrii/questions/",
+            "jurnal/primul": "/api/jurnal/primul/",
+        }
+        for name, url in resources.items():
+            snap = self.client.get(url)
+            self.assertEqual(snap["Cache-Control"], "public, max-age=31536000, immutable")
+            self.assertEqual(snap.json(), self.client.get(live[name]).json(), name)
+
+    def test_publish_moves_manifest_old_digest_still_served(self):
+        before = self._manifest()
+        self._publish("al-doilea", title="Al doilea")
+        after = self._manifest()
+
+        self.assertNotEqual(before["jurnal"], after["jurnal"])
+        self.assertEqual(before["mainpage"], after["mainpage"])
+        self.assertIn("jurnal/al-doilea", after)
+        self.assertEqual(len(self.client.get(before["jurnal"]).json()["items"]), 1)
+
+    def test_evicted_snapshot_is_restored_unknown_is_404(self):
+        url = self._manifest()["jurnal"]
+        digest = url.rsplit("/", 1)[1][: snapshots.DIGEST_LENGTH]
+        cache.delete(snapshots.SNAPSHOT_KEY.format(digest=digest))
+
+        self.assertEqual(self.client.get(url).status_code, 200)
+        self.assertEqual(self.client.get("/api/snap/" + "0" * snapshots.DIGEST_LENGTH + ".json").status_code, 404)
+
+    def test_unknown_digest_writes_nothing(self):
+        self._manifest()
+        with mock.patch.object(snapshots, "store") as store, mock.patch.object(snapshots, "restore") as restore:
+            response = self.client.get("/api/snap/" + "1" * snapshots.DIGEST_LENGTH + ".json")
+        self.assertEqual(response.status_code, 404)
+        store.assert_not_called()
+        restore.assert_not_called()
+
+    def test_manifest_from_stale_payloads_is_not_cached(self):
+        self._manifest()
+        self._publish("al-doilea", title="Al doilea")
+        lock = f"{api_cache.versioned_key(api_cache.JURNAL, 'list')}:lock"
+        cache.add(lock, 1, 10)
+
+        response = self.client.get("/api/snap/manifest.json")
+        self.assertNotIn("jurnal/al-doilea", response.json()["resources"])
+        self.assertNotIn("s-maxage", response["Cache-Control"])
+
+        cache.delete(lock)
+        self.assertIn("jurnal/al-doilea", self._manifest())
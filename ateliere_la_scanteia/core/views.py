@@ -1,7 +1,8 @@
 # core/views.py
+import hashlib
 import json
 import re
-import secrets
+from datetime import datetime, timedelta, timezone as dt_timezone
 
 from django.conf import settings
 from django.core.mail import send_mail
@@ -11,7 +12,10 @@ from django.utils import timezone
 from django.views.decorators.csrf import csrf_exempt
 from django.template.loader import render_to_string
 from django.urls import reverse
-from django.core.signing import TimestampSigner, BadSignature, SignatureExpired
+from django.core.signing import Signer, TimestampSigner, BadSignature, SignatureExpired
+from django.contrib.sitemaps import views as sitemap_views
+from wagtail.models import Site
+
 from .models import (
     MainPageContent,
     MembrieFormContent,
@@ -21,6 +25,12 @@ from .models import (
     MembershipQAItem,
     NewsletterSubscriber,  # ✅ NEW
 )
+from . import cache as api_cache
+from . import cdn, snapshots
+from .sitemaps import SITEMAP_TEMPLATE, SITEMAPS, sitemap_page_size
+from search import autocomplete, fulltext
+from .newsletter import NEWSLETTER_UNSUBSCRIBE_SALT
+from .tasks import send_newsletter_confirmation
 
 
 def robots_txt(request):
@@ -28,6 +38,60 @@ def robots_txt(request):
     return HttpResponse(content, content_type="text/plain")
 
 
+# ------------------------------------------------------------
+# ✅ Sitemaps: rendered XML cached per host/section/page until the next publish
+# ------------------------------------------------------------
+def _cached_sitemap(request, render):
+    page = request.GET.get("p", "1")
+    errors = []
+
+    def build():
+        response = render()
+        response.render()
+        if response.status_code != 200:
+            errors.append(response)
+            return None
+        return (response.content, response.get("Last-Modified"))
+
+    # a stale sitemap is fine for the moment: it isn't cached anywhere else
+    cached, _stale = api_cache.get_or_build(
+        api_cache.SITEMAP,
+        (f"{request.scheme}://{request.get_host()}{request.path}", page if page.isdigit() else "invalid"),
+        build,
+        timeout=int(getattr(settings, "SITEMAP_CACHE_TTL", 60 * 60 * 6)),
+    )
+    if cached is None:
+        return errors[0]
+
+    content, last_modified = cached
+    response = HttpResponse(content, content_type="application/xml")
+    response["X-Robots-Tag"] = "noindex, noodp, noarchive"
+    if last_modified:
+        response["Last-Modified"] = last_modified
+    return response
+
+
+def sitemap_xml(request):
+    """
+    /sitemap.xml: a single sitemap while all sections fit in SITEMAP_PAGE_SIZE,
+    otherwise a sitemap index pointing at /sitemap-<section>.xml?p=N.
+    """
+
+    def render():
+        sections = {name: sitemap_class() for name, sitemap_class in SITEMAPS.items()}
+        if sum(section.paginator.count for section in sections.values()) > sitemap_page_size():
+            return sitemap_views.index(request, sections, sitemap_url_name="sitemap-section")
+        return sitemap_views.sitemap(request, sections, template_name=SITEMAP_TEMPLATE)
+
+    return _cached_sitemap(request, render)
+
+
+def sitemap_section_xml(request, section):
+    return _cached_sitemap(
+        request, lambda: sitemap_views.sitemap(request, SITEMAPS, section=section, template_name=SITEMAP_TEMPLATE)
+    )
+
+
 def _img_url(img):
     try:
         return img.file.url if img else None
@@ -39,9 +103,32 @@ def _get_jurnal_index():
     return JurnalIndexPage.objects.live().public().first()
 
 
+# ------------------------------------------------------------
+# ✅ Headless payloads: built once, then served from core.cache until the
+# next publish / settings save (see the receivers in core.models).
+# Each helper returns (payload, stale), as core.cache.get_or_build does.
+# ------------------------------------------------------------
+def mainpage_payload(site):
+    return api_cache.get_or_build(
+        api_cache.MAINPAGE, (site.pk,), lambda: _build_mainpage_payload(MainPageContent.for_site(site))
+    )
+
+
+def jurnal_list_payload():
+    return api_cache.get_or_build(api_cache.JURNAL, ("list",), _build_jurnal_list_payload)
+
+
+def jurnal_detail_payload(slug):
+    """None for an unknown slug (not cached)."""
+    return api_cache.get_or_build(api_cache.JURNAL, ("detail", slug), lambda: _build_jurnal_detail_payload(slug))
+
+
 def mainpage_content(request):
-    content = MainPageContent.for_request(request)
+    payload, stale = mainpage_payload(Site.find_for_request(request))
+    return cdn.tag_response(JsonResponse(payload), cdn.MAINPAGE, stale=stale)
+
 
+def _build_mainpage_payload(content):
     s1_sub = getattr(content, "spatiul_stat_1_sublabel", "") or ""
     s2_sub = getattr(content, "spatiul_stat_2_sublabel", "") or ""
     s3_sub = getattr(content, "spatiul_stat_3_sublabel", "") or ""
@@ -61,61 +148,59 @@ def mainpage_content(request):
     fi_p1 = parts[1] if len(parts) > 1 else ""
     fi_p2 = "\n\n".join(parts[2:]).strip() if len(parts) > 2 else ""
 
-    return JsonResponse(
-        {
-            "hero": {
-                "kicker": content.hero_kicker,
-                "title": content.hero_title,
-                "subtitle": content.hero_subtitle,
-                "bg_image": _img_url(content.hero_bg_image),
-            },
-            "spatiul": {
-                "label": content.spatiul_label,
-                "title": content.spatiul_title,
-                "paragraph": content.spatiul_paragraph,
-                "seo_blurb": content.spatiul_seo_blurb,
-                "hidden_keywords": content.spatiul_hidden_keywords,
-                "image_1": _img_url(content.spatiul_image_1),
-                "quote": content.spatiul_quote,
-                "stats": [
-                    {"value": content.spatiul_stat_1_value, "label": content.spatiul_stat_1_label, "sublabel": s1_sub},
-                    {"value": content.spatiul_stat_2_value, "label": content.spatiul_stat_2_label, "sublabel": s2_sub},
-                    {"value": content.spatiul_stat_3_value, "label": content.spatiul_stat_3_label, "sublabel": s3_sub},
-                ],
-            },
-            "filosofie": {
-                "label": content.filosofie_label,
-                "title_line_1": content.filosofie_title_line_1,
-                "title_line_2": content.filosofie_title_line_2,
-                "intro": fi_intro,
-                "paragraph_1": fi_p1,
-                "paragraph_2": fi_p2,
-                "cta_text": content.filosofie_cta_text,
-                "image_2": _img_url(content.filosofie_image_2),
-                "quote": content.filosofie_quote,
-            },
-            "testimoniale": {
-                "title": content.testimoniale_title,
-                "items": [
-                    {"quote": content.testimonial_1_quote, "name": content.testimonial_1_name, "role": content.testimonial_1_role},
-                    {"quote": content.testimonial_2_quote, "name": content.testimonial_2_name, "role": content.testimonial_2_role},
-                    {"quote": content.testimonial_3_quote, "name": content.testimonial_3_name, "role": content.testimonial_3_role},
-                    {"quote": content.testimonial_4_quote, "name": content.testimonial_4_name, "role": content.testimonial_4_role},
-                    {"quote": content.testimonial_5_quote, "name": content.testimonial_5_name, "role": content.testimonial_5_role},
-                ],
-            },
-            "manifest": {
-                "label": content.manifest_label,
-                "title": content.manifest_title,
-                "text": content.manifest_text,
-                "cards": [
-                    {"title": content.manifest_card_1_title, "text": content.manifest_card_1_text},
-                    {"title": content.manifest_card_2_title, "text": content.manifest_card_2_text},
-                    {"title": content.manifest_card_3_title, "text": content.manifest_card_3_text},
-                ],
-            },
-        }
-    )
+    return {
+        "hero": {
+            "kicker": content.hero_kicker,
+            "title": content.hero_title,
+            "subtitle": content.hero_subtitle,
+            "bg_image": _img_url(content.hero_bg_image),
+        },
+        "spatiul": {
+            "label": content.spatiul_label,
+            "title": content.spatiul_title,
+            "paragraph": content.spatiul_paragraph,
+            "seo_blurb": content.spatiul_seo_blurb,
+            "hidden_keywords": content.spatiul_hidden_keywords,
+            "image_1": _img_url(content.spatiul_image_1),
+            "quote": content.spatiul_quote,
+            "stats": [
+                {"value": content.spatiul_stat_1_value, "label": content.spatiul_stat_1_label, "sublabel": s1_sub},
+                {"value": content.spatiul_stat_2_value, "label": content.spatiul_stat_2_label, "sublabel": s2_sub},
+                {"value": content.spatiul_stat_3_value, "label": content.spatiul_stat_3_label, "sublabel": s3_sub},
+            ],
+        },
+        "filosofie": {
+            "label": content.filosofie_label,
+            "title_line_1": content.filosofie_title_line_1,
+            "title_line_2": content.filosofie_title_line_2,
+            "intro": fi_intro,
+            "paragraph_1": fi_p1,
+            "paragraph_2": fi_p2,
+            "cta_text": content.filosofie_cta_text,
+            "image_2": _img_url(content.filosofie_image_2),
+            "quote": content.filosofie_quote,
+        },
+        "testimoniale": {
+            "title": content.testimoniale_title,
+            "items": [
+                {"quote": content.testimonial_1_quote, "name": content.testimonial_1_name, "role": content.testimonial_1_role},
+                {"quote": content.testimonial_2_quote, "name": content.testimonial_2_name, "role": content.testimonial_2_role},
+                {"quote": content.testimonial_3_quote, "name": content.testimonial_3_name, "role": content.testimonial_3_role},
+                {"quote": content.testimonial_4_quote, "name": content.testimonial_4_name, "role": content.testimonial_4_role},
+                {"quote": content.testimonial_5_quote, "name": content.testimonial_5_name, "role": content.testimonial_5_role},
+            ],
+        },
+        "manifest": {
+            "label": content.manifest_label,
+            "title": content.manifest_title,
+            "text": content.manifest_text,
+            "cards": [
+                {"title": content.manifest_card_1_title, "text": content.manifest_card_1_text},
+                {"title": content.manifest_card_2_title, "text": content.manifest_card_2_text},
+                {"title": content.manifest_card_3_title, "text": content.manifest_card_3_text},
+            ],
+        },
+    }
 
 
 def _article_images(page: JurnalArticlePage):
@@ -149,106 +234,315 @@ def _article_videos(page: JurnalArticlePage):
     return urls
 
 
+def _serialize_jurnal_card(p: JurnalArticlePage):
+    return {
+        "slug": p.slug,
+        "category": p.category,
+        "title": p.title,
+        "image": _img_url(p.hero_image),
+        "images": _article_images(p),
+        "videos": _article_videos(p),
+        "excerpt": p.excerpt,
+        "meta": p.meta,
+    }
+
+
 def jurnal_list(request):
+    payload, stale = jurnal_list_payload()
+    return cdn.tag_response(JsonResponse(payload), cdn.JURNAL, stale=stale)
+
+
+def _build_jurnal_list_payload():
     index = _get_jurnal_index()
     if not index:
-        return JsonResponse({"index": None, "items": []})
+        return {"index": None, "items": []}
 
     items_qs = (
         JurnalArticlePage.objects.child_of(index)
         .live()
         .public()
+        .defer("search_document")
         .order_by("-first_published_at")
     )
 
-    items = []
-    for p in items_qs:
-        images = _article_images(p)
-        videos = _article_videos(p)
+    items = [_serialize_jurnal_card(p) for p in items_qs]
 
-        items.append(
-            {
-                "slug": p.slug,
-                "category": p.category,
-                "title": p.title,
-                "image": _img_url(p.hero_image),
-                "images": images,
-                "videos": videos,
-                "excerpt": p.excerpt,
-                "meta": p.meta,
-            }
+    return {"index": {"label": index.label, "title": index.title, "subtitle": index.subtitle, "intro": index.intro}, "items": items}
+
+
+# ------------------------------------------------------------
+# ✅ Search API for the SPA: /api/search/?q=...&limit=10&cursor=...
+# ------------------------------------------------------------
+SEARCH_MAX_QUERY_LENGTH = 200
+SEARCH_MAX_LIMIT = 50
+
+
+def jurnal_search(request):
+    """
+    Ranked jurnal cards (same shape as jurnal_list items), keyset-paged:
+    "next" is the cursor for the following page (null on the last one).
+    Responses are cached per normalized query until TTL or the next publish.
+    """
+    query = (request.GET.get("q") or "").strip()[:SEARCH_MAX_QUERY_LENGTH]
+    normalized = fulltext.normalize_query(query)
+    try:
+        limit = min(max(int(request.GET.get("limit", 10)), 1), SEARCH_MAX_LIMIT)
+    except ValueError:
+        return JsonResponse({"error": "Invalid limit."}, status=400)
+
+    raw_cursor = request.GET.get("cursor") or ""
+    cursor = None
+    if raw_cursor:
+        try:
+            cursor = fulltext.decode_cursor(raw_cursor)
+        except ValueError:
+            return JsonResponse({"error": "Invalid cursor."}, status=400)
+
+    if not normalized:
+        return JsonResponse({"query": query, "items": [], "next": None})
+
+    def build():
+        results = fulltext.search_jurnal(query).select_related("hero_image").prefetch_related(
+            "gallery_images__image"
         )
+        if cursor:
+            results = fulltext.after_cursor(results, cursor)
+        pages = list(results[: limit + 1])
+        has_next = len(pages) > limit
+        pages = pages[:limit]
+        return {
+            "items": [_serialize_jurnal_card(p) for p in pages],
+            "next": fulltext.encode_cursor(pages[-1]) if has_next else None,
+        }
 
-    return JsonResponse(
-        {"index": {"label": index.label, "title": index.title, "subtitle": index.subtitle, "intro": index.intro}, "items": items}
+    payload, stale = api_cache.get_or_build(
+        fulltext.SEARCH_CACHE_NAMESPACE,
+        (hashlib.sha1(normalized.encode()).hexdigest(), limit, raw_cursor),
+        build,
+        timeout=int(getattr(settings, "SEARCH_CACHE_TTL", 300)),
     )
+    return cdn.tag_response(JsonResponse({"query": query, **payload}), cdn.JURNAL, stale=stale)
+
+
+AUTOCOMPLETE_MAX_LIMIT = 20
+
+
+def jurnal_autocomplete(request):
+    """
+    /api/search/autocomplete/?q=acu -> [{"slug", "title", "category"}], prefix-matched
+    on folded title words and categories from the in-process index (no DB query).
+    """
+    try:
+        limit = min(max(int(request.GET.get("limit", 8)), 1), AUTOCOMPLETE_MAX_LIMIT)
+    except ValueError:
+        return JsonResponse({"error": "Invalid limit."}, status=400)
+    query = (request.GET.get("q") or "")[:SEARCH_MAX_QUERY_LENGTH]
+    return JsonResponse({"query": query, "items": autocomplete.autocomplete(query, limit)})
 
 
 def jurnal_detail(request, slug):
+    payload, stale = jurnal_detail_payload(slug)
+    if payload is None:
+        # a later publish of this slug purges "jurnal"
+        return cdn.tag_response(JsonResponse({"detail": None}, status=404), cdn.JURNAL)
+    return cdn.tag_response(JsonResponse(payload), cdn.page_key(payload["detail"]["id"]), stale=stale)
+
+
+def _build_jurnal_detail_payload(slug):
     index = _get_jurnal_index()
     if not index:
-        return JsonResponse({"detail": None}, status=404)
+        return None
 
     page = (
         JurnalArticlePage.objects.child_of(index)
         .live()
         .public()
+        .defer("search_document")
         .filter(slug=slug)
         .first()
     )
     if not page:
-        return JsonResponse({"detail": None}, status=404)
-
-    images = _article_images(page)
-    videos = _article_videos(page)
+        return None
 
-    return JsonResponse(
-        {
-            "detail": {
-                "slug": page.slug,
-                "category": page.category,
-                "title": page.title,
-                "image": _img_url(page.hero_image),
-                "images": images,
-                "videos": videos,
-                "excerpt": page.excerpt,
-                "meta": page.meta,
-                "body_html": str(page.body) if page.body else "",
-            }
+    return {
+        "detail": {
+            "id": page.id,
+            "slug": page.slug,
+            "category": page.category,
+            "title": page.title,
+            "image": _img_url(page.hero_image),
+            "images": _article_images(page),
+            "videos": _article_videos(page),
+            "excerpt": page.excerpt,
+            "meta": page.meta,
+            "body_html": str(page.body) if page.body else "",
         }
-    )
+    }
 
 
-def _get_active_membrie_questions(request):
-    settings_obj = MembrieFormContent.for_request(request)
+class MembrieQuestionSchema:
+    """
+    Întrebările active (deja filtrate + sortate) și validatorul pentru dynamic_answers.
+    Se ține în cache per Site, deci trebuie să rămână picklable (doar date simple).
+    """
+
+    def __init__(self, items):
+        self.items = items
+        self.fields = tuple((q["key"], q["question_text"], q["required"]) for q in items)
+
+    def validate(self, dynamic_answers):
+        """
+        Returns (error, qa_items):
+        - error: mesaj pentru prima întrebare obligatorie fără răspuns (sau None)
+        - qa_items: [{question, answer}, ...] în ordinea din CMS
+        """
+        qa_items = []
+        for key, question_text, required in self.fields:
+            ans = str(dynamic_answers.get(key, "")).strip()
+            if required and not ans:
+                return f"Lipsește răspunsul pentru: {question_text}", []
+            if ans:
+                qa_items.append({"question": question_text, "answer": ans})
+        return None, qa_items
+
+
+def _build_membrie_question_schema(site):
+    settings_obj = MembrieFormContent.for_site(site)
 
     out = []
+    if settings_obj and settings_obj.questions:
+        for blk in settings_obj.questions:
+            if blk.block_type != "question":
+                continue
+            v = blk.value or {}
+            item = {
+                "key": str(v.get("key") or "").strip(),
+                "question_text": str(v.get("question_text") or "").strip(),
+                "suggested_answer": str(v.get("suggested_answer") or "").strip(),
+                "required": bool(v.get("required", True)),
+                "is_active": bool(v.get("is_active", True)),
+                "order": int(v.get("order") or 0),
+            }
+            if item["key"] and item["question_text"] and item["is_active"]:
+                out.append(item)
+
+    out.sort(key=lambda x: (x["order"], x["key"]))
+    return MembrieQuestionSchema(out)
+
+
+def _get_membrie_question_schema(request):
+    """
+    StreamField-ul `questions` se deserializează doar la cache miss;
+    cache-ul e invalidat din models.invalidate_membrie_questions_cache.
+    Returns (schema, stale).
+    """
+    site = Site.find_for_request(request)
+    if site is None:
+        return MembrieQuestionSchema([]), False
+
     try:
-        if settings_obj and settings_obj.questions:
-            for blk in settings_obj.questions:
-                if blk.block_type != "question":
-                    continue
-                v = blk.value or {}
-                item = {
-                    "key": str(v.get("key") or "").strip(),
-                    "question_text": str(v.get("question_text") or "").strip(),
-                    "suggested_answer": str(v.get("suggested_answer") or "").strip(),
-                    "required": bool(v.get("required", True)),
-                    "is_active": bool(v.get("is_active", True)),
-                    "order": int(v.get("order") or 0),
-                }
-                if item["key"] and item["question_text"] and item["is_active"]:
-                    out.append(item)
+        return membrie_question_schema(site)
     except Exception:
-        return []
+        return MembrieQuestionSchema([]), False
 
-    out.sort(key=lambda x: (x["order"], x["key"]))
-    return out
+
+def membrie_question_schema(site):
+    return api_cache.get_or_build(
+        api_cache.MEMBRIE_QUESTIONS,
+        (site.pk,),
+        lambda: _build_membrie_question_schema(site),
+        timeout=int(getattr(settings, "MEMBRIE_QUESTIONS_CACHE_TTL", 60 * 60 * 24)),
+    )
 
 
 def membership_questions(request):
-    items = _get_active_membrie_questions(request)
-    return JsonResponse({"items": items})
+    schema, stale = _get_membrie_question_schema(request)
+    return cdn.tag_response(JsonResponse({"items": schema.items}), cdn.MEMBRIE_FORM, stale=stale)
+
+
+# ------------------------------------------------------------
+# ✅ Immutable snapshots: /api/snap/<digest>.json + /api/snap/manifest.json
+# ------------------------------------------------------------
+def _snapshot_resource(site, name):
+    """One manifest name -> (payload, stale): the same payload its live endpoint returns."""
+    if name == "mainpage":
+        return mainpage_payload(site)
+    if name == "jurnal":
+        return jurnal_list_payload()
+    if name == "membrii/questions":
+        try:
+            schema, stale = membrie_question_schema(site)
+        except Exception:
+            return None, False
+        return {"items": schema.items}, stale
+    if name.startswith("jurnal/"):
+        return jurnal_detail_payload(name[len("jurnal/"):])
+    return None, False
+
+
+def _snapshot_resources(site):
+    """All manifest names -> payloads, plus whether any of them was stale."""
+    jurnal, stale = jurnal_list_payload()
+    names = ["mainpage", "jurnal", "membrii/questions"] + [f"jurnal/{item['slug']}" for item in jurnal["items"]]
+    resources = {}
+    for name in names:
+        payload, payload_stale = _snapshot_resource(site, name)
+        if payload is not None:
+            resources[name] = payload
+            stale = stale or payload_stale
+    return resources, stale
+
+
+def snapshot_manifest_payload(site):
+    """(manifest, stale); a manifest built from stale payloads is served once, never cached."""
+
+    def build():
+        resources, stale = _snapshot_resources(site)
+        manifest = {
+            "resources": {
+                name: reverse("api-snapshot", kwargs={"digest": snapshots.store(payload)})
+                for name, payload in resources.items()
+            }
+        }
+        return api_cache.Uncached(manifest) if stale else manifest
+
+    return api_cache.get_or_build(api_cache.API_RESPONSES, ("snap-manifest", site.pk), build)
+
+
+def snapshot_manifest(request):
+    site = Site.find_for_request(request)
+    if site is None:
+        return JsonResponse({"resources": None}, status=404)
+    manifest, stale = snapshot_manifest_payload(site)
+    response = JsonResponse(manifest)
+    # browsers revalidate often; the CDN keeps it until the next purge
+    response["Cache-Control"] = "public, max-age={}, s-maxage={}".format(
+        int(getattr(settings, "SNAPSHOT_MANIFEST_MAX_AGE", 30)),
+        int(getattr(settings, "CDN_S_MAXAGE", 60 * 60 * 24)),
+    )
+    return cdn.tag_response(response, cdn.SNAPSHOT_MANIFEST, stale=stale)
+
+
+def snapshot_detail(request, digest):
+    content = snapshots.load(digest)
+    if content is None:
+        # evicted before its manifest: rebuild only the resource the current manifest
+        # points at with this digest; any other digest is a 404 without cache writes
+        site = Site.find_for_request(request)
+        if site is not None:
+            url = reverse("api-snapshot", kwargs={"digest": digest})
+            manifest, _ = snapshot_manifest_payload(site)
+            name = next((name for name, current in manifest["resources"].items() if current == url), None)
+            if name is not None:
+                payload, _ = _snapshot_resource(site, name)
+                if payload is not None:
+                    content = snapshots.restore(payload, digest)
+    if content is None:
+        return JsonResponse({"detail": None}, status=404)
+
+    response = HttpResponse(content, content_type="application/json")
+    response["Cache-Control"] = "public, max-age=31536000, immutable"
+    return response
 
 
 def _parse_age_number(child_age: str):
@@ -331,13 +625,10 @@ def membrie_application(request):
             {"question": "Vârsta copilului", "answer": child_age},
         ]
 
-        cms_questions = _get_active_membrie_questions(request)
-        for q in cms_questions:
-            ans = str(dynamic_answers.get(q["key"], "")).strip()
-            if q["required"] and not ans:
-                return JsonResponse({"error": f"Lipsește răspunsul pentru: {q['question_text']}"}, status=400)
-            if ans:
-                qa_items.append({"question": q["question_text"], "answer": ans})
+        error, cms_qa_items = _get_membrie_question_schema(request)[0].validate(dynamic_answers)
+        if error:
+            return JsonResponse({"error": error}, status=400)
+        qa_items.extend(cms_qa_items)
 
         if art_relationship:
             qa_items.append({"question": "Relația cu arta", "answer": art_relationship})
@@ -443,6 +734,33 @@ def _build_absolute_url(request, path: str) -> str:
     return request.build_absolute_uri(path)
 
 
+NEWSLETTER_CONFIRM_SALT = "core.newsletter.confirm"
+
+
+def _newsletter_confirm_max_age() -> int:
+    return int(getattr(settings, "NEWSLETTER_CONFIRM_TTL_HOURS", 72)) * 3600
+
+
+_EPOCH = datetime(1970, 1, 1, tzinfo=dt_timezone.utc)
+
+
+def _make_newsletter_confirm_token(subscriber_id, sent_at) -> str:
+    """
+    Token semnat + timestamp: "<id>.<confirm_sent_at în µs>:<ts>:<sig>".
+    Nu se mai salvează nimic în DB; expirarea se verifică din timestamp-ul semnat.
+    Linkul e legat de confirm_sent_at: o cerere nouă sau o dezabonare îl invalidează.
+    """
+    sent_us = (sent_at - _EPOCH) // timedelta(microseconds=1)
+    return TimestampSigner(salt=NEWSLETTER_CONFIRM_SALT).sign(f"{subscriber_id}.{sent_us}")
+
+
+def _read_newsletter_confirm_token(token):
+    """-> (subscriber_id, confirm_sent_at); SignatureExpired / BadSignature / ValueError."""
+    value = TimestampSigner(salt=NEWSLETTER_CONFIRM_SALT).unsign(token, max_age=_newsletter_confirm_max_age())
+    subscriber_id, sent_us = value.split(".")
+    return int(subscriber_id), _EPOCH + timedelta(microseconds=int(sent_us))
+
+
 @csrf_exempt
 def newsletter_subscribe(request):
     """
@@ -450,8 +768,9 @@ def newsletter_subscribe(request):
     Body: { "email": "test@example.com" }
 
     Behavior:
-    - Create/refresh subscriber (inactive until confirmed)
-    - Send confirmation email (with link)
+    - Create/refresh subscriber (inactive until confirmed) with a single upsert
+    - Queue the confirmation email (with link) as a background task
+    - Repeated submits inside NEWSLETTER_RESEND_WINDOW_SECONDS don't resend
     """
     if request.method != "POST":
         return JsonResponse({"detail": "Method not allowed"}, status=405)
@@ -470,148 +789,209 @@ def newsletter_subscribe(request):
     except Exception:
         return JsonResponse({"detail": "Email invalid."}, status=400)
 
-    ip = _get_client_ip(request)
-    ua = (request.META.get("HTTP_USER_AGENT") or "").strip()[:255]
+    pending_response = {
+        "ok": True,
+        "created": False,
+        "status": "pending_confirm",
+        "message": "Verifică emailul și confirmă abonarea.",
+    }
 
-    obj, created = NewsletterSubscriber.objects.get_or_create(
-        email=email,
-        defaults={
-            "ip_address": ip,
-            "user_agent": ua,
-            "source": "website",
-            "is_active": False,
-        },
+    # lookup ieftin pe indexul unic (email), fără să încărcăm tot rândul
+    existing = (
+        NewsletterSubscriber.objects.filter(email=email)
+        .values("is_active", "confirmed_at", "confirm_sent_at")
+        .first()
     )
+    now = timezone.now()
 
     # dacă e deja confirmat -> ok (nu mai trimitem email la fiecare submit)
-    if obj.is_active and obj.confirmed_at:
+    if existing and existing["is_active"] and existing["confirmed_at"]:
         return JsonResponse(
             {"ok": True, "created": False, "status": "already_confirmed", "message": "Ești deja abonat."},
             status=200,
         )
 
-    # generează token nou (trimitem confirmarea)
-    token = secrets.token_urlsafe(32)
-    obj.confirm_token = token
-    obj.confirm_sent_at = timezone.now()
-    # update meta
-    if ip:
-        obj.ip_address = ip
-    if ua:
-        obj.user_agent = ua
-    obj.save()
+    # confirmarea a plecat de curând -> același status, fără email nou
+    resend_window = int(getattr(settings, "NEWSLETTER_RESEND_WINDOW_SECONDS", 600))
+    if existing and existing["confirm_sent_at"]:
+        if (now - existing["confirm_sent_at"]).total_seconds() < resend_window:
+            return JsonResponse(pending_response, status=200)
+
+    ip = _get_client_ip(request)
+    ua = (request.META.get("HTTP_USER_AGENT") or "").strip()[:255]
+
+    # get_or_create + update meta într-un singur INSERT ... ON CONFLICT (email) DO UPDATE
+    obj = NewsletterSubscriber(
+        email=email,
+        ip_address=ip,
+        user_agent=ua,
+        source="website",
+        is_active=False,
+        confirm_sent_at=now,
+    )
+    # un IP / User-Agent lipsă nu îl suprascrie pe cel salvat deja
+    meta_fields = [name for name, value in (("ip_address", ip), ("user_agent", ua)) if value]
+    NewsletterSubscriber.objects.bulk_create(
+        [obj],
+        update_conflicts=True,
+        unique_fields=["email"],
+        update_fields=meta_fields + ["confirm_sent_at"],
+    )
+    if obj.pk is None:
+        obj.pk = NewsletterSubscriber.objects.values_list("pk", flat=True).get(email=email)
 
+    # token semnat (stateless) pentru linkul de confirmare
+    token = _make_newsletter_confirm_token(obj.pk, now)
     confirm_path = reverse("newsletter-confirm") + f"?token={token}"
     confirm_url = _build_absolute_url(request, confirm_path)
 
-    subject = "Confirmă abonarea la Newsletter — Ateliere la Scânteia"
+    send_newsletter_confirmation.enqueue(email, confirm_url)
+
+    created = existing is None
+    return JsonResponse(dict(pending_response, created=created), status=201 if created else 200)
+
+
+def _newsletter_confirm_error(request, title, message):
+    from django.shortcuts import render
+
+    return render(
+        request,
+        "newsletter/confirm_result.html",
+        {"ok": False, "title": title, "message": message},
+        status=400,
+    )
 
-    text_message = (
-        "Bună!\n\n"
-        "Mai este un singur pas pentru a confirma abonarea la newsletter.\n"
-        "Apasă pe linkul de mai jos:\n\n"
-        f"{confirm_url}\n\n"
-        "Dacă nu ai cerut această abonare, poți ignora mesajul.\n"
+
+def _newsletter_confirm_expired(request):
+    return _newsletter_confirm_error(
+        request,
+        "Link expirat",
+        "Link-ul a expirat. Reîncearcă abonarea din footer, apoi confirmă din nou.",
     )
 
-    html_message = f"""
-      <div style="font-family: ui-sans-serif, -apple-system, Segoe UI, Roboto, Arial; line-height: 1.6;">
-        <h2 style="margin:0 0 12px 0;">Confirmă abonarea</h2>
-        <p style="margin:0 0 14px 0;">
-          Mai este un singur pas pentru a confirma abonarea la newsletter.
-        </p>
-        <p style="margin:0 0 18px 0;">
-          <a href="{confirm_url}" style="display:inline-block; padding:10px 16px; border-radius:999px; background:#111; color:#fff; text-decoration:none;">
-            Confirmă abonarea
-          </a>
-        </p>
-        <p style="margin:0; font-size:12px; color:#666;">
-          Dacă nu ai cerut această abonare, poți ignora mesajul.
-        </p>
-      </div>
+
+def _confirm_legacy_token(request, token):
     """
+    Tokenuri random salvate în `confirm_token` (trimise înainte de tokenurile semnate).
+    Rămân valabile până expiră, apoi path-ul poate fi scos.
+    """
+    obj = NewsletterSubscriber.objects.filter(confirm_token=token).first()
+    if not obj:
+        return _newsletter_confirm_error(request, "Link invalid", "Link invalid sau deja folosit.")
 
-    # dacă email-urile nu sunt configurate, asta va ridica eroare (și e bine să vezi în dev)
-    try:
-        send_mail(
-            subject=subject,
-            message=text_message,
-            from_email=getattr(settings, "DEFAULT_FROM_EMAIL", None),
-            recipient_list=[email],
-            fail_silently=False,
-            html_message=html_message,
-        )
-    except Exception as e:
-        return JsonResponse(
-            {"detail": "Failed to send confirmation email.", "error": str(e)},
-            status=500,
-        )
+    if obj.confirm_sent_at:
+        delta = timezone.now() - obj.confirm_sent_at
+        if delta.total_seconds() > _newsletter_confirm_max_age():
+            return _newsletter_confirm_expired(request)
 
-    return JsonResponse(
-        {
-            "ok": True,
-            "created": created,
-            "status": "pending_confirm",
-            "message": "Verifică emailul și confirmă abonarea.",
-        },
-        status=201 if created else 200,
-    )
+    obj.is_active = True
+    obj.confirmed_at = timezone.now()
+    obj.confirm_token = ""
+    obj.save()
+    return None
 
 
 def newsletter_confirm(request):
     """
     GET /api/newsletter/confirm/?token=...
     Activează abonarea și afișează o pagină HTML frumoasă.
+
+    Tokenul e semnat (TimestampSigner) și conține id-ul abonatului + confirm_sent_at,
+    deci confirmarea e un UPDATE pe primary key, fără lookup după token.
     """
     from django.shortcuts import render
 
     token = (request.GET.get("token") or "").strip()
     if not token:
-        return render(
-            request,
-            "newsletter/confirm_result.html",
-            {"ok": False, "title": "Token lipsă", "message": "Link-ul nu conține un token valid."},
-            status=400,
+        return _newsletter_confirm_error(request, "Token lipsă", "Link-ul nu conține un token valid.")
+
+    if ":" in token:
+        try:
+            subscriber_id, sent_at = _read_newsletter_confirm_token(token)
+        except SignatureExpired:
+            return _newsletter_confirm_expired(request)
+        except (BadSignature, ValueError):
+            return _newsletter_confirm_error(request, "Link invalid", "Link invalid sau deja folosit.")
+
+        updated = NewsletterSubscriber.objects.filter(
+            pk=subscriber_id, is_active=False, confirm_sent_at=sent_at
+        ).update(
+            is_active=True,
+            confirmed_at=timezone.now(),
+            confirm_token="",
         )
+        # 0 rânduri = deja confirmat (link folosit de 2 ori), abonat șters,
+        # link înlocuit de o cerere mai nouă sau dezabonat între timp
+        if not updated and not NewsletterSubscriber.objects.filter(pk=subscriber_id, is_active=True).exists():
+            return _newsletter_confirm_error(request, "Link invalid", "Link invalid sau deja folosit.")
+    else:
+        error_response = _confirm_legacy_token(request, token)
+        if error_response is not None:
+            return error_response
 
-    obj = NewsletterSubscriber.objects.filter(confirm_token=token).first()
-    if not obj:
+    return render(
+        request,
+        "newsletter/confirm_result.html",
+        {
+            "ok": True,
+            "title": "Abonarea a fost confirmată",
+            "message": "Mulțumim! De acum primești update-uri despre sesiuni și locuri disponibile.",
+            "cta_url": "/",
+            "cta_label": "Înapoi pe site",
+        },
+        status=200,
+    )
+
+
+@csrf_exempt
+def newsletter_unsubscribe(request):
+    """
+    GET  /api/newsletter/unsubscribe/?token=...  -> pagină cu butonul de dezabonare
+    POST /api/newsletter/unsubscribe/?token=...  -> dezabonare (butonul de mai sus sau
+         one-click din clientul de email, RFC 8058: List-Unsubscribe-Post)
+
+    GET nu modifică nimic: scannerele de linkuri din email deschid toate URL-urile.
+    Tokenul e semnat (Signer, fără expirare) și conține id-ul abonatului.
+    """
+    from django.shortcuts import render
+
+    if request.method not in ("GET", "POST"):
+        return JsonResponse({"detail": "Method not allowed"}, status=405)
+
+    token = (request.GET.get("token") or request.POST.get("token") or "").strip()
+    try:
+        subscriber_id = int(Signer(salt=NEWSLETTER_UNSUBSCRIBE_SALT).unsign(token))
+    except (BadSignature, ValueError):
+        return _newsletter_confirm_error(request, "Link invalid", "Link-ul de dezabonare nu este valid.")
+
+    if request.method == "GET":
         return render(
             request,
             "newsletter/confirm_result.html",
-            {"ok": False, "title": "Link invalid", "message": "Link invalid sau deja folosit."},
-            status=400,
+            {
+                "ok": True,
+                "badge": "Dezabonare",
+                "title": "Te dezabonezi de la newsletter?",
+                "message": "Nu vei mai primi emailuri despre sesiuni și locuri disponibile.",
+                "form_action": request.get_full_path(),
+                "form_label": "Dezabonează-mă",
+            },
         )
 
-    max_hours = int(getattr(settings, "NEWSLETTER_CONFIRM_TTL_HOURS", 72))
-    if obj.confirm_sent_at:
-        delta = timezone.now() - obj.confirm_sent_at
-        if delta.total_seconds() > max_hours * 3600:
-            return render(
-                request,
-                "newsletter/confirm_result.html",
-                {
-                    "ok": False,
-                    "title": "Link expirat",
-                    "message": "Link-ul a expirat. Reîncearcă abonarea din footer, apoi confirmă din nou.",
-                },
-                status=400,
-            )
-
-    obj.is_active = True
-    obj.confirmed_at = timezone.now()
-    obj.confirm_token = ""
-    obj.save()
-
+    # abonat șters între timp = nimic de făcut, tot succes
+    # confirm_sent_at=None: un link de confirmare încă valabil nu mai reactivează adresa
+    NewsletterSubscriber.objects.filter(pk=subscriber_id, is_active=True).update(
+        is_active=False, confirm_sent_at=None
+    )
     return render(
         request,
         "newsletter/confirm_result.html",
         {
             "ok": True,
-            "title": "Abonarea a fost confirmată",
-            "message": "Mulțumim! De acum primești update-uri despre sesiuni și locuri disponibile.",
+            "badge": "Dezabonare reușită",
+            "title": "Te-ai dezabonat",
+            "message": "Nu vei mai primi newsletterul. Te poți abona din nou oricând din footer-ul site-ului.",
             "cta_url": "/",
             "cta_label": "Înapoi pe site",
         },
-        status=200,
     )
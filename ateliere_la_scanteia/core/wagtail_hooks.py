@@ -1,16 +1,20 @@
 # core/wagtail_hooks.py
-import csv
-import json
+from urllib.parse import urlencode
 
+from django.contrib import messages
 from django.contrib.admin.views.decorators import staff_member_required
-from django.http import HttpResponse
-from django.urls import path
+from django.http import Http404
+from django.shortcuts import get_object_or_404, redirect, render
+from django.urls import path, reverse
+from django.views.decorators.http import require_http_methods
 
 from wagtail import hooks
 from wagtail.admin.viewsets.model import ModelViewSet
 from wagtail.admin.menu import MenuItem
 
-from .models import MembershipApplication, NewsletterSubscriber
+from . import exports
+from .models import ExportJob, MembershipApplication
+from .tasks import run_export_job
 
 
 # ----------------------------------
@@ -62,36 +66,13 @@ def register_membership_viewset():
 
 
 # ----------------------------------
-# Helpers
+# CSV Export URLs in Wagtail Admin (streamed, see core/exports.py)
+# Every endpoint accepts ?gzip=1 -> <file>.gz, compressed while streaming.
 # ----------------------------------
-def _qa_to_pairs(app: MembershipApplication):
-    """
-    Returns list[(question, answer)] from:
-      - qa_json (preferred) OR
-      - raw_payload.qa_items
-    Keeps the order as stored.
-    """
-    qa = app.qa_json
-    if not qa and isinstance(app.raw_payload, dict):
-        qa = app.raw_payload.get("qa_items")
-
-    if not isinstance(qa, list):
-        return []
-
-    out = []
-    for item in qa:
-        if not isinstance(item, dict):
-            continue
-        q = str(item.get("question") or "").strip()
-        a = str(item.get("answer") or "").strip()
-        if q:
-            out.append((q, a))
-    return out
+def _wants_gzip(request):
+    return request.GET.get("gzip") == "1"
 
 
-# ----------------------------------
-# CSV Export URLs in Wagtail Admin
-# ----------------------------------
 @hooks.register("register_admin_urls")
 def register_export_csv_urls():
     @staff_member_required
@@ -102,54 +83,9 @@ def register_export_csv_urls():
         - Q&A as Q1/A1, Q2/A2 ... (shows both question AND answer)
         - No raw_payload / user_agent by default (clean)
         """
-        queryset = MembershipApplication.objects.all().order_by("-created_at")
-
-        # compute max QA count for header
-        max_qa = 0
-        for app in queryset:
-            cnt = len(_qa_to_pairs(app))
-            if cnt > max_qa:
-                max_qa = cnt
-
-        fieldnames = [
-            "created_at",
-            "parent_name",
-            "phone",
-            "email",
-            "child_name",
-            "child_age",
-            "expectation",
-            "source",
-        ]
-        for i in range(1, max_qa + 1):
-            fieldnames += [f"Q{i}", f"A{i}"]
-
-        response = HttpResponse(content_type="text/csv; charset=utf-8")
-        response["Content-Disposition"] = 'attachment; filename="membrie_applications_ordered.csv"'
-
-        writer = csv.DictWriter(response, fieldnames=fieldnames)
-        writer.writeheader()
-
-        for app in queryset:
-            row = {
-                "created_at": app.created_at.isoformat() if app.created_at else "",
-                "parent_name": app.parent_name,
-                "phone": app.phone,
-                "email": app.email,
-                "child_name": app.child_name,
-                "child_age": app.child_age,
-                "expectation": app.expectation,
-                "source": app.source,
-            }
-
-            qa = _qa_to_pairs(app)
-            for idx, (q, a) in enumerate(qa, start=1):
-                row[f"Q{idx}"] = q
-                row[f"A{idx}"] = a
-
-            writer.writerow(row)
-
-        return response
+        return exports.stream_csv(
+            exports.membrie_ordered_rows(), "membrie_applications_ordered.csv", compress=_wants_gzip(request)
+        )
 
     @staff_member_required
     def export_csv_full(request):
@@ -157,50 +93,9 @@ def register_export_csv_urls():
         FULL/AUDIT CSV:
         - Includes audit + JSON blobs for debugging
         """
-        queryset = MembershipApplication.objects.all().order_by("-created_at")
-
-        fieldnames = [
-            "created_at",
-            "parent_name",
-            "phone",
-            "email",
-            "child_name",
-            "child_age",
-            "expectation",
-            "source",
-            "ip_address",
-            "user_agent",
-            "art_relationship",
-            "qa_json",
-            "raw_payload",
-        ]
-
-        response = HttpResponse(content_type="text/csv; charset=utf-8")
-        response["Content-Disposition"] = 'attachment; filename="membrie_applications_full.csv"'
-
-        writer = csv.DictWriter(response, fieldnames=fieldnames)
-        writer.writeheader()
-
-        for app in queryset:
-            writer.writerow(
-                {
-                    "created_at": app.created_at.isoformat() if app.created_at else "",
-                    "parent_name": app.parent_name,
-                    "phone": app.phone,
-                    "email": app.email,
-                    "child_name": app.child_name,
-                    "child_age": app.child_age,
-                    "expectation": app.expectation,
-                    "source": app.source,
-                    "ip_address": app.ip_address or "",
-                    "user_agent": app.user_agent or "",
-                    "art_relationship": app.art_relationship or "",
-                    "qa_json": json.dumps(app.qa_json, ensure_ascii=False) if app.qa_json is not None else "",
-                    "raw_payload": json.dumps(app.raw_payload, ensure_ascii=False) if app.raw_payload is not None else "",
-                }
-            )
-
-        return response
+        return exports.stream_csv(
+            exports.membrie_full_rows(), "membrie_applications_full.csv", compress=_wants_gzip(request)
+        )
 
     # ----------------------------
     # ✅ Newsletter CSV exports
@@ -210,109 +105,192 @@ def register_export_csv_urls():
         """
         Newsletter CSV (ALL subscribers)
         """
-        queryset = NewsletterSubscriber.objects.all().order_by("-created_at")
-
-        response = HttpResponse(content_type="text/csv; charset=utf-8")
-        response["Content-Disposition"] = 'attachment; filename="newsletter_subscribers_all.csv"'
-
-        writer = csv.writer(response)
-        writer.writerow(
-            [
-                "email",
-                "is_active",
-                "created_at",
-                "confirmed_at",
-                "source",
-                "ip_address",
-                "user_agent",
-            ]
+        return exports.stream_csv(
+            exports.newsletter_rows(exports.newsletter_all_queryset()),
+            "newsletter_subscribers_all.csv",
+            compress=_wants_gzip(request),
         )
 
-        for obj in queryset:
-            writer.writerow(
-                [
-                    obj.email,
-                    obj.is_active,
-                    obj.created_at.isoformat() if obj.created_at else "",
-                    obj.confirmed_at.isoformat() if obj.confirmed_at else "",
-                    obj.source,
-                    obj.ip_address or "",
-                    obj.user_agent or "",
-                ]
-            )
-
-        return response
-
     @staff_member_required
     def export_newsletter_csv_active(request):
         """
         Newsletter CSV (ONLY confirmed/active subscribers)
         """
-        queryset = NewsletterSubscriber.objects.filter(is_active=True).order_by(
-            "-confirmed_at", "-created_at"
+        return exports.stream_csv(
+            exports.newsletter_rows(exports.newsletter_active_queryset()),
+            "newsletter_subscribers_active.csv",
+            compress=_wants_gzip(request),
         )
 
-        response = HttpResponse(content_type="text/csv; charset=utf-8")
-        response["Content-Disposition"] = 'attachment; filename="newsletter_subscribers_active.csv"'
-
-        writer = csv.writer(response)
-        writer.writerow(
-            [
-                "email",
-                "is_active",
-                "created_at",
-                "confirmed_at",
-                "source",
-                "ip_address",
-                "user_agent",
-            ]
+    # ----------------------------
+    # ✅ XLSX exports (Excel: diacritice + răspunsuri pe mai multe rânduri)
+    # ----------------------------
+    @staff_member_required
+    def export_xlsx_ordered(request):
+        """
+        Ordered XLSX (same columns as the ordered CSV), typed dates, frozen header.
+        """
+        return exports.stream_xlsx(
+            exports.membrie_ordered_rows(),
+            "membrie_applications_ordered.xlsx",
+            sheet_title="Aplicații",
+            compress=_wants_gzip(request),
         )
 
-        for obj in queryset:
-            writer.writerow(
-                [
-                    obj.email,
-                    obj.is_active,
-                    obj.created_at.isoformat() if obj.created_at else "",
-                    obj.confirmed_at.isoformat() if obj.confirmed_at else "",
-                    obj.source,
-                    obj.ip_address or "",
-                    obj.user_agent or "",
-                ]
-            )
+    @staff_member_required
+    def export_newsletter_xlsx_all(request):
+        return exports.stream_xlsx(
+            exports.newsletter_rows(exports.newsletter_all_queryset()),
+            "newsletter_subscribers_all.xlsx",
+            sheet_title="Abonați",
+            compress=_wants_gzip(request),
+        )
 
-        return response
+    @staff_member_required
+    def export_newsletter_xlsx_active(request):
+        return exports.stream_xlsx(
+            exports.newsletter_rows(exports.newsletter_active_queryset()),
+            "newsletter_subscribers_active.xlsx",
+            sheet_title="Abonați activi",
+            compress=_wants_gzip(request),
+        )
 
     return [
         # Membrie exports
         path("membrie/export-csv/", export_csv_ordered, name="membrie_export_csv_ordered"),
         path("membrie/export-csv-full/", export_csv_full, name="membrie_export_csv_full"),
+        path("membrie/export-xlsx/", export_xlsx_ordered, name="membrie_export_xlsx_ordered"),
         # Newsletter exports
         path("newsletter/export-csv/", export_newsletter_csv_all, name="newsletter_export_csv_all"),
         path("newsletter/export-csv-active/", export_newsletter_csv_active, name="newsletter_export_csv_active"),
+        path("newsletter/export-xlsx/", export_newsletter_xlsx_all, name="newsletter_export_xlsx_all"),
+        path("newsletter/export-xlsx-active/", export_newsletter_xlsx_active, name="newsletter_export_xlsx_active"),
+    ]
+
+
+# ----------------------------------
+# ✅ Background exports (ExportJob): settings menu -> confirm -> queued job -> signed download
+# ----------------------------------
+@hooks.register("register_admin_urls")
+def register_export_job_urls():
+    @staff_member_required
+    def export_jobs(request):
+        jobs = list(ExportJob.objects.select_related("created_by")[:50])
+        for job in jobs:
+            job.download_url = None
+            if job.status == "done" and job.file:
+                job.download_url = "{}?{}".format(
+                    reverse("core_export_download", args=[job.pk]),
+                    urlencode({"token": exports.export_download_token(job)}),
+                )
+        return render(
+            request,
+            "core/exports/job_list.html",
+            {
+                "jobs": jobs,
+                "in_progress": any(job.status in ("queued", "running") for job in jobs),
+                "link_minutes": exports.export_download_max_age() // 60,
+            },
+        )
+
+    @staff_member_required
+    @require_http_methods(["GET", "POST"])
+    def export_new(request):
+        data = request.POST if request.method == "POST" else request.GET
+        kind = data.get("kind", "")
+        file_format = data.get("format", "csv")
+        kinds = dict(ExportJob.KIND_CHOICES)
+        if kind not in kinds or file_format not in dict(ExportJob.FORMAT_CHOICES):
+            raise Http404("Unknown export")
+
+        if request.method == "GET":
+            return render(
+                request,
+                "core/exports/job_new.html",
+                {
+                    "kind": kind,
+                    "kind_label": kinds[kind],
+                    "file_format": file_format,
+                    "gzip": data.get("gzip") == "1",
+                    "since_last": data.get("since") == "last",
+                    "watermark": exports.get_watermark(request.user.pk, kind),
+                },
+            )
+
+        job = ExportJob.objects.create(
+            created_by=request.user,
+            kind=kind,
+            file_format=file_format,
+            compress=file_format == "csv" and data.get("gzip") == "1",
+            since_last=data.get("since") == "last",
+        )
+        run_export_job.enqueue(job.pk)
+        messages.success(request, f"Exportul „{kinds[kind]}” a fost pus în coadă.")
+        return redirect("core_export_jobs")
+
+    @staff_member_required
+    def export_download(request, job_id):
+        if exports.check_export_download_token(request.GET.get("token", "")) != job_id:
+            raise Http404("Link invalid sau expirat")
+        job = get_object_or_404(ExportJob, pk=job_id, status="done")
+        if not job.file:
+            raise Http404("Fișier lipsă")
+        return exports.export_file_response(job)
+
+    return [
+        path("exports/", export_jobs, name="core_export_jobs"),
+        path("exports/new/", export_new, name="core_export_new"),
+        path("exports/<int:job_id>/download/", export_download, name="core_export_download"),
     ]
 
 
 # ----------------------------------
-# Add Export items in Wagtail Settings menu
+# Add Export items in Wagtail Settings menu (each one queues a background job)
 # ----------------------------------
+def _export_menu_url(kind, file_format, since_last=False):
+    params = {"kind": kind, "format": file_format}
+    if since_last:
+        params["since"] = "last"
+    return "/admin/exports/new/?" + urlencode(params)
+
+
+@hooks.register("register_settings_menu_item")
+def register_export_jobs_menu_item():
+    return MenuItem(
+        "Exporturi (descărcări)",
+        "/admin/exports/",
+        icon_name="download",
+        order=200,
+    )
+
+
 @hooks.register("register_settings_menu_item")
 def register_export_ordered_menu_item():
     return MenuItem(
         "Export Membrie CSV (Ordonat Q/A)",
-        "/admin/membrie/export-csv/",
+        _export_menu_url("membrie_ordered", "csv"),
         icon_name="download",
         order=201,
     )
 
 
+@hooks.register("register_settings_menu_item")
+def register_export_ordered_xlsx_menu_item():
+    return MenuItem(
+        "Export Membrie XLSX (Ordonat Q/A)",
+        _export_menu_url("membrie_ordered", "xlsx"),
+        icon_name="download",
+        order=202,
+    )
+
+
 @hooks.register("register_settings_menu_item")
 def register_export_full_menu_item():
     return MenuItem(
         "Export Membrie CSV (Full/Audit)",
-        "/admin/membrie/export-csv-full/",
+        _export_menu_url("membrie_full", "csv"),
         icon_name="download",
-        order=202,
+        order=203,
     )
 
 
@@ -320,9 +298,19 @@ def register_export_full_menu_item():
 def register_export_newsletter_all_menu_item():
     return MenuItem(
         "Export Newsletter CSV (All)",
-        "/admin/newsletter/export-csv/",
+        _export_menu_url("newsletter_all", "csv"),
         icon_name="download",
-        order=203,
+        order=204,
+    )
+
+
+@hooks.register("register_settings_menu_item")
+def register_export_newsletter_all_xlsx_menu_item():
+    return MenuItem(
+        "Export Newsletter XLSX (All)",
+        _export_menu_url("newsletter_all", "xlsx"),
+        icon_name="download",
+        order=205,
     )
 
 
@@ -330,7 +318,37 @@ def register_export_newsletter_all_menu_item():
 def register_export_newsletter_active_menu_item():
     return MenuItem(
         "Export Newsletter CSV (Active)",
-        "/admin/newsletter/export-csv-active/",
+        _export_menu_url("newsletter_active", "csv"),
         icon_name="download",
-        order=204,
-    )
\ No newline at end of file
+        order=206,
+    )
+
+
+@hooks.register("register_settings_menu_item")
+def register_export_newsletter_active_xlsx_menu_item():
+    return MenuItem(
+        "Export Newsletter XLSX (Active)",
+        _export_menu_url("newsletter_active", "xlsx"),
+        icon_name="download",
+        order=207,
+    )
+
+
+@hooks.register("register_settings_menu_item")
+def register_export_ordered_delta_menu_item():
+    return MenuItem(
+        "Export Membrie CSV (Noi de la ultimul export)",
+        _export_menu_url("membrie_ordered", "csv", since_last=True),
+        icon_name="download",
+        order=208,
+    )
+
+
+@hooks.register("register_settings_menu_item")
+def register_export_newsletter_active_delta_menu_item():
+    return MenuItem(
+        "Export Newsletter CSV (Active, noi de la ultimul export)",
+        _export_menu_url("newsletter_active", "csv", since_last=True),
+        icon_name="download",
+        order=209,
+    )
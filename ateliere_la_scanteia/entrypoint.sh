@@ -1,9 +1,20 @@
 #!/usr/bin/env sh
 set -e
 
+# Worker-only container: same image, started as its own service with "/app/entrypoint.sh worker"
+# (restart policy on the service; the web container runs the migrations)
+if [ "$1" = "worker" ]; then
+  echo "Starting background task worker..."
+  exec python manage.py db_worker
+fi
+
 echo "Running migrations..."
 python manage.py migrate --noinput
 
+# No-op unless CACHES uses the database backend (the default without REDIS_URL)
+echo "Ensuring cache table exists..."
+python manage.py createcachetable
+
 echo "Collecting static..."
 python manage.py collectstatic --noinput --clear
 
@@ -13,5 +24,24 @@ if [ -n "$DJANGO_SUPERUSER_USERNAME" ] && [ -n "$DJANGO_SUPERUSER_PASSWORD" ] &&
   python manage.py createsuperuser --noinput || true
 fi
 
+# Rebuild the cached API payloads for the new code (set DJANGO_WARM_CACHE=0 to skip)
+if [ "${DJANGO_WARM_CACHE:-1}" = "1" ]; then
+  echo "Warming API cache..."
+  python manage.py warm_cache || echo "Cache warm-up failed, continuing."
+fi
+
+# Background tasks (newsletter emails, exports...) run in a db_worker next to gunicorn,
+# restarted if it exits (crash, lost DB connection). Set DJANGO_TASKS_WORKER=0 when the
+# worker runs as a separate service (see "worker" above).
+if [ "${DJANGO_TASKS_WORKER:-1}" = "1" ]; then
+  echo "Starting background task worker..."
+  (
+    while true; do
+      python manage.py db_worker || echo "db_worker exited with status $?, restarting in 5s..."
+      sleep 5
+    done
+  ) &
+fi
+
 echo "Starting gunicorn on port ${PORT:-8000}..."
 exec gunicorn ateliere_la_scanteia.wsgi:application --bind 0.0.0.0:${PORT:-8000} --workers ${WEB_CONCURRENCY:-2}
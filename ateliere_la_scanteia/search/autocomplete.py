@@ -0,0 +1,206 @@
+# search/autocomplete.py
+"""
+Search-as-you-type over jurnal article titles and categories.
+
+Every process keeps a sorted array of folded keys (bisect prefix lookups, no DB).
+The shared cache holds the source of truth:
+- AUTOCOMPLETE_VERSION_KEY: bumped on every change
+- AUTOCOMPLETE_SNAPSHOT_KEY: {"version", "entries": {page_id: entry}}
+- AUTOCOMPLETE_CHANGES_KEY: the last changes [(version, page_id, entry or None)]
+A process that falls behind replays the changes it missed on its own array and
+only rebuilds from the snapshot (or, when the cache is empty, the DB) if it
+cannot. Publishing or moving an article upserts it when it is live and public
+(removes it otherwise), unpublishing/deleting removes it. Changes to the shared
+snapshot are serialized with a cache.add() lock.
+"""
+import logging
+import threading
+import time
+from bisect import bisect_left, insort
+
+from django.core.cache import cache
+
+from core.models import JurnalArticlePage
+
+from .fulltext import fold
+
+
+AUTOCOMPLETE_VERSION_KEY = "search:autocomplete:version"
+AUTOCOMPLETE_SNAPSHOT_KEY = "search:autocomplete:snapshot"
+AUTOCOMPLETE_CHANGES_KEY = "search:autocomplete:changes"
+AUTOCOMPLETE_LOCK_KEY = "search:autocomplete:lock"
+MAX_CHANGES = 100
+LOCK_TIMEOUT = 10
+LOCK_POLL_INTERVAL = 0.05
+
+logger = logging.getLogger(__name__)
+
+
+def _entry(slug, title, category):
+    return {"slug": slug, "title": title, "category": category}
+
+
+def _keys(entry):
+    """Folded title, every word-suffix of it ('despre acuarela', 'acuarela') and the category."""
+    words = fold(entry["title"]).split()
+    keys = {" ".join(words[i:]) for i in range(len(words))}
+    category = " ".join(fold(entry["category"]).split())
+    if category:
+        keys.add(category)
+    return keys
+
+
+class PrefixIndex:
+    def __init__(self, entries=None):
+        self.entries = {}
+        pairs = []
+        for page_id, entry in (entries or {}).items():
+            self.entries[page_id] = entry
+            pairs += [(key, page_id) for key in _keys(entry)]
+        pairs.sort()
+        self._pairs = pairs
+
+    def add(self, page_id, entry):
+        self.remove(page_id)
+        self.entries[page_id] = entry
+        for key in _keys(entry):
+            insort(self._pairs, (key, page_id))
+
+    def remove(self, page_id):
+        entry = self.entries.pop(page_id, None)
+        if entry is None:
+            return
+        for key in _keys(entry):
+            i = bisect_left(self._pairs, (key, page_id))
+            if i < len(self._pairs) and self._pairs[i] == (key, page_id):
+                del self._pairs[i]
+
+    def lookup(self, prefix, limit=8):
+        out, seen = [], set()
+        i = bisect_left(self._pairs, (prefix,))
+        while i < len(self._pairs) and len(out) < limit:
+            key, page_id = self._pairs[i]
+            if not key.startswith(prefix):
+                break
+            if page_id not in seen:
+                seen.add(page_id)
+                out.append(self.entries[page_id])
+            i += 1
+        return out
+
+
+_lock = threading.Lock()
+_local = {"version": None, "index": None}
+
+
+def _bump_version():
+    try:
+        return cache.incr(AUTOCOMPLETE_VERSION_KEY)
+    except ValueError:
+        cache.add(AUTOCOMPLETE_VERSION_KEY, 0, None)
+        return cache.incr(AUTOCOMPLETE_VERSION_KEY)
+
+
+def _snapshot_from_db():
+    entries = {
+        row["id"]: _entry(row["slug"], row["title"], row["category"])
+        for row in JurnalArticlePage.objects.live().public().values("id", "slug", "title", "category")
+    }
+    snapshot = {"version": _bump_version(), "entries": entries}
+    cache.set(AUTOCOMPLETE_SNAPSHOT_KEY, snapshot, None)
+    cache.set(AUTOCOMPLETE_CHANGES_KEY, [], None)
+    return snapshot
+
+
+def _load_snapshot():
+    snapshot = cache.get(AUTOCOMPLETE_SNAPSHOT_KEY)
+    if snapshot is None or cache.get(AUTOCOMPLETE_VERSION_KEY) is None:
+        snapshot = _snapshot_from_db()
+    return snapshot
+
+
+def get_index():
+    """The up-to-date in-process index (one cache read when nothing changed)."""
+    version = cache.get(AUTOCOMPLETE_VERSION_KEY)
+    with _lock:
+        index = _local["index"]
+        if index is not None and version is not None and version == _local["version"]:
+            return index
+
+        if index is not None and version is not None and version > _local["version"]:
+            missed = [c for c in cache.get(AUTOCOMPLETE_CHANGES_KEY) or [] if c[0] > _local["version"]]
+            if missed and missed[0][0] == _local["version"] + 1 and missed[-1][0] == version:
+                for _, page_id, entry in missed:
+                    if entry is None:
+                        index.remove(page_id)
+                    else:
+                        index.add(page_id, entry)
+                _local["version"] = version
+                return index
+
+        snapshot = _load_snapshot()
+        _local["index"] = PrefixIndex(snapshot["entries"])
+        _local["version"] = snapshot["version"]
+        return _local["index"]
+
+
+def _acquire_lock():
+    """Waits up to LOCK_TIMEOUT for the change lock; the lock expires then anyway, so a crashed holder never blocks."""
+    deadline = time.monotonic() + LOCK_TIMEOUT
+    while not cache.add(AUTOCOMPLETE_LOCK_KEY, 1, LOCK_TIMEOUT):
+        if time.monotonic() >= deadline:
+            logger.warning("Autocomplete: change lock still held after %ss, writing anyway", LOCK_TIMEOUT)
+            return False
+        time.sleep(LOCK_POLL_INTERVAL)
+    return True
+
+
+def _record_change(page_id, entry):
+    # read-modify-write of the shared snapshot: two publishes at once would drop one change
+    locked = _acquire_lock()
+    try:
+        snapshot = _load_snapshot()
+        if entry is None:
+            snapshot["entries"].pop(page_id, None)
+        else:
+            snapshot["entries"][page_id] = entry
+        snapshot["version"] = _bump_version()
+        cache.set(AUTOCOMPLETE_SNAPSHOT_KEY, snapshot, None)
+
+        changes = (cache.get(AUTOCOMPLETE_CHANGES_KEY) or []) + [(snapshot["version"], page_id, entry)]
+        cache.set(AUTOCOMPLETE_CHANGES_KEY, changes[-MAX_CHANGES:], None)
+    finally:
+        if locked:
+            cache.delete(AUTOCOMPLETE_LOCK_KEY)
+
+
+def upsert_page(page):
+    # same filter as the snapshot: drafts and articles under a view restriction are not suggested
+    if JurnalArticlePage.objects.live().public().filter(pk=page.pk).exists():
+        _record_change(page.pk, _entry(page.slug, page.title, page.category))
+    else:
+        _record_change(page.pk, None)
+
+
+def refresh_moved_page(page):
+    """
+    A move can put an article under a view restriction (or lift one), and moving a
+    parent does so for every article below it: re-check the whole subtree.
+    `page` is the plain Page sent by post_page_move.
+    """
+    articles = JurnalArticlePage.objects.descendant_of(page, inclusive=True)
+    public = set(articles.live().public().values_list("id", flat=True))
+    for row in articles.values("id", "slug", "title", "category"):
+        entry = _entry(row["slug"], row["title"], row["category"]) if row["id"] in public else None
+        _record_change(row["id"], entry)
+
+
+def remove_page(page_id):
+    _record_change(page_id, None)
+
+
+def autocomplete(query, limit=8):
+    prefix = " ".join(fold(query).split())
+    if not prefix:
+        return []
+    return get_index().lookup(prefix, limit)
@@ -0,0 +1,143 @@
+# search/fulltext.py
+"""
+Jurnal full-text search.
+
+Postgres: JurnalArticlePage.search_document is a stored tsvector (Romanian
+stemming over anyascii-folded text, GIN-indexed), refreshed on publish.
+Other databases (local SQLite): falls back to the Wagtail search backend.
+"""
+import base64
+import json
+
+from anyascii import anyascii
+from django.contrib.postgres.search import SearchQuery, SearchRank, SearchVector
+from django.db import connection
+from django.db.models import Case, F, FloatField, Q, Value, When
+from django.utils.dateparse import parse_datetime
+from django.utils.html import strip_tags
+
+from core import cache as api_cache
+from core.models import JurnalArticlePage
+
+
+TS_CONFIG = "romanian"
+
+# weight per field: title > category/excerpt > body
+DOCUMENT_WEIGHTS = (
+    ("title", "A"),
+    ("category", "B"),
+    ("excerpt", "B"),
+    ("body", "C"),
+)
+
+# fallback backend: how many hits are ranked at most
+FALLBACK_LIMIT = 500
+
+# best first, then newest; NULLS LAST on every database so keyset cursors agree
+RESULT_ORDERING = (F("rank").desc(), F("first_published_at").desc(nulls_last=True), F("id").desc())
+
+
+def fold(text):
+    """ă/â/î/ș/ț (and any other script) -> ASCII, lowercased: 'Școală' -> 'scoala'."""
+    return anyascii(text or "").lower()
+
+
+def uses_tsvector():
+    return connection.vendor == "postgresql"
+
+
+def document_texts(page):
+    texts = {name: getattr(page, name, "") or "" for name, _ in DOCUMENT_WEIGHTS}
+    texts["body"] = strip_tags(texts["body"])
+    return {name: fold(text) for name, text in texts.items()}
+
+
+def document_vector(texts):
+    vector = None
+    for name, weight in DOCUMENT_WEIGHTS:
+        part = SearchVector(Value(texts[name]), config=TS_CONFIG, weight=weight)
+        vector = part if vector is None else vector + part
+    return vector
+
+
+def update_search_document(page):
+    if not uses_tsvector():
+        return
+    JurnalArticlePage.objects.filter(pk=page.pk).update(search_document=document_vector(document_texts(page)))
+
+
+def search_jurnal(query, queryset=None):
+    """
+    Live/public articles matching `query`, annotated with `rank` (higher = better)
+    and ordered by it (ties: newest first).
+    """
+    if queryset is None:
+        queryset = JurnalArticlePage.objects.live().public()
+    # the tsvector is only matched/ranked in SQL, never needed on the instances
+    queryset = queryset.defer("search_document")
+    folded = fold(query).strip()
+    if not folded:
+        return queryset.none().annotate(rank=Value(0.0, output_field=FloatField()))
+
+    if uses_tsvector():
+        ts_query = SearchQuery(folded, config=TS_CONFIG, search_type="websearch")
+        return (
+            queryset.filter(search_document=ts_query)
+            .annotate(rank=SearchRank(F("search_document"), ts_query))
+            .order_by(*RESULT_ORDERING)
+        )
+
+    ids = [page.pk for page in queryset.search(query)[:FALLBACK_LIMIT]]
+    ranks = [When(pk=pk, then=Value(float(len(ids) - position))) for position, pk in enumerate(ids)]
+    return (
+        queryset.filter(pk__in=ids)
+        .annotate(rank=Case(*ranks, default=Value(0.0), output_field=FloatField()) if ranks else Value(0.0))
+        .order_by(*RESULT_ORDERING)
+    )
+
+
+# ------------------------------------------------------------
+# Keyset paging over (rank, first_published_at, id), all descending
+# ------------------------------------------------------------
+def normalize_query(query):
+    """Cache key form of a query: folded, lowercased, single spaces."""
+    return " ".join(fold(query).split())
+
+
+def encode_cursor(page):
+    published = page.first_published_at.isoformat() if page.first_published_at else None
+    raw = json.dumps([page.rank, published, page.pk], separators=(",", ":"))
+    return base64.urlsafe_b64encode(raw.encode()).decode().rstrip("=")
+
+
+def decode_cursor(cursor):
+    """Returns (rank, first_published_at, id); raises ValueError on a malformed cursor."""
+    try:
+        rank, published, pk = json.loads(base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4)))
+        published = parse_datetime(published) if published else None
+        return float(rank), published, int(pk)
+    except (TypeError, ValueError, json.JSONDecodeError, UnicodeDecodeError) as e:
+        raise ValueError("Invalid cursor") from e
+
+
+def after_cursor(queryset, cursor):
+    rank, published, pk = cursor
+    if published is None:
+        # NULL first_published_at sorts last within a rank (see RESULT_ORDERING)
+        return queryset.filter(Q(rank__lt=rank) | Q(rank=rank, first_published_at__isnull=True, id__lt=pk))
+    return queryset.filter(
+        Q(rank__lt=rank)
+        | Q(rank=rank, first_published_at__lt=published)
+        | Q(rank=rank, first_published_at=published, id__lt=pk)
+        | Q(rank=rank, first_published_at__isnull=True)
+    )
+
+
+# ------------------------------------------------------------
+# Result cache: bumped on publish/unpublish/move/delete (search.signals)
+# ------------------------------------------------------------
+SEARCH_CACHE_NAMESPACE = "search:results"
+
+
+def bump_search_cache_version():
+    api_cache.bump_version(SEARCH_CACHE_NAMESPACE)
@@ -0,0 +1,104 @@
+# search/pagination.py
+"""
+Count-free pagination: a page fetches per_page + 1 rows (the extra one only tells
+whether there is a next page), so there is no COUNT(*) over the result set.
+With keyset callables a "next" cursor continues right after the last row,
+so page 50 costs the same as page 1; plain page numbers still work (OFFSET).
+"""
+import json
+
+from django.db import connections
+
+
+def estimate_count(queryset):
+    """Planner row estimate on Postgres (EXPLAIN, no scan); None elsewhere."""
+    connection = connections[queryset.db]
+    if connection.vendor != "postgresql":
+        return None
+    sql, params = queryset.order_by().query.sql_with_params()
+    with connection.cursor() as cursor:
+        cursor.execute(f"EXPLAIN (FORMAT JSON) {sql}", params)
+        plan = cursor.fetchone()[0]
+    if isinstance(plan, str):
+        plan = json.loads(plan)
+    return int(plan[0]["Plan"]["Plan Rows"])
+
+
+class LookaheadPage:
+    def __init__(self, object_list, number, has_next, next_cursor=None, total=None, total_is_exact=False):
+        self.object_list = object_list
+        self.number = number
+        self._has_next = has_next
+        self.next_cursor = next_cursor
+        self.total = total
+        self.total_is_exact = total_is_exact
+
+    def __iter__(self):
+        return iter(self.object_list)
+
+    def __len__(self):
+        return len(self.object_list)
+
+    def __getitem__(self, index):
+        return self.object_list[index]
+
+    def has_next(self):
+        return self._has_next
+
+    def has_previous(self):
+        return self.number > 1
+
+    def has_other_pages(self):
+        return self.has_next() or self.has_previous()
+
+    def next_page_number(self):
+        return self.number + 1
+
+    def previous_page_number(self):
+        return self.number - 1
+
+
+class LookaheadPaginator:
+    """
+    after(queryset, cursor) -> queryset of rows following `cursor`
+    cursor_for(obj) -> cursor string of the last row of a page
+    decode_cursor(str) -> cursor (raises ValueError when malformed)
+    """
+
+    def __init__(self, queryset, per_page, *, after=None, cursor_for=None, decode_cursor=None):
+        self.queryset = queryset
+        self.per_page = per_page
+        self.after = after
+        self.cursor_for = cursor_for
+        self.decode_cursor = decode_cursor
+
+    def page(self, number=1, cursor=None):
+        try:
+            number = max(int(number), 1)
+        except (TypeError, ValueError):
+            number = 1
+
+        queryset = self.queryset
+        if cursor and self.after:
+            try:
+                queryset = self.after(queryset, self.decode_cursor(cursor))
+                offset = 0
+            except ValueError:
+                number, offset = 1, 0
+        else:
+            offset = (number - 1) * self.per_page
+
+        rows = list(queryset[offset : offset + self.per_page + 1])
+        has_next = len(rows) > self.per_page
+        rows = rows[: self.per_page]
+
+        next_cursor = self.cursor_for(rows[-1]) if has_next and self.cursor_for else None
+
+        # totals: exact for free on the first page when it's not full, estimated otherwise
+        total, exact = None, False
+        if number == 1 and not has_next:
+            total, exact = len(rows), True
+        elif number == 1:
+            total = estimate_count(self.queryset)
+
+        return LookaheadPage(rows, number, has_next, next_cursor, total, exact)
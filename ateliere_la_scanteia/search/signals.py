@@ -0,0 +1,36 @@
+from django.db.models.signals import post_delete
+from django.dispatch import receiver
+from wagtail.signals import page_published, page_unpublished, post_page_move
+
+from core.models import JurnalArticlePage
+
+from . import autocomplete
+from .fulltext import bump_search_cache_version, update_search_document
+
+
+@receiver(page_published, sender=JurnalArticlePage)
+def refresh_search_document(sender, instance, **kwargs):
+    # the published revision's content (the in-memory page may hold a newer draft on save_revision)
+    update_search_document(instance)
+
+
+@receiver([page_published, page_unpublished, post_page_move])
+@receiver(post_delete, sender=JurnalArticlePage)
+def invalidate_search_cache(sender, **kwargs):
+    bump_search_cache_version()
+
+
+@receiver(page_published, sender=JurnalArticlePage)
+def autocomplete_upsert(sender, instance, **kwargs):
+    autocomplete.upsert_page(instance)
+
+
+@receiver(post_page_move)
+def autocomplete_move(sender, instance, **kwargs):
+    autocomplete.refresh_moved_page(instance)
+
+
+@receiver(page_unpublished, sender=JurnalArticlePage)
+@receiver(post_delete, sender=JurnalArticlePage)
+def autocomplete_remove(sender, instance, **kwargs):
+    autocomplete.remove_page(instance.pk)
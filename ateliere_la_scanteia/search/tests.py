@@ -0,0 +1,173 @@
+import threading
+
+from django.core.cache import cache
+from django.db import connection
+from django.test import TestCase
+from django.test.utils import CaptureQueriesContext
+
+from wagtail.models import PageViewRestriction
+
+from core.models import JurnalArticlePage, JurnalIndexPage
+from core.testing import JurnalTestMixin
+from search import autocomplete
+from search.fulltext import after_cursor, decode_cursor, document_texts, encode_cursor, fold, search_jurnal
+from search.pagination import LookaheadPaginator
+
+
+class JurnalSearchTests(JurnalTestMixin, TestCase):
+    def test_fold_strips_romanian_diacritics(self):
+        self.assertEqual(fold("Școală, țară și pâine"), "scoala, tara si paine")
+
+    def test_document_texts_fold_and_strip_html(self):
+        page = JurnalArticlePage(title="Țesături", category="MATERIALE", excerpt="", body="<p>Lână <b>moale</b></p>")
+        self.assertEqual(
+            document_texts(page),
+            {"title": "tesaturi", "category": "materiale", "excerpt": "", "body": "lana moale"},
+        )
+
+    def test_searches_excerpt_and_body(self):
+        by_excerpt = self._publish("a", title="Despre culori", excerpt="Acuarela pentru cei mici")
+        by_body = self._publish("b", title="Materiale", body="<p>Folosim acuarela zilnic</p>")
+        self._publish("c", title="Altceva", excerpt="Lut și ceramică")
+
+        results = list(search_jurnal("acuarela"))
+        self.assertEqual({page.pk for page in results}, {by_excerpt.pk, by_body.pk})
+        self.assertTrue(all(hasattr(page, "rank") for page in results))
+
+    def test_results_defer_the_search_document(self):
+        self._publish("acuarela", title="Acuarela")
+        page = search_jurnal("acuarela").get()
+        self.assertIn("search_document", page.get_deferred_fields())
+
+    def test_empty_query_returns_nothing(self):
+        self._publish("a", title="Ceva")
+        self.assertEqual(list(search_jurnal("   ")), [])
+
+
+class AutocompleteTests(JurnalTestMixin, TestCase):
+    def setUp(self):
+        autocomplete._local.update(version=None, index=None)
+        super().setUp()
+        self.first = self._publish("acuarela", title="Despre acuarelă", category="TEHNICI")
+        self._publish("lut", title="Lutul și răbdarea", category="MATERIALE")
+
+    def _slugs(self, query):
+        return [item["slug"] for item in autocomplete.autocomplete(query)]
+
+    def test_prefix_matches_any_title_word_and_category_without_db(self):
+        self._slugs("x")  # warm the in-process index
+        with self.assertNumQueries(0):
+            self.assertEqual(self._slugs("Acuarel"), ["acuarela"])
+            self.assertEqual(self._slugs("despre ac"), ["acuarela"])
+            self.assertEqual(self._slugs("rabd"), ["lut"])
+            self.assertEqual(self._slugs("mat"), ["lut"])
+            self.assertEqual(self._slugs("zzz"), [])
+
+    def test_publish_and_unpublish_update_the_index(self):
+        self._slugs("x")
+        self._publish("nou", title="Acuarela în aer liber")
+        self.assertEqual(sorted(self._slugs("acuarel")), ["acuarela", "nou"])
+
+        self.first.unpublish()
+        self.assertEqual(self._slugs("acuarel"), ["nou"])
+
+    def test_lagging_process_replays_changes(self):
+        self._slugs("x")
+        stale = autocomplete.PrefixIndex(autocomplete._local["index"].entries)
+        stale_version = autocomplete._local["version"]
+
+        self._publish("nou", title="Culori calde")
+        # another worker still holding the previous version
+        autocomplete._local.update(version=stale_version, index=stale)
+        with self.assertNumQueries(0):
+            self.assertEqual(self._slugs("calde"), ["nou"])
+        self.assertIs(autocomplete._local["index"], stale)
+
+    def test_private_articles_are_not_suggested(self):
+        private = self.index.add_child(instance=JurnalIndexPage(title="Intern", slug="intern"))
+        private.save_revision().publish()
+        PageViewRestriction.objects.create(page=private, restriction_type=PageViewRestriction.PASSWORD, password="x")
+        self._slugs("x")
+
+        secret = private.add_child(instance=JurnalArticlePage(slug="secret", title="Acuarelă internă"))
+        secret.save_revision().publish()
+        self.assertEqual(self._slugs("acuarel"), ["acuarela"])
+
+        # moving it out makes it public, moving the article back hides it again
+        secret.move(self.index, pos="last-child")
+        self.assertEqual(sorted(self._slugs("acuarel")), ["acuarela", "secret"])
+        private.refresh_from_db()
+        self.first.refresh_from_db()
+        self.first.move(private, pos="last-child")
+        self.assertEqual(self._slugs("acuarel"), ["secret"])
+
+    def test_changes_wait_for_the_lock(self):
+        self._slugs("x")
+        cache.add(autocomplete.AUTOCOMPLETE_LOCK_KEY, 1, 10)
+        release = threading.Timer(0.2, cache.delete, args=(autocomplete.AUTOCOMPLETE_LOCK_KEY,))
+        release.start()
+        self.addCleanup(release.cancel)
+
+        version = autocomplete._local["version"]
+        self._publish("nou", title="Culori calde")
+        self.assertFalse(release.is_alive())
+        self.assertEqual(self._slugs("calde"), ["nou"])
+        self.assertEqual(autocomplete._local["version"], version + 1)
+        self.assertIsNone(cache.get(autocomplete.AUTOCOMPLETE_LOCK_KEY))
+
+    def test_endpoint(self):
+        data = self.client.get("/api/search/autocomplete/?q=lut").json()
+        self.assertEqual(data["items"], [{"slug": "lut", "title": "Lutul și răbdarea", "category": "MATERIALE"}])
+
+
+class SearchPaginationTests(JurnalTestMixin, TestCase):
+    def setUp(self):
+        super().setUp()
+        for i in range(25):
+            self._publish(f"a{i}", title=f"Pensule {i}")
+
+    def _paginator(self):
+        return LookaheadPaginator(
+            search_jurnal("pensule"), 10, after=after_cursor, cursor_for=encode_cursor, decode_cursor=decode_cursor
+        )
+
+    def test_pages_without_count_query(self):
+        paginator = self._paginator()
+        with CaptureQueriesContext(connection) as queries:
+            first = paginator.page(1)
+        self.assertEqual(len(queries), 1)
+        self.assertNotIn("COUNT", queries[0]["sql"].upper())
+        self.assertIn("LIMIT 11", queries[0]["sql"].upper())
+        self.assertTrue(first.has_next())
+        self.assertFalse(first.total_is_exact)
+
+        with CaptureQueriesContext(connection) as queries:
+            second = paginator.page(2, cursor=first.next_cursor)
+        self.assertNotIn("OFFSET", queries[0]["sql"].upper())
+        third = paginator.page(3, cursor=second.next_cursor)
+        self.assertEqual(len(third), 5)
+        self.assertFalse(third.has_next())
+
+        slugs = [p.slug for page in (first, second, third) for p in page]
+        self.assertEqual(len(set(slugs)), 25)
+        # cursor pages match offset pages
+        self.assertEqual([p.slug for p in paginator.page(2)], [p.slug for p in second])
+
+    def test_view_links_next_page_with_cursor(self):
+        response = self.client.get("/search/?query=pensule")
+        self.assertEqual(len(response.context["search_results"]), 10)
+        self.assertContains(response, "&amp;after=")
+
+        cursor = response.context["search_results"].next_cursor
+        response = self.client.get(f"/search/?query=pensule&page=2&after={cursor}")
+        self.assertTrue(response.context["search_results"].has_previous())
+        self.assertEqual(len(response.context["search_results"]), 10)
+
+    def test_view_also_lists_other_pages(self):
+        response = self.client.get("/search/?query=jurnal")
+        self.assertEqual([page.slug for page in response.context["other_results"]], ["jurnal"])
+        self.assertNotContains(response, "No results found")
+
+        cursor = self.client.get("/search/?query=pensule").context["search_results"].next_cursor
+        response = self.client.get(f"/search/?query=pensule&page=2&after={cursor}")
+        self.assertEqual(response.context["other_results"], [])
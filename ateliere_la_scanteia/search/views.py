@@ -1,8 +1,12 @@
-from django.core.paginator import EmptyPage, PageNotAnInteger, Paginator
 from django.template.response import TemplateResponse
 
 from wagtail.models import Page
 
+from core.models import JurnalArticlePage
+
+from .fulltext import after_cursor, decode_cursor, encode_cursor, search_jurnal
+from .pagination import LookaheadPaginator
+
 # To enable logging of search queries for use with the "Promoted search results" module
 # <https://docs.wagtail.org/en/stable/reference/contrib/searchpromotions.html>
 # uncomment the following line and the lines indicated in the search function
@@ -10,14 +14,18 @@ from wagtail.models import Page
 
 # from wagtail.contrib.search_promotions.models import Query
 
+# every other live page (home, jurnal index, ...): a handful, listed above page 1 of the articles
+OTHER_PAGES_LIMIT = 10
+
 
 def search(request):
     search_query = request.GET.get("query", None)
     page = request.GET.get("page", 1)
 
-    # Search
+    # Search (jurnal articles: Postgres tsvector, Wagtail backend elsewhere — see search/fulltext.py;
+    # the other page types are added below)
     if search_query:
-        search_results = Page.objects.live().search(search_query)
+        search_results = search_jurnal(search_query)
 
         # To log this query for use with the "Promoted search results" module:
 
@@ -25,16 +33,20 @@ def search(request):
         # query.add_hit()
 
     else:
-        search_results = Page.objects.none()
+        search_results = JurnalArticlePage.objects.none()
+
+    # Pagination (no COUNT: 11 rows per page of 10; "after" continues from the previous page's last row)
+    paginator = LookaheadPaginator(
+        search_results, 10, after=after_cursor, cursor_for=encode_cursor, decode_cursor=decode_cursor
+    )
+    search_results = paginator.page(page, cursor=request.GET.get("after") if search_query else None)
 
-    # Pagination
-    paginator = Paginator(search_results, 10)
-    try:
-        search_results = paginator.page(page)
-    except PageNotAnInteger:
-        search_results = paginator.page(1)
-    except EmptyPage:
-        search_results = paginator.page(paginator.num_pages)
+    other_results = []
+    if search_query and search_results.number == 1:
+        # the articles above use the ranked tsvector search; the rest of the site the Wagtail backend
+        other_results = list(
+            Page.objects.live().public().not_type(JurnalArticlePage).search(search_query)[:OTHER_PAGES_LIMIT]
+        )
 
     return TemplateResponse(
         request,
@@ -42,5 +54,6 @@ def search(request):
         {
             "search_query": search_query,
             "search_results": search_results,
+            "other_results": other_results,
         },
     )